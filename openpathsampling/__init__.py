@@ -138,9 +138,11 @@ from .volume import (
     Volume, VolumeCombination,
     EmptyVolume, FullVolume, CVDefinedVolume, PeriodicCVDefinedVolume,
     IntersectionVolume, UnionVolume, SymmetricDifferenceVolume,
-    RelativeComplementVolume, join_volumes
+    RelativeComplementVolume, VolumeProgram, join_volumes
 )
 
+from .volume_memo import VolumeMembershipMemo
+
 # from .high_level import move_strategy as strategies
 from . import strategies
 
@@ -82,9 +82,10 @@ class StorageHook(PathSimulatorHook):
 
     Parameters
     ----------
-    storage : :class:`.Storage`
+    storage : :class:`.Storage` or :class:`.BackgroundWriter`
               where to save to; default ``None`` uses the simulation's
-              ``storage``
+              ``storage``. With a :class:`.BackgroundWriter` the steps are
+              written in a separate thread while the simulation continues.
     frequency : int
                 save frequency measured in steps; default ``None`` uses the
                 simulation's value for ``save_frequency``
@@ -129,7 +130,12 @@ class StorageHook(PathSimulatorHook):
 
     def after_simulation(self, sim, hook_state):
         if self.storage is not None:
-            self.storage.sync_all()
+            # a background writer has to finish its queue first
+            flush = getattr(self.storage, 'flush', None)
+            if flush is not None:
+                flush()
+            else:
+                self.storage.sync_all()
 
 
 class ShootFromSnapshotsOutputHook(PathSimulatorHook):
@@ -1,3 +1,5 @@
+import functools
+
 import openpathsampling as paths
 import openpathsampling.netcdfplus.chaindict as cd
 from openpathsampling.integration_tools import md, error_if_no_mdtraj
@@ -235,6 +237,27 @@ class CallableCV(CollectiveVariable):
 
         self._post = post
 
+    _execution_backend = None
+
+    @property
+    def execution_backend(self):
+        """Backend that evaluates the CV for lists of snapshots
+
+        ``None`` (default) evaluates the CV in this process. A backend like
+        :class:`.ProcessPoolCVBackend` can evaluate expensive CVs in other
+        processes. It is only used to fill the caches; it is not stored.
+        """
+        return self._execution_backend
+
+    @execution_backend.setter
+    def execution_backend(self, backend):
+        self._execution_backend = backend
+        if backend is None:
+            self._eval_dict.list_evaluator = None
+        else:
+            self._eval_dict.list_evaluator = functools.partial(
+                backend.evaluate_cv, self)
+
     def to_dict(self):
         dct = super(CallableCV, self).to_dict()
         callable_argument = self.__class__.args()[2]
@@ -568,7 +591,11 @@ class MDTrajFunctionCV(CoordinateFunctionCV):
         trajectory = paths.Trajectory(items)
 
         t = trajectory_to_mdtraj(trajectory, self.topology.mdtraj)
-        return self.cv_callable(t, **self.kwargs)
+        return self._eval_mdtraj(t)
+
+    def _eval_mdtraj(self, md_trajectory):
+        # evaluation after the conversion to mdtraj; see CVGroup
+        return self.cv_callable(md_trajectory, **self.kwargs)
 
     @property
     def mdtraj_function(self):
@@ -659,7 +686,10 @@ class MSMBFeaturizerCV(CoordinateGeneratorCV):
         ptraj = trajectory_to_mdtraj(trajectory, self.topology.mdtraj)
 
         # run the featurizer
-        return self._instance.partial_transform(ptraj)
+        return self._eval_mdtraj(ptraj)
+
+    def _eval_mdtraj(self, md_trajectory):
+        return self._instance.partial_transform(md_trajectory)
 
     def to_dict(self):
         return {
@@ -743,7 +773,10 @@ class PyEMMAFeaturizerCV(MSMBFeaturizerCV):
         trajectory = paths.Trajectory(items)
 
         t = trajectory_to_mdtraj(trajectory, self.topology.mdtraj)
-        return self._instance.transform(t)
+        return self._eval_mdtraj(t)
+
+    def _eval_mdtraj(self, md_trajectory):
+        return self._instance.transform(md_trajectory)
 
     def to_dict(self):
         return {
@@ -752,3 +785,119 @@ class PyEMMAFeaturizerCV(MSMBFeaturizerCV):
             'topology': self.topology,
             'kwargs': self.kwargs
         }
+
+
+class CVGroup(object):
+    """Evaluate several collective variables for the same snapshots
+
+    CVs that can share work are evaluated together, each only for the
+    snapshots it does not know yet:
+
+    * CVs that work on :class:`mdtraj.Trajectory` objects (such as
+      :class:`.MDTrajFunctionCV`) and use the same topology share a single
+      conversion of the snapshots to MDTraj.
+    * CVs that define ``_batch_key`` and ``_eval_batch`` (such as
+      :class:`.PLUMEDCV`) are evaluated together by ``_eval_batch`` if their
+      keys are equal.
+
+    All other CVs are evaluated as usual. The results are stored in the
+    caches of the CVs, so later calls to the individual CVs are answered
+    from the caches.
+
+    Parameters
+    ----------
+    cvs : list of :class:`.CollectiveVariable`
+        the collective variables to evaluate
+
+    Examples
+    --------
+    >>> group = CVGroup([phi, psi, rmsd])
+    >>> phi_values, psi_values, rmsd_values = group(trajectory)
+    """
+    def __init__(self, cvs):
+        self.cvs = list(cvs)
+
+    @staticmethod
+    def _eval_mdtraj_batch(cvs, items, wanted):
+        md_trajectory = trajectory_to_mdtraj(paths.Trajectory(items),
+                                             cvs[0].topology.mdtraj)
+        results = []
+        for (cv, indices) in zip(cvs, wanted):
+            if len(indices) == len(items):
+                frames = md_trajectory
+            else:
+                frames = md_trajectory[indices]
+            results.append(cv._eval_mdtraj(frames))
+        return results
+
+    @classmethod
+    def _batch(cls, cv):
+        """Key of the CVs to evaluate together with ``cv``, and the
+        function that evaluates them (``None, None`` if there are none)"""
+        if hasattr(cv, '_eval_batch'):
+            key = cv._batch_key()
+            if key is not None:
+                return key, cv._eval_batch
+        if hasattr(cv, '_eval_mdtraj') and cv.cv_requires_lists:
+            return ('mdtraj', cv.topology), cls._eval_mdtraj_batch
+        return None, None
+
+    @staticmethod
+    def _missing(cv, items):
+        """Indices of the items that neither the cache nor a store knows"""
+        missing = list(range(len(items)))
+        chain = cv._cache_dict
+        while missing and chain is not None and chain is not cv._eval_dict:
+            values = chain._get_list([items[i] for i in missing])
+            missing = [i for (i, value) in zip(missing, values)
+                       if value is None]
+            chain = chain._post
+        return missing
+
+    def _fill_caches(self, items):
+        missing = {}
+        batches = {}
+        for cv in self.cvs:
+            if cv in missing:
+                continue
+            key, evaluate = self._batch(cv)
+            if key is None:
+                continue
+            missing[cv] = self._missing(cv, items)
+            if missing[cv]:
+                batches.setdefault(key, (evaluate, []))[1].append(cv)
+
+        for (evaluate, cvs) in batches.values():
+            needed = sorted(set(i for cv in cvs for i in missing[cv]))
+            positions = {i: n for (n, i) in enumerate(needed)}
+            wanted = [[positions[i] for i in missing[cv]] for cv in cvs]
+            all_results = evaluate(cvs, [items[i] for i in needed], wanted)
+            for (cv, results) in zip(cvs, all_results):
+                # same post-processing as the CV's evaluation
+                if (cv.cv_scalarize_numpy_singletons
+                        and results.shape[-1] == 1):
+                    results = results.reshape(results.shape[:-1])
+                cv._cache_dict._set_list([items[i] for i in missing[cv]],
+                                         list(results))
+
+    def __call__(self, snapshots):
+        """Values of all CVs for the snapshots
+
+        Parameters
+        ----------
+        snapshots : list of :class:`.BaseSnapshot` or :class:`.Trajectory`
+            the snapshots to evaluate the CVs for
+
+        Returns
+        -------
+        list
+            for each CV, its values for the snapshots (as returned by
+            calling the CV with ``snapshots``)
+        """
+        try:
+            items = list(snapshots.as_proxies())
+        except AttributeError:
+            items = list(snapshots)
+        if items:
+            self._fill_caches(items)
+        return [cv(snapshots) for cv in self.cvs]
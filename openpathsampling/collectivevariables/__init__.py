@@ -4,7 +4,9 @@ from openpathsampling.collectivevariable import (
     MDTrajFunctionCV,
     PyEMMAFeaturizerCV,
     MSMBFeaturizerCV,
+    CVGroup,
 )
 from .plumed_wrapper import (
                              PLUMEDCV, PLUMEDInterface
                              )
+from .parallel import ProcessPoolCVBackend, CVTask
@@ -0,0 +1,173 @@
+"""
+Evaluation of expensive collective variables in a pool of local processes.
+
+The snapshots are not sent to the worker processes: only their coordinates
+(and box vectors, if they have any) are. In the workers, the collective
+variable is evaluated for lightweight snapshots that carry just these
+features, so it can only use ``coordinates``, ``xyz``, and
+``box_vectors``.
+
+Examples
+--------
+>>> backend = ProcessPoolCVBackend(n_workers=4, chunk_size=10000)
+>>> sasa.execution_backend = backend
+>>> values = sasa(storage.snapshots)
+>>> backend.close()
+"""
+import concurrent.futures
+
+from openpathsampling.engines import features, SnapshotFactory
+from openpathsampling.netcdfplus import ObjectJSON
+
+# the CVs that a worker process has already built, by their JSON
+_worker_cvs = {}
+_worker_snapshot_class = None
+
+
+def _worker_snapshots(coordinates, box_vectors):
+    global _worker_snapshot_class
+    if _worker_snapshot_class is None:
+        _worker_snapshot_class = SnapshotFactory(
+            'CVWorkerSnapshot',
+            [features.coordinates, features.box_vectors],
+            'Coordinates and box vectors sent to a CV worker process'
+        )
+    return [_worker_snapshot_class(coordinates=coords, box_vectors=box)
+            for coords, box in zip(coordinates, box_vectors)]
+
+
+def _run_chunk(task, coordinates, box_vectors):
+    return list(task(_worker_snapshots(coordinates, box_vectors)))
+
+
+class CVTask(object):
+    """Evaluation of a :class:`.CallableCV` in a worker process
+
+    The CV is sent to the worker as JSON, and rebuilt (once per worker) from
+    it. The worker evaluates the CV without any caches.
+
+    Parameters
+    ----------
+    cv : :class:`.CallableCV`
+        the collective variable to evaluate
+    """
+    def __init__(self, cv):
+        self.cv_json = ObjectJSON().to_json_object(cv)
+
+    def __call__(self, snapshots):
+        try:
+            cv = _worker_cvs[self.cv_json]
+        except KeyError:
+            cv = ObjectJSON().from_json(self.cv_json)
+            _worker_cvs[self.cv_json] = cv
+        return cv._eval_dict._eval_list(snapshots)
+
+
+class ProcessPoolCVBackend(object):
+    """Evaluate collective variables in a pool of local processes
+
+    The snapshots are split into chunks, and each chunk is evaluated in one
+    of the worker processes. The results are returned in the order of the
+    snapshots, so that the CV adds them to its caches as usual. If there is
+    only one chunk, the CV is evaluated in the calling process.
+
+    Use it by setting the ``execution_backend`` of a CV. One backend (and
+    therefore one pool) can be shared by many CVs.
+
+    Parameters
+    ----------
+    n_workers : int or None
+        number of worker processes; ``None`` uses the number of CPUs
+    chunk_size : int
+        number of snapshots sent to a worker at once
+
+    Attributes
+    ----------
+    n_chunks : int
+        number of chunks evaluated in the worker processes
+    """
+    def __init__(self, n_workers=None, chunk_size=1000):
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        self.n_chunks = 0
+        self._executor = None
+
+    @property
+    def executor(self):
+        """:class:`concurrent.futures.ProcessPoolExecutor` : the pool,
+        which is started when it is first needed"""
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.n_workers
+            )
+        return self._executor
+
+    def close(self):
+        """Shut down the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def _payload(snapshots):
+        coordinates = [snap.coordinates for snap in snapshots]
+        box_vectors = [getattr(snap, 'box_vectors', None)
+                       for snap in snapshots]
+        return coordinates, box_vectors
+
+    def evaluate(self, task, snapshots):
+        """Evaluate a task for the snapshots in the worker processes
+
+        Parameters
+        ----------
+        task : callable
+            picklable callable that maps a list of (worker) snapshots to a
+            list of results, such as :class:`.CVTask`
+        snapshots : list of :class:`.BaseSnapshot`
+            the snapshots
+
+        Returns
+        -------
+        list
+            the results, in the order of the snapshots
+        """
+        snapshots = list(snapshots)
+        futures = []
+        for start in range(0, len(snapshots), self.chunk_size):
+            chunk = snapshots[start:start + self.chunk_size]
+            futures.append(self.executor.submit(_run_chunk, task,
+                                                *self._payload(chunk)))
+        self.n_chunks += len(futures)
+
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def evaluate_cv(self, cv, snapshots):
+        """Evaluate a :class:`.CallableCV` for the snapshots
+
+        This bypasses the caches of the CV; it is used by CVs that have
+        this backend as their ``execution_backend``.
+
+        Parameters
+        ----------
+        cv : :class:`.CallableCV`
+            the collective variable
+        snapshots : list of :class:`.BaseSnapshot`
+            the snapshots
+
+        Returns
+        -------
+        list
+            the values of the CV, in the order of the snapshots
+        """
+        if len(snapshots) <= self.chunk_size:
+            return cv._eval_dict._eval_list(snapshots)
+        return self.evaluate(CVTask(cv), snapshots)
@@ -7,7 +7,6 @@ except ImportError:
     pass
 import numpy as np
 import warnings
-import copy
 import os
 import sys
 
@@ -137,37 +136,19 @@ class PLUMEDCV(paths.collectivevariable.CoordinateFunctionCV):
             Computed values of the PLUMED collective variable along the
             `openpathsampling.engines.trajectory.Trajectory`
         """
-        cv = []
-        try:
-            masses = np.array([a.element.mass for a in
-                              trajectory.topology.mdtraj.atoms],
-                              dtype=np.float64)
-        except AttributeError:  # pragma: no cover
-            masses = np.ones(self.topology.n_atoms, dtype=np.float64)
-            warnings.warn("No masses found in topology. All masses set to one")
-        charges = np.zeros(self.topology.n_atoms,
-                           dtype=np.float64)  # non-essential
-        # warnings.warn("All charges set to zero")
-        forces = np.zeros((self.topology.n_atoms, 3))
-        virial = np.zeros((3, 3), dtype=np.float64)
-        bias = np.zeros((1), dtype=np.float64)  # non-essential
-        for step, snapshot in enumerate(trajectory):
-            self.plmd.cmd("setStep", step)
-            if snapshot.box_vectors != None:
-                box = np.array(snapshot.box_vectors, dtype=np.float64)
-                self.plmd.cmd("setBox", box)
-            positions = snapshot.xyz.astype(np.float64)
-            self.plmd.cmd("setBox", box)
-            self.plmd.cmd("setPositions", positions)
-            self.plmd.cmd("setMasses", masses)
-            self.plmd.cmd("setForces", forces)
-            self.plmd.cmd("setVirial", virial)
-            self.plmd.cmd("setCharges", charges)  # non-essential
-            self.plmd.cmd("getBias", bias)   # non-essential
-            self.plmd.cmd("calc")
-            cv.append(copy.deepcopy(self.var))
-        cv = np.array(cv)
-        return cv
+        return self.plmd.compute_cvs([self], trajectory)[0]
+
+    def _batch_key(self):
+        # PLUMEDCVs of the same interface are computed in the same pass
+        return ('plumed', self.plmd) if self.cv_requires_lists else None
+
+    @staticmethod
+    def _eval_batch(cvs, items, wanted):
+        """Values of several PLUMEDCVs of one interface; see CVGroup"""
+        trajectory = peng.Trajectory(items)
+        all_results = cvs[0].plmd.compute_cvs(cvs, trajectory)
+        return [results[indices]
+                for results, indices in zip(all_results, wanted)]
 
     def _eval(self, trajectory):
         trajectory = peng.Trajectory(trajectory)
@@ -240,6 +221,7 @@ class PLUMEDInterface(StorableNamedObject):
             Name of the PLUMED log file.
         """
 
+        super(PLUMEDInterface, self).__init__()
         self.interface = plumed.Plumed()  # 8 is default size of real
         self.pathtoplumed = pathtoplumed
         self.topology = topology
@@ -248,11 +230,81 @@ class PLUMEDInterface(StorableNamedObject):
         self.molinfo = molinfo
         self.logfile = logfile
         self._commandlist = []
+        self._buffers = None
         self._init_plumed()
 
     def cmd(self, *args, **kwargs):
         self.interface.cmd(*args, **kwargs)
 
+    def _md_buffers(self):
+        # arrays passed to PLUMED for every frame; allocated only once
+        if self._buffers is None:
+            n_atoms = self.topology.n_atoms
+            try:
+                masses = np.array([a.element.mass for a in
+                                   self.topology.mdtraj.atoms],
+                                  dtype=np.float64)
+            except AttributeError:  # pragma: no cover
+                masses = np.ones(n_atoms, dtype=np.float64)
+                warnings.warn("No masses found in topology. "
+                              "All masses set to one")
+            self._buffers = {
+                'positions': np.zeros((n_atoms, 3), dtype=np.float64),
+                'box': np.zeros((3, 3), dtype=np.float64),
+                'masses': masses,
+                'charges': np.zeros(n_atoms, dtype=np.float64),
+                'forces': np.zeros((n_atoms, 3), dtype=np.float64),
+                'virial': np.zeros((3, 3), dtype=np.float64),
+                'bias': np.zeros(1, dtype=np.float64),
+            }
+        return self._buffers
+
+    def compute_cvs(self, cvs, trajectory):
+        """Compute several PLUMED collective variables in one pass.
+
+        PLUMED computes all actions of this interface for each frame, so
+        one pass over the trajectory gives the values of all `PLUMEDCV`
+        objects created with this interface. Positions and box vectors are
+        copied into arrays that are reused for all frames.
+
+        Parameters
+        ----------
+        cvs : list of :obj:`PLUMEDCV`
+            PLUMED collective variables created with this interface
+        trajectory : :obj:`openpathsampling.engines.trajectory.Trajectory`
+            The trajectory along which the collective variables are to be
+            computed.
+
+        Returns
+        -------
+        list of array
+            For each collective variable, the computed values along the
+            trajectory.
+        """
+        buffers = self._md_buffers()
+        positions = buffers['positions']
+        box = buffers['box']
+        results = [np.zeros((len(trajectory),) + np.shape(cv.var))
+                   for cv in cvs]
+        for step, snapshot in enumerate(trajectory):
+            # PLUMED expects all MD data again after each setStep
+            self.cmd("setStep", step)
+            box_vectors = snapshot.box_vectors
+            if box_vectors is not None:
+                box[:] = np.array(box_vectors, dtype=np.float64)
+                self.cmd("setBox", box)
+            positions[:] = snapshot.xyz
+            self.cmd("setPositions", positions)
+            self.cmd("setMasses", buffers['masses'])
+            self.cmd("setForces", buffers['forces'])
+            self.cmd("setVirial", buffers['virial'])
+            self.cmd("setCharges", buffers['charges'])  # non-essential
+            self.cmd("getBias", buffers['bias'])  # non-essential
+            self.cmd("calc")
+            for cv, cv_results in zip(cvs, results):
+                cv_results[step] = cv.var
+        return results
+
     def _init_plumed(self):
         if self.pathtoplumed != "":  # pragma: no cover
             #os.system("source " + self.pathtoplumed + "/sourceme.sh")
@@ -90,6 +90,21 @@ class DynamicsEngine(StorableNamedObject):
     retries_when_max_length : int, default: 0
         the number of retries (if chosen) before an exception is raised
 
+    n_frames_per_check : int, default: 1
+        the number of frames generated in one block before the stopping
+        conditions are checked. Conditions that are the `can_append` (or,
+        when generating backward, `can_prepend`) of an ensemble that
+        supports it (see :meth:`.Ensemble.can_append_frames`), or that
+        provide such a check as their `block_check` attribute, check the
+        whole block at once. All other conditions are tested for each
+        frame of the block in order. Frames after the first one that stops
+        the trajectory are discarded, so the resulting trajectory is the
+        same as with frame-by-frame checking. Larger blocks amortize the
+        per-frame overhead of the generation loop for fast engines, at the
+        cost of generating up to `n_frames_per_check - 1` unused frames.
+        After stopping, the engine's state may therefore be past the final
+        frame of the returned trajectory.
+
     on_retry : str or callable
         the behaviour when a try is started. Since you have already generated
         some trajectory you might not restart completely. Possibilities are
@@ -118,7 +133,8 @@ class DynamicsEngine(StorableNamedObject):
         'retries_when_error': 0,
         'retries_when_max_length': 0,
         'on_retry': 'full',
-        'on_error': 'fail'
+        'on_error': 'fail',
+        'n_frames_per_check': 1
     }
 
     #units = {
@@ -290,10 +306,13 @@ class DynamicsEngine(StorableNamedObject):
             # give the default message; to change, add something here like:
             # raise AttributeError("Something went wrong with " + str(item))
 
-        # see, if the attribute is actually a dimension
-        if self.descriptor is not None:
-            if item in self.descriptor.dimensions:
-                return self.descriptor.dimensions[item]
+        # see, if the attribute is actually a dimension (not using
+        # self.descriptor: it recurses if __init__ wasn't run, e.g., when
+        # unpickling)
+        descriptor = self.__dict__.get('descriptor')
+        if descriptor is not None:
+            if item in descriptor.dimensions:
+                return descriptor.dimensions[item]
 
         # fallback is to look for an option and return it's value
         try:
@@ -542,6 +561,10 @@ class DynamicsEngine(StorableNamedObject):
             has_nan = False
             has_error = False
             snapshot = None  # so it is in scope
+            pending = []  # generated frames not yet added to the trajectory
+            block_stops = []  # results of the block checks for `pending`
+            frame_conditions = running
+            block_failure = None
 
             while not stop:
                 if intervals > 0 and frame % intervals == 0:
@@ -557,35 +580,34 @@ class DynamicsEngine(StorableNamedObject):
                 self._clear_snapshot_cache(snapshot)  # clear old snapshot
                 snapshot = None
 
-                try:
-                    with self.interrupter():
-                        snapshot = self.generate_next_frame()
-
-                        # if self.on_nan != 'ignore' and \
-                        if not self.is_valid_snapshot(snapshot):
-                            has_nan = True
-                            break
-
-                except KeyboardInterrupt as e:
-                    # make sure we will report the last state for
-                    logger.info('Keyboard interrupt. Shutting down simulation')
-                    final_error = e
-                    break
-
-                except:
-                    # any other error we start a retry
-                    e = sys.exc_info()
-                    errors.append(e)
-                    se = str(e).lower()
-                    if 'nan' in se and \
-                            ('particle' in se or 'coordinates' in se):
-                        # this cannot be ignored because we cannot continue!
+                if not pending and block_failure is None:
+                    n_frames = self.n_frames_per_check
+                    if max_length and max_length > 0:
+                        n_frames = min(n_frames,
+                                       max_length + 1 - len(trajectory))
+                    pending, block_failure = self._generate_block(
+                        max(n_frames, 1), errors
+                    )
+                    block_stops, frame_conditions = self._check_block(
+                        trajectory, pending, running, direction
+                    )
+                    # so we can pop frames in order
+                    pending.reverse()
+                    block_stops.reverse()
+
+                if not pending:
+                    # only report a failure once all frames generated
+                    # before it have been checked
+                    if block_failure == 'nan':
                         has_nan = True
-                        break
-                    else:
+                    elif block_failure == 'error':
                         has_error = True
-                        break
+                    else:
+                        final_error = block_failure
+                    break
 
+                snapshot = pending.pop()
+                block_stop = block_stops.pop()
                 frame += 1
 
                 # Store snapshot and add it to the trajectory.
@@ -624,8 +646,14 @@ class DynamicsEngine(StorableNamedObject):
 
                 if stop is False:
                     # Check if we should stop. If not, continue simulation
-                    stop = self.stop_conditions(trajectory=trajectory,
-                                            continue_conditions=running)
+                    stop = self.stop_conditions(
+                        trajectory=trajectory,
+                        continue_conditions=frame_conditions
+                    ) or block_stop
+
+            # frames generated after the stopping frame are not used
+            for unused in pending:
+                self._clear_snapshot_cache(unused)
 
             # check what to do if stop is True
             if has_nan:
@@ -674,6 +702,141 @@ class DynamicsEngine(StorableNamedObject):
         yield trajectory
         self._clear_snapshot_cache(snapshot)
 
+    @staticmethod
+    def _block_check(condition, direction):
+        """The check for several frames at once that matches a condition
+
+        A condition can provide this check as its `block_check` attribute.
+        Otherwise, if it is the `can_append` (for `direction` > 0) or
+        `can_prepend` (for `direction` < 0) of an ensemble, the ensemble's
+        `can_append_frames` or `can_prepend_frames` is used.
+
+        Parameters
+        ----------
+        condition : function(:class:`.Trajectory`)
+            the stopping condition
+        direction : -1 or +1
+            the direction the trajectory is growing in
+
+        Returns
+        -------
+        function(:class:`.Trajectory`, list of :class:`.BaseSnapshot`) or None
+            the check for a block of frames, or `None` if the condition has
+            to be checked for each frame
+        """
+        block_check = getattr(condition, 'block_check', None)
+        if block_check is not None:
+            return block_check
+
+        ensemble = getattr(condition, '__self__', None)
+        if ensemble is None:
+            return None
+
+        if direction > 0:
+            single, block = 'can_append', 'can_append_frames'
+        else:
+            single, block = 'can_prepend', 'can_prepend_frames'
+
+        if condition == getattr(ensemble, single, None):
+            return getattr(ensemble, block, None)
+
+        return None
+
+    def _check_block(self, trajectory, snapshots, running, direction):
+        """Check the stopping conditions for a block of frames at once.
+
+        Parameters
+        ----------
+        trajectory : :class:`.Trajectory`
+            the trajectory before the block, which has already been checked
+        snapshots : list of :class:`.BaseSnapshot`
+            the frames of the block, as generated
+        running : list of function(:class:`.Trajectory`)
+            the stopping conditions
+        direction : -1 or +1
+            the direction the trajectory is growing in
+
+        Returns
+        -------
+        list of bool
+            for each frame, whether a condition checked for the whole block
+            stops the trajectory at that frame
+        list of function(:class:`.Trajectory`)
+            the conditions that must still be checked after each frame
+        """
+        stops = [False] * len(snapshots)
+        if len(snapshots) < 2:
+            # frame-by-frame checking
+            return stops, running
+
+        if direction > 0:
+            frames = snapshots
+        else:
+            frames = [snapshot.reversed for snapshot in snapshots]
+
+        frame_conditions = []
+        for condition in running:
+            block_check = self._block_check(condition, direction)
+            results = None
+            if block_check is not None:
+                results = block_check(trajectory, frames)
+            if results is None:
+                frame_conditions.append(condition)
+            elif results and not results[-1]:
+                stops[len(results) - 1] = True
+
+        return stops, frame_conditions
+
+    def _generate_block(self, n_frames, errors):
+        """Generate up to `n_frames` frames, stopping at the first failure.
+
+        Parameters
+        ----------
+        n_frames : int
+            number of frames to generate
+        errors : list
+            list to which the `sys.exc_info()` of an error is appended
+
+        Returns
+        -------
+        list of :class:`.BaseSnapshot`
+            the valid frames generated before any failure
+        None or str or KeyboardInterrupt
+            the failure that stopped the block: `None` if all frames were
+            generated, `'nan'` for an invalid frame, `'error'` for any other
+            exception, or the `KeyboardInterrupt` that was caught
+        """
+        snapshots = []
+        try:
+            with self.interrupter():
+                for _ in range(n_frames):
+                    snapshot = self.generate_next_frame()
+
+                    # if self.on_nan != 'ignore' and \
+                    if not self.is_valid_snapshot(snapshot):
+                        return snapshots, 'nan'
+
+                    snapshots.append(snapshot)
+
+        except KeyboardInterrupt as e:
+            # make sure we will report the last state for
+            logger.info('Keyboard interrupt. Shutting down simulation')
+            return snapshots, e
+
+        except:
+            # any other error we start a retry
+            e = sys.exc_info()
+            errors.append(e)
+            se = str(e).lower()
+            if 'nan' in se and \
+                    ('particle' in se or 'coordinates' in se):
+                # this cannot be ignored because we cannot continue!
+                return snapshots, 'nan'
+            else:
+                return snapshots, 'error'
+
+        return snapshots, None
+
     def _clear_snapshot_cache(self, snapshot):
         if self.clear_snapshot_cache and snapshot is not None:
             clear_cache = getattr(snapshot, 'clear_cache', lambda: None)
@@ -13,6 +13,12 @@ import signal
 import shlex
 import time
 
+import ctypes
+import ctypes.util
+import errno
+import select
+import struct
+
 import sys
 if sys.version_info > (3, ):
     long = int
@@ -56,6 +62,117 @@ def _debug_snapshot_loading(snapshot):
     snapshot.clear_cache()
 
 
+class _InotifyWatcher(object):
+    """Block until a file is written to, using Linux inotify via ctypes.
+
+    The watch is on the directory containing the file, so the file does not
+    need to exist when the watcher is created. Events are queued by the
+    kernel from the moment the watch is created, so a write that happens
+    between a read attempt and the next call to :meth:`.wait` is not lost.
+
+    Parameters
+    ----------
+    filename : str
+        the file to watch
+    """
+    _IN_MODIFY = 0x00000002
+    _IN_CLOSE_WRITE = 0x00000008
+    _IN_MOVED_TO = 0x00000080
+    _IN_CREATE = 0x00000100
+    _EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+    _libc = None
+
+    @classmethod
+    def _load_libc(cls):
+        if cls._libc is None:
+            libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            # raises AttributeError if inotify is not available
+            libc.inotify_init1
+            libc.inotify_add_watch
+            cls._libc = libc
+        return cls._libc
+
+    @classmethod
+    def is_available(cls):
+        """Whether inotify can be used on this platform"""
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            cls._load_libc()
+        except (OSError, AttributeError):
+            return False
+        return True
+
+    def __init__(self, filename):
+        libc = self._load_libc()
+        self.filename = os.path.basename(filename)
+        directory = os.path.dirname(os.path.abspath(filename))
+        flags = os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0)
+        self.fd = libc.inotify_init1(flags)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        mask = (self._IN_MODIFY | self._IN_CLOSE_WRITE | self._IN_MOVED_TO
+                | self._IN_CREATE)
+        path = directory.encode(sys.getfilesystemencoding())
+        if libc.inotify_add_watch(self.fd, path, mask) < 0:
+            err = ctypes.get_errno()
+            self.close()
+            raise OSError(err, os.strerror(err), directory)
+
+    def _drain(self):
+        # read all queued events; return whether any were for our file
+        changed = False
+        while True:
+            try:
+                buf = os.read(self.fd, 4096)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            offset = 0
+            while offset < len(buf):
+                _, _, _, length = self._EVENT_HEADER.unpack_from(buf, offset)
+                offset += self._EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if name.decode(sys.getfilesystemencoding()) == self.filename:
+                    changed = True
+        return changed
+
+    def wait(self, timeout):
+        """Wait until the file is written to, or until timeout.
+
+        Parameters
+        ----------
+        timeout : float
+            maximum time to wait, in seconds
+
+        Returns
+        -------
+        bool
+            True if the file was written to, False on timeout
+        """
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+            if self._drain():
+                return True
+
+    def close(self):
+        if self.fd is not None and self.fd >= 0:
+            os.close(self.fd)
+        self.fd = None
+
+
 class FilenameSetter(StorableNamedObject):
     """Just use numbers, as we did previously.
 
@@ -129,12 +246,26 @@ class _InternalizedEngineProxy(DynamicsEngine):
         return self.engine.name + " (internalized)"
 
     def __getattr__(self, attr):
+        if attr == 'engine':
+            # not set yet, e.g., while unpickling
+            raise AttributeError(attr)
         return getattr(self.engine, attr)
 
 
 class ExternalEngine(DynamicsEngine):
     """
     Generic object to handle arbitrary external engines. Subclass to use.
+
+    The option ``frame_wait`` sets how the engine waits for new frames in
+    the output file: ``'poll'`` sleeps between read attempts (with the
+    interval tuned by ``auto_optimize_sleep``), ``'inotify'`` blocks until
+    the kernel reports that the output file was written (Linux only), and
+    ``'auto'`` (default) uses inotify if it is available and polling
+    otherwise. When waiting with inotify, the engine still wakes every
+    ``default_sleep_ms`` to check that the external process is alive.
+
+    The time spent waiting for each frame since the last :meth:`.start` is
+    recorded in ``frame_wait_times`` (in seconds).
     """
 
     _default_options = {
@@ -148,6 +279,7 @@ class ExternalEngine(DynamicsEngine):
         'n_atoms': 1,
         'n_poll_per_step': 1,
         'filename_setter': FilenameSetter(),
+        'frame_wait': 'auto',
     }
 
     killsig = signal.SIGTERM
@@ -164,6 +296,8 @@ class ExternalEngine(DynamicsEngine):
         self._traj_num = -1
         self._current_snapshot = template
         self.n_frames_since_start = None
+        self.frame_wait_times = []
+        self._watcher = None
         self.internalized_engine = _InternalizedEngineProxy(self)
         if 'filename_setter' not in options:
             # Level 6 is needed to raise it to the initialization of a
@@ -201,9 +335,41 @@ class ExternalEngine(DynamicsEngine):
     def current_snapshot(self, snap):
         self._current_snapshot = snap
 
+    def _make_watcher(self, filename):
+        method = self.options['frame_wait']
+        if method == 'poll':
+            return None
+        elif method not in ['auto', 'inotify']:
+            raise ValueError("Unknown frame_wait option: " + str(method))
+
+        if _InotifyWatcher.is_available():
+            try:
+                return _InotifyWatcher(filename)
+            except OSError as e:
+                if method == 'inotify':
+                    raise
+                logger.info("Unable to use inotify (%s); polling instead",
+                            str(e))
+                return None
+        elif method == 'inotify':
+            raise RuntimeError("inotify is not available on this platform")
+        return None
+
+    def _close_watcher(self):
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    def _wait_for_output(self, poll_s):
+        if self._watcher is not None:
+            self._watcher.wait(self.default_sleep_ms / 1000.0)
+        else:
+            time.sleep(poll_s)
+
     def generate_next_frame(self):
         # should be completely general
         next_frame_found = False
+        wait_start = time.time()
         logger.debug("Looking for frame %d", self.n_frames_since_start+1)
         while not next_frame_found:
             try:
@@ -221,22 +387,26 @@ class ExternalEngine(DynamicsEngine):
             if next_frame == "partial":
                 if self.proc.poll() is not None:
                     raise RuntimeError("External engine died unexpectedly")
-                time.sleep(0.001)  # wait a millisec and rerun
+                self._wait_for_output(0.001)  # wait a millisec and rerun
             elif next_frame is None:
                 if self.proc.poll() is not None:
                     raise RuntimeError("External engine died unexpectedly")
                 logger.debug("Sleeping for {:.2f}ms".format(self.sleep_ms))
-                time.sleep(self.sleep_ms/1000.0)
+                self._wait_for_output(self.sleep_ms/1000.0)
             elif isinstance(next_frame, BaseSnapshot):  # success
                 self.n_frames_since_start += 1
-                logger.debug("Found frame %d", self.n_frames_since_start)
+                wait_time = time.time() - wait_start
+                self.frame_wait_times.append(wait_time)
+                logger.debug("Found frame %d after waiting %.2fms",
+                             self.n_frames_since_start, wait_time * 1000.0)
                 self.current_snapshot = next_frame
                 next_frame_found = True
                 self.frame_num += 1
             else:  # pragma: no cover
                 raise RuntimeError("Strange return value from "
                                    "read_next_frame_from_file")
-            if self.auto_optimize_sleep and self.n_frames_since_start > 0:
+            if (self.auto_optimize_sleep and self._watcher is None
+                    and self.n_frames_since_start > 0):
                 n_poll_per_step = self.options['n_poll_per_step']
                 elapsed = now - self.start_time
                 time_per_step = elapsed / self.n_frames_since_start
@@ -249,11 +419,16 @@ class ExternalEngine(DynamicsEngine):
         self._traj_num += 1
         self.frame_num = 0
         self.n_frames_since_start = 0
+        self.frame_wait_times = []
         file_prefix = self.filename_setter()
         self.set_filenames(file_prefix)
         self.write_frame_to_file(self.input_file, self.current_snapshot, "w")
         self.prepare()
 
+        # watch must exist before the engine can write any output
+        self._close_watcher()
+        self._watcher = self._make_watcher(self.output_file)
+
         self.start_time = time.time()
         try:
             logger.info(self.engine_command())
@@ -271,6 +446,12 @@ class ExternalEngine(DynamicsEngine):
     def stop(self, trajectory):
         super(ExternalEngine, self).stop(trajectory)
         logger.info("total_time {:.4f}".format(time.time() - self.start_time))
+        if self.frame_wait_times:
+            logger.info("mean frame wait {:.2f}ms over {} frames".format(
+                1000.0 * np.mean(self.frame_wait_times),
+                len(self.frame_wait_times)
+            ))
+        self._close_watcher()
         proc = self.who_to_kill()
         logger.info("About to send signal %s to %s", str(self.killsig),
                     str(proc))
@@ -21,10 +21,14 @@ from openpathsampling.engines.external_snapshots import \
         ExternalMDSnapshot, InternalizedMDSnapshot
 from openpathsampling.tools import ensure_file
 
+import collections
+import hashlib
 import os
 import psutil
 import shlex
+import struct
 import time
+import warnings
 import numpy as np
 
 from openpathsampling.engines.external_engine import (
@@ -37,6 +41,176 @@ def _remove_file_if_exists(filename):  # pragma: no cover
     if os.path.isfile(filename):
         os.remove(filename)
 
+class _TRRFrameIndex(object):
+    """Persistent reader for a (possibly still growing) TRR file.
+
+    The file is kept open, and the byte offset of each complete frame is
+    recorded as frames are found. When a frame beyond the end of the index
+    is requested, scanning resumes from the end of the last complete frame,
+    so each frame header is parsed only once. A trailing frame that has not
+    been completely written is never added to the index. If the file is
+    replaced or truncated, the index is rebuilt.
+
+    Parameters
+    ----------
+    filename : str
+        the TRR file to read
+    """
+    _MAGIC = 1993
+    _PREAMBLE = struct.Struct('>iii')  # magic, slen, len(version string)
+    _SIZES = struct.Struct('>13i')
+    # names of the 13 ints in the header, in order
+    _SIZE_NAMES = ['ir', 'e', 'box', 'vir', 'pres', 'top', 'sym', 'x', 'v',
+                   'f', 'natoms', 'step', 'nre']
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._open()
+
+    def _open(self):
+        # open the file and start with an empty index
+        self._file = open(self.filename, 'rb')
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self.offsets = []
+        self._layouts = []
+        self._next_offset = 0
+
+    def close(self):
+        self._file.close()
+
+    def _reset_if_replaced(self):
+        # reopen if the file was replaced or truncated since last scan
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._next_offset:
+            self._file.close()
+            self._open()
+
+    def _read_layout(self, offset):
+        # parse the frame header at offset; return (header_size, sizes,
+        # precision), or None if the header is not completely written
+        self._file.seek(offset)
+        preamble = self._file.read(self._PREAMBLE.size)
+        if len(preamble) < self._PREAMBLE.size:
+            return None
+        magic, _, version_len = self._PREAMBLE.unpack(preamble)
+        if magic != self._MAGIC:
+            # not an IOError: that would be taken as "frame not written yet"
+            raise ValueError("Bad magic number in TRR file %s at byte %d"
+                             % (self.filename, offset))
+        version_len += (-version_len) % 4  # XDR pads strings to 4 bytes
+        self._file.seek(offset + self._PREAMBLE.size + version_len)
+        size_bytes = self._file.read(self._SIZES.size)
+        if len(size_bytes) < self._SIZES.size:
+            return None
+        sizes = dict(zip(self._SIZE_NAMES, self._SIZES.unpack(size_bytes)))
+        if sizes['box']:
+            precision = sizes['box'] // 9
+        elif sizes['x']:
+            precision = sizes['x'] // (3 * sizes['natoms'])
+        elif sizes['v']:
+            precision = sizes['v'] // (3 * sizes['natoms'])
+        else:
+            precision = 4
+        # header ends with time and lambda, in file precision
+        header_size = (self._PREAMBLE.size + version_len + self._SIZES.size
+                       + 2 * precision)
+        return header_size, sizes, precision
+
+    def _scan(self):
+        """Extend the index with frames completed since the last scan.
+
+        Returns
+        -------
+        bool
+            True if there are bytes after the last complete frame (i.e., a
+            frame is partially written)
+        """
+        file_size = os.fstat(self._file.fileno()).st_size
+        while self._next_offset < file_size:
+            layout = self._read_layout(self._next_offset)
+            if layout is None:
+                return True
+            header_size, sizes, precision = layout
+            frame_size = header_size + sum(
+                sizes[key] for key in ['ir', 'e', 'box', 'vir', 'pres',
+                                       'top', 'sym', 'x', 'v', 'f']
+            )
+            if self._next_offset + frame_size > file_size:
+                return True
+            self.offsets.append(self._next_offset)
+            self._layouts.append(layout)
+            self._next_offset += frame_size
+        return False
+
+    def __len__(self):
+        self._reset_if_replaced()
+        self._scan()
+        return len(self.offsets)
+
+    def read_frame(self, frame_num):
+        """Read positions, velocities, and box vectors of a frame.
+
+        Parameters
+        ----------
+        frame_num : int
+            index of the frame in the file
+
+        Returns
+        -------
+        tuple of np.array
+            positions (n_atoms, 3), velocities (n_atoms, 3), and box
+            vectors (3, 3), as float32 in nm, nm/ps, and nm
+
+        Raises
+        ------
+        IndexError
+            if the frame does not exist (yet)
+        RuntimeError
+            if the frame is only partially written
+        ValueError
+            if the file is not a valid TRR file
+        """
+        if frame_num < 0:
+            raise IndexError("Negative frame number %d" % frame_num)
+        self._reset_if_replaced()
+        if frame_num >= len(self.offsets):
+            partial = self._scan()
+            if frame_num >= len(self.offsets):
+                if partial and frame_num == len(self.offsets):
+                    raise RuntimeError("TRR read error: frame %d of %s is "
+                                       "only partially written"
+                                       % (frame_num, self.filename))
+                raise IndexError("Frame %d not in %s (%d frames)"
+                                 % (frame_num, self.filename,
+                                    len(self.offsets)))
+
+        offset = self.offsets[frame_num]
+        header_size, sizes, precision = self._layouts[frame_num]
+        dtype = np.dtype('>f%d' % precision)
+        n_atoms = sizes['natoms']
+
+        self._file.seek(offset + header_size)
+        data = {}
+        for key in ['ir', 'e', 'box', 'vir', 'pres', 'top', 'sym', 'x', 'v',
+                    'f']:
+            block = self._file.read(sizes[key])
+            if key in ['box', 'x', 'v']:
+                data[key] = block
+
+        def as_array(block, shape):
+            if not block:
+                return None
+            values = np.frombuffer(block, dtype=dtype)
+            return values.reshape(shape).astype(np.float32)
+
+        return (as_array(data['x'], (n_atoms, 3)),
+                as_array(data['v'], (n_atoms, 3)),
+                as_array(data['box'], (3, 3)))
+
+
 class _GroFileEngine(ExternalEngine):
     SnapshotClass = ExternalMDSnapshot
     InternalizedSnapshotClass = InternalizedMDSnapshot
@@ -122,6 +296,23 @@ class GromacsEngine(ExternalEngine):
               You keep track of the unit, I'd advise ps so the output
               rates will be in ps. Example. 2 fs timestep in the mdp with
               nstxout of 30 would give snapshot_timestep of 60 fs = 0.06 ps
+            * ``tpr_inject_command``: If not empty, ``grompp`` is only run
+              once for each distinct content of the gro, mdp, and top files
+              (and ``grompp_args``), creating a template .tpr in the
+              ``{prefix}_tpr`` directory. The .tpr for each trajectory is
+              then created from the template by this command, which is
+              formatted with ``template`` (the template .tpr file), ``e``
+              (the engine; e.g., ``{e.input_file}`` and ``{e.tpr_file}``).
+              It must write ``e.tpr_file`` with the coordinates and
+              velocities of ``e.input_file``. For example, with Gromacs 4
+              this can be ``tpbconv -s {template} -f {e.input_file} -o
+              {e.tpr_file}``; Gromacs 4 has no ``gmx`` wrapper, so this
+              also needs ``gmx_executable=""``. Later versions of Gromacs
+              can't replace the coordinates of a .tpr file (``gmx
+              convert-tpr`` has no ``-f``), so a warning is given if this
+              is set while ``gmx_executable`` is a ``gmx`` command. Default
+              is the empty string, which runs ``grompp`` for every
+              trajectory.
 
     base_dir : string
         root directory where all files will be found (defaults to pwd)
@@ -133,13 +324,18 @@ class GromacsEngine(ExternalEngine):
             'gmx_executable': "gmx ",
             'grompp_args': "",
             'mdrun_args': "",
-            'snapshot_timestep':1.0
+            'snapshot_timestep':1.0,
+            'tpr_inject_command': "",
         }
     )
     GROMPP_CMD = ("{e.options[gmx_executable]}grompp -c {e.gro} "
                   + "-f {e.mdp} -p {e.top} -t {e.input_file} "
                   + "-po {e.mdout_file} -o {e.tpr_file} "
                   + "{e.options[grompp_args]}")
+    GROMPP_TEMPLATE_CMD = ("{e.options[gmx_executable]}grompp -c {e.gro} "
+                           + "-f {e.mdp} -p {e.top} "
+                           + "-po {e.mdout_file} -o {template} "
+                           + "{e.options[grompp_args]}")
     MDRUN_CMD = ("{e.options[gmx_executable]}mdrun -s {e.tpr_file} "
                  + "-o {e.output_file} -e {e.edr_file} -g {e.log_file} "
                  + "{mdrun_args}")
@@ -147,6 +343,9 @@ class GromacsEngine(ExternalEngine):
     SnapshotClass = ExternalMDSnapshot
     InternalizedSnapshotClass = InternalizedMDSnapshot
     clear_snapshot_cache = True
+    # number of TRR files kept open for reading frames
+    max_open_trr_files = 8
+
     def __init__(self, gro, mdp, top, options, base_dir="", prefix="gmx"):
         self.base_dir = base_dir
         self.gro = os.path.join(base_dir, gro)
@@ -166,8 +365,8 @@ class GromacsEngine(ExternalEngine):
             except OSError:
                 pass  # the directory already exists
 
-        self._file = None  # file open/close efficiency
-        self._last_filename = None
+        # persistent readers for TRR files, most recently used last
+        self._trr_readers = collections.OrderedDict()
         # TODO: add snapshot_timestep; first via options, later read mdp
         template = snapshot_from_gro(self.gro)
         self.topology = template.topology
@@ -185,6 +384,18 @@ class GromacsEngine(ExternalEngine):
 
         super(GromacsEngine, self).__init__(options, descriptor, template,
                                              first_frame_in_file=True)
+        self._check_tpr_inject_command()
+
+    def _check_tpr_inject_command(self):
+        # injecting coordinates into a .tpr is only possible in Gromacs 4,
+        # which doesn't use the gmx wrapper
+        gmx = self.options['gmx_executable'].split()
+        if (self.options['tpr_inject_command'] and gmx
+                and os.path.basename(gmx[0]).startswith('gmx')):
+            warnings.warn("tpr_inject_command needs Gromacs 4 (e.g., "
+                          "tpbconv), but gmx_executable is '"
+                          + self.options['gmx_executable'] + "'. Use "
+                          "gmx_executable='' with Gromacs 4.")
 
     def to_dict(self):
         dct = super(GromacsEngine, self).to_dict()
@@ -220,47 +431,56 @@ class GromacsEngine(ExternalEngine):
     def mdtraj_topology(self, value):
         self._mdtraj_topology = value
 
+    def __getstate__(self):
+        # open files cannot be pickled; readers are reopened when needed
+        state = self.__dict__.copy()
+        del state['_trr_readers']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._trr_readers = collections.OrderedDict()
+
+    def _trr_reader(self, filename):
+        try:
+            reader = self._trr_readers.pop(filename)
+        except KeyError:
+            reader = _TRRFrameIndex(filename)
+            while len(self._trr_readers) >= self.max_open_trr_files:
+                _, oldest = self._trr_readers.popitem(last=False)
+                oldest.close()
+        self._trr_readers[filename] = reader
+        return reader
+
+    def _forget_trr_reader(self, filename):
+        reader = self._trr_readers.pop(filename, None)
+        if reader is not None:
+            reader.close()
+
+    def close_trr_readers(self):
+        """Close all TRR files kept open for reading frames"""
+        for reader in self._trr_readers.values():
+            reader.close()
+        self._trr_readers.clear()
+
     def read_frame_data(self, filename, frame_num):
         """
         Returns pos, vel, box or raises error
         """
-        # if self._last_filename != filename:
-            # try:
-                # self._file.close()
-            # except AttributeError:
-                # pass  # first time thru, self._file is None
-            # self._file = TRRTrajectoryFile(filename)
-        # f = self._file
-        # do we need to reopen the TRR each time to avoid problems with the
-        # fiel length changing?
-        trr = TRRTrajectoryFile(filename)
-        f = trr
-        logger.debug("Reading file %s frame %d (of %d)",
-                     filename, frame_num, len(f))
-        # logger.debug("File length: %d", len(f))
-        try:
-            f.seek(offset=frame_num)
-            data = f._read(n_frames=1, atom_indices=None, get_velocities=True)
-        finally:
-            trr.close()
-
-        return data[0][0], data[5][0], data[3][0]
+        reader = self._trr_reader(filename)
+        logger.debug("Reading file %s frame %d (%d indexed)",
+                     filename, frame_num, len(reader.offsets))
+        return reader.read_frame(frame_num)
 
     def read_frame_from_file(self, file_name, frame_num):
         # note: this only needs to return the file pointers -- but should
         # only do so once that frame has been written!
-        basename = os.path.basename(file_name)
-        # basename should be in the format [0-9]+\.trr (as set by the
-        # trajectory_filename method)
-        # file_number = int(basename.split('.')[0])
         try:
             xyz, vel, box = self.read_frame_data(file_name, frame_num)
         except (IndexError, OSError, IOError) as e:
-            # this means that no such frame exists yet, so we return None
-            # IndexError in older version, OSError more recently (specific
-            # MDTraj error)
+            # this means that no such frame exists yet (or no file), so we
+            # return None
             logger.debug("Expected exception caught: " + str(e))
-            close_file_descriptors(basename)
             return None
         except RuntimeError as e:
             # TODO: matches "TRR read error"
@@ -281,6 +501,8 @@ class GromacsEngine(ExternalEngine):
             # you don't want them.
             raise RuntimeError("File " + str(filename) + " exists. "
                                + "Preventing overwrite.")
+        # a reader on an old file of the same name would be closed below
+        self._forget_trr_reader(filename)
         # type control before passing things to Cython code
         xyz = np.asarray([snapshot.xyz], dtype=np.float32)
         time = np.asarray([0.0], dtype=np.float32)
@@ -327,6 +549,33 @@ class GromacsEngine(ExternalEngine):
         cmd = self.GROMPP_CMD.format(e=self)
         return cmd
 
+    @property
+    def template_tpr_file(self):
+        """Template .tpr for the current gro/mdp/top contents"""
+        key = hashlib.sha1()
+        for digest in [self._gro_hash, self._mdp_hash, self._top_hash]:
+            key.update(digest)
+        key.update(self.options['grompp_args'].encode('utf-8'))
+        return os.path.join(self.prefix + "_tpr", key.hexdigest() + ".tpr")
+
+    @property
+    def grompp_template_command(self):
+        return self.GROMPP_TEMPLATE_CMD.format(e=self,
+                                               template=self.template_tpr_file)
+
+    @property
+    def tpr_inject_command(self):
+        return self.options['tpr_inject_command'].format(
+            e=self,
+            template=self.template_tpr_file
+        )
+
+    @staticmethod
+    def _run_command(cmd):  # pragma: no cover
+        logger.info(cmd)
+        run_cmd = shlex.split(cmd)
+        return psutil.Popen(run_cmd, preexec_fn=os.setsid).wait()
+
     def prepare(self):  # pragma: no cover
         # coverage ignored b/c Travis won't have gmx. However, we do have a
         # test that covers this if gmx is present (otherwise it is skipped)
@@ -336,12 +585,24 @@ class GromacsEngine(ExternalEngine):
         _ = ensure_file(self.mdp, self.mdp_contents, self._mdp_hash)
         _ = ensure_file(self.top, self.top_contents, self._top_hash)
 
-        # grompp and mdrun
-        cmd = self.grompp_command
-        logger.info(cmd)
-        run_cmd = shlex.split(cmd)
-        return_code = psutil.Popen(run_cmd, preexec_fn=os.setsid).wait()
-        return return_code
+        if not self.options['tpr_inject_command']:
+            # grompp and mdrun
+            return self._run_command(self.grompp_command)
+
+        template = self.template_tpr_file
+        if not os.path.isfile(template):
+            try:
+                os.mkdir(os.path.dirname(template))
+            except OSError:
+                pass  # the directory already exists
+            return_code = self._run_command(self.grompp_template_command)
+            if return_code != 0:
+                _remove_file_if_exists(template)
+                return return_code
+        else:
+            logger.info("Reusing template %s", template)
+
+        return self._run_command(self.tpr_inject_command)
 
     def cleanup(self):  # pragma: no cover
         # tested when traj is run, which we don't on CI
@@ -1,8 +1,15 @@
+import logging
+
 import numpy as np
 
-from openpathsampling.engines import DynamicsEngine, SnapshotDescriptor
+from openpathsampling.engines import (
+    DynamicsEngine, SnapshotDescriptor, Trajectory
+)
+from openpathsampling.engines.dynamics_engine import EngineMaxLengthError
 from .snapshot import ToySnapshot as Snapshot
 
+logger = logging.getLogger(__name__)
+
 
 class ToyEngine(DynamicsEngine):
     """Engine for toy models. Mostly used for 2D examples.
@@ -111,16 +118,17 @@ class ToyEngine(DynamicsEngine):
     def snapshot_timestep(self):
         return self.n_steps_per_frame * self.integ.dt
 
-    @property
-    def current_snapshot(self):
-        snap_pos = self.positions
-        snap_vel = self.velocities
+    def _make_snapshot(self, positions, velocities):
         return Snapshot(
-            coordinates=np.array([snap_pos]),
-            velocities=np.array([snap_vel]),
+            coordinates=np.array([positions]),
+            velocities=np.array([velocities]),
             engine=self
         )
 
+    @property
+    def current_snapshot(self):
+        return self._make_snapshot(self.positions, self.velocities)
+
     @current_snapshot.setter
     def current_snapshot(self, snap):
         self.check_snapshot_type(snap)
@@ -135,6 +143,123 @@ class ToyEngine(DynamicsEngine):
             self.integ.step(sys=self)
         return self.current_snapshot
 
+    def generate_batch(self, snapshots, running=None, direction=+1):
+        """Generate one trajectory per walker, integrating all walkers at once.
+
+        The positions and velocities of all walkers that are still running
+        are stored as ``(n_walkers, n_spatial)`` arrays, so that each
+        integrator step is a single call on the whole batch. The stopping
+        conditions are checked separately for each walker after every
+        frame, and walkers that stop are removed from the batch.
+
+        Parameters
+        ----------
+        snapshots : list of :class:`.ToySnapshot`
+            initial snapshot for each walker
+        running : (list of) function(:class:`.Trajectory`)
+            callable function of a 'Trajectory' that returns True or False.
+            If one of these returns False the walker is stopped.
+        direction : -1 or +1 (DynamicsEngine.FORWARD or DynamicsEngine.BACKWARD)
+            If +1 then this will integrate forward, if -1 it will reverse
+            the momenta of the given snapshots and prepend generated
+            snapshots with reversed momenta, as in :meth:`.generate`
+
+        Returns
+        -------
+        list of :class:`.Trajectory`
+            the generated trajectory for each walker, in the order of the
+            input snapshots
+
+        Notes
+        -----
+        Unlike :meth:`.generate`, there are no retries: if a walker hits
+        ``n_frames_max``, an ``EngineMaxLengthError`` is raised if
+        ``on_max_length`` is ``'fail'``; otherwise that walker stops.
+        """
+        if direction == 0:
+            raise RuntimeError(
+                'direction must be positive (FORWARD) or negative (BACKWARD).')
+
+        if running is None:
+            running = []
+        try:
+            iter(running)
+        except TypeError:
+            running = [running]
+
+        trajectories = [Trajectory([snap]) for snap in snapshots]
+        if direction > 0:
+            initial = list(snapshots)
+        else:
+            initial = [snap.reversed for snap in snapshots]
+
+        for snap in initial:
+            self.check_snapshot_type(snap)
+
+        max_length = self.options['n_frames_max'] or 0
+
+        active = [
+            idx for idx, traj in enumerate(trajectories)
+            if not self.stop_conditions(trajectory=traj,
+                                        continue_conditions=running,
+                                        trusted=False)
+        ]
+
+        old_positions = self.positions
+        old_velocities = self.velocities
+        try:
+            self.positions = np.array(
+                [initial[idx].coordinates[0] for idx in active], dtype=float
+            )
+            self.velocities = np.array(
+                [initial[idx].velocities[0] for idx in active], dtype=float
+            )
+            logger.info("Starting batch of %d walkers", len(active))
+            self.start()
+            while active:
+                for i in range(self.n_steps_per_frame):
+                    self.integ.step(sys=self)
+
+                keep = []
+                for row, idx in enumerate(active):
+                    traj = trajectories[idx]
+                    if 0 < max_length <= len(traj):
+                        if self.on_max_length == 'fail':
+                            raise EngineMaxLengthError(
+                                'Hit maximal length of %d frames.' %
+                                max_length,
+                                traj
+                            )
+                        logger.info('Walker %d hit max length. Stopping.',
+                                    idx)
+                        continue
+
+                    snapshot = self._make_snapshot(self.positions[row],
+                                                   self.velocities[row])
+                    if direction > 0:
+                        traj.append(snapshot)
+                    else:
+                        traj.insert(0, snapshot.reversed)
+
+                    if not self.stop_conditions(trajectory=traj,
+                                                continue_conditions=running):
+                        keep.append(row)
+
+                if len(keep) < len(active):
+                    active = [active[row] for row in keep]
+                    self.positions = self.positions[keep]
+                    self.velocities = self.velocities[keep]
+        finally:
+            self.positions = old_positions
+            self.velocities = old_velocities
+
+        for traj in trajectories:
+            self.stop(traj)
+
+        logger.info("Finished batch, lengths: %s",
+                    [len(traj) for traj in trajectories])
+        return trajectories
+
     def n_degrees_of_freedom(self):
         topol = self.topology
         return topol.n_atoms * topol.n_spatial
@@ -8,6 +8,12 @@ from openpathsampling.netcdfplus import StorableObject
 
 class PES(StorableObject):
     """Abstract base class for toy potential energy surfaces.
+
+    The positions of ``sys`` can either be a single configuration of shape
+    ``(n_spatial,)`` or a batch of walkers of shape
+    ``(n_walkers, n_spatial)``. Implementations of ``V`` and ``dVdx`` must
+    act on the last axis, so that they return one energy (and one gradient)
+    per walker.
     """
     # For now, we only support additive combinations; maybe someday that can
     # include multiplication, too
@@ -31,7 +37,26 @@ class PES(StorableObject):
         """
         v = sys.velocities
         m = sys.mass
-        return 0.5*np.dot(m, np.multiply(v, v))
+        return 0.5*np.dot(np.multiply(v, v), m)
+
+    def V_and_dVdx(self, sys):
+        """Potential energy and its derivative, in one call.
+
+        Subclasses can override this to share the work common to both.
+
+        Parameters
+        ----------
+        sys : :class:`.ToyEngine`
+            engine contains its state, including velocities and masses
+
+        Returns
+        -------
+        float
+            the potential energy
+        np.array
+            the derivatives of the potential at this point
+        """
+        return self.V(sys), self.dVdx(sys)
 
 
 class PES_Combination(PES):
@@ -39,6 +64,12 @@ class PES_Combination(PES):
 
     Abstract base class.
 
+    Subclasses that are linear combinations (see ``_coefficients``) are
+    flattened into a single list of ``(coefficient, PES)`` terms, so that
+    a nested sum like ``walls + gauss1 + gauss2 - slope`` is evaluated in
+    one pass over its leaves, with the derivative accumulated in a single
+    array instead of allocating an intermediate array at every node.
+
     Parameters
     ----------
     pes1 : :class:`.PES`
@@ -50,12 +81,80 @@ class PES_Combination(PES):
     dfdx_fcn : function of two variables
         function to combine the PES (first) derivatives
     """
+    # (c1, c2) such that this is c1 * pes1 + c2 * pes2; None if nonlinear
+    _coefficients = None
+
     def __init__(self, pes1, pes2, fcn, dfdx_fcn):
         super(PES_Combination, self).__init__()
         self.pes1 = pes1
         self.pes2 = pes2
         self._fcn = fcn
         self._dfdx_fcn = dfdx_fcn
+        self._terms = None
+
+    def _flat_terms(self, coefficient):
+        terms = []
+        for pes, coeff in zip([self.pes1, self.pes2], self._coefficients):
+            if isinstance(pes, PES_Combination) \
+                    and pes._coefficients is not None:
+                terms.extend(pes._flat_terms(coefficient * coeff))
+            else:
+                terms.append((coefficient * coeff, pes))
+        return terms
+
+    def compile(self):
+        """Flatten the combination tree into a list of leaf terms.
+
+        Repeated occurrences of the same PES object are merged into one
+        term, and terms that cancel are dropped. This is done automatically
+        on first evaluation; call it again if ``pes1`` or ``pes2`` (or any
+        of their children) are replaced.
+
+        Returns
+        -------
+        list of (float, :class:`.PES`)
+            the coefficient and the PES of each term
+        """
+        if self._coefficients is None:
+            self._terms = [(1.0, self)]
+            return self._terms
+
+        merged = {}
+        order = []
+        for coeff, pes in self._flat_terms(1.0):
+            key = id(pes)
+            if key in merged:
+                merged[key][0] += coeff
+            else:
+                merged[key] = [coeff, pes]
+                order.append(key)
+
+        self._terms = [(merged[key][0], merged[key][1]) for key in order
+                       if merged[key][0] != 0]
+        return self._terms
+
+    @property
+    def terms(self):
+        """list of (float, :class:`.PES`): flattened linear combination"""
+        if self._terms is None:
+            self.compile()
+        return self._terms
+
+    @staticmethod
+    def _zeroed(sys, out):
+        if out is None:
+            return np.zeros(np.shape(sys.positions))
+        out.fill(0.0)
+        return out
+
+    @staticmethod
+    def _accumulate(out, coeff, value):
+        if coeff == 1.0:
+            np.add(out, value, out=out)
+        elif coeff == -1.0:
+            np.subtract(out, value, out=out)
+        else:
+            out += coeff * np.asarray(value)
 
     def V(self, sys):
         """Potential energy
@@ -70,22 +169,70 @@ class PES_Combination(PES):
         float
             the potential energy
         """
-        return self._fcn(self.pes1.V(sys), self.pes2.V(sys))
+        if self._coefficients is None:
+            return self._fcn(self.pes1.V(sys), self.pes2.V(sys))
 
-    def dVdx(self, sys):
+        V = 0.0
+        for coeff, pes in self.terms:
+            V = V + coeff * pes.V(sys)
+        return V
+
+    def dVdx(self, sys, out=None):
         """Derivative of potential energy (-force)
 
         Parameters
         ----------
         sys : :class:`.ToyEngine`
             engine contains its state, including velocities and masses
+        out : np.array or None
+            array (of the shape of the positions) to write the result to,
+            e.g., to reuse it between calls. If `None` (default), a new
+            array is returned.
+
+        Returns
+        -------
+        np.array
+            the derivatives of the potential at this point
+        """
+        if self._coefficients is None:
+            dVdx = self._dfdx_fcn(self.pes1.dVdx(sys), self.pes2.dVdx(sys))
+            if out is None:
+                return dVdx
+            out[...] = dVdx
+            return out
+
+        dVdx = self._zeroed(sys, out)
+        for coeff, pes in self.terms:
+            self._accumulate(dVdx, coeff, pes.dVdx(sys))
+        return dVdx
+
+    def V_and_dVdx(self, sys, out=None):
+        """Potential energy and its derivative, in one pass over the terms
+
+        Parameters
+        ----------
+        sys : :class:`.ToyEngine`
+            engine contains its state, including velocities and masses
+        out : np.array or None
+            array to write the derivatives to, see :meth:`.dVdx`
 
         Returns
         -------
+        float
+            the potential energy
         np.array
             the derivatives of the potential at this point
         """
-        return self._dfdx_fcn(self.pes1.dVdx(sys), self.pes2.dVdx(sys))
+        if self._coefficients is None:
+            return self.V(sys), self.dVdx(sys, out)
+
+        V = 0.0
+        dVdx = self._zeroed(sys, out)
+        for coeff, pes in self.terms:
+            term_V, term_dVdx = pes.V_and_dVdx(sys)
+            V = V + coeff * term_V
+            self._accumulate(dVdx, coeff, term_dVdx)
+        return V, dVdx
 
 
 class PES_Sub(PES_Combination):
@@ -98,6 +245,8 @@ class PES_Sub(PES_Combination):
     pes2 : :class:`.PES`
         second potential energy surface of the combination
     """
+    _coefficients = (1.0, -1.0)
+
     def __init__(self, pes1, pes2):
         super(PES_Sub, self).__init__(
             pes1,
@@ -117,6 +266,8 @@ class PES_Add(PES_Combination):
     pes2 : :class:`.PES`
         second potential energy surface of the combination
     """
+    _coefficients = (1.0, 1.0)
+
     def __init__(self, pes1, pes2):
         super(PES_Add, self).__init__(
             pes1,
@@ -169,7 +320,7 @@ class HarmonicOscillator(PES):
         """
         dx = sys.positions - self.x0
         k = self.omega*self.omega*sys.mass
-        return 0.5*np.dot(self.A * k, dx * dx)
+        return 0.5*np.dot(dx * dx, self.A * k)
 
     def dVdx(self, sys):
         """Derivative of potential energy (-force)
@@ -188,6 +339,11 @@ class HarmonicOscillator(PES):
         k = self.omega*self.omega*sys.mass
         return self.A*k*dx
 
+    def V_and_dVdx(self, sys):
+        dx = sys.positions - self.x0
+        dVdx = self.A*self.omega*self.omega*sys.mass*dx
+        return 0.5*np.sum(dx * dVdx, axis=-1), dVdx
+
 
 class Gaussian(PES):
     r"""Gaussian given by: :math:`A*exp(-\sum_i alpha[i]*(x[i]-x0[i])^2)`
@@ -206,7 +362,6 @@ class Gaussian(PES):
         self.A = A
         self.alpha = np.array(alpha)
         self.x0 = np.array(x0)
-        self._local_dVdx = np.zeros(self.x0.size)
 
     def to_dict(self):
         dct = super(Gaussian, self).to_dict()
@@ -231,7 +386,7 @@ class Gaussian(PES):
             the potential energy
         """
         dx = sys.positions - self.x0
-        return self.A*np.exp(-np.dot(self.alpha, np.multiply(dx, dx)))
+        return self.A*np.exp(-np.dot(np.multiply(dx, dx), self.alpha))
 
     def dVdx(self, sys):
         """Derivative of potential energy (-force)
@@ -247,10 +402,13 @@ class Gaussian(PES):
             the derivatives of the potential at this point
         """
         dx = sys.positions - self.x0
-        exp_part = self.A*np.exp(-np.dot(self.alpha, np.multiply(dx, dx)))
-        for i in range(len(dx)):
-            self._local_dVdx[i] = -2*self.alpha[i]*dx[i]*exp_part
-        return self._local_dVdx
+        exp_part = self.A*np.exp(-np.dot(np.multiply(dx, dx), self.alpha))
+        return -2*self.alpha*dx*np.expand_dims(exp_part, -1)
+
+    def V_and_dVdx(self, sys):
+        dx = sys.positions - self.x0
+        V = self.A*np.exp(-np.dot(np.multiply(dx, dx), self.alpha))
+        return V, -2*self.alpha*dx*np.expand_dims(V, -1)
 
 
 class OuterWalls(PES):
@@ -269,7 +427,6 @@ class OuterWalls(PES):
         super(OuterWalls, self).__init__()
         self.sigma = np.array(sigma)
         self.x0 = np.array(x0)
-        self._local_dVdx = np.zeros(self.x0.size)
 
     def to_dict(self):
         dct = super(OuterWalls, self).to_dict()
@@ -294,10 +451,7 @@ class OuterWalls(PES):
             the potential energy
         """
         dx = sys.positions - self.x0
-        myV = 0.0
-        for i in range(len(dx)):
-            myV += self.sigma[i]*dx[i]**6
-        return myV
+        return np.dot(dx**6, self.sigma)
 
     def dVdx(self, sys):
         """Derivative of potential energy (-force)
@@ -313,9 +467,12 @@ class OuterWalls(PES):
             the derivatives of the potential at this point
         """
         dx = sys.positions - self.x0
-        for i in range(len(dx)):
-            self._local_dVdx[i] = 6.0*self.sigma[i]*dx[i]**5
-        return self._local_dVdx
+        return 6.0*self.sigma*dx**5
+
+    def V_and_dVdx(self, sys):
+        dx = sys.positions - self.x0
+        dx5 = dx**5
+        return np.dot(dx5 * dx, self.sigma), 6.0*self.sigma*dx5
 
 
 class LinearSlope(PES):
@@ -351,7 +508,7 @@ class LinearSlope(PES):
         float
             the potential energy
         """
-        return np.dot(self.m, sys.positions) + self.c
+        return np.dot(sys.positions, self.m) + self.c
 
     def dVdx(self, sys):
         """Derivative of potential energy (-force)
@@ -413,7 +570,7 @@ class DoubleWell(PES):
             the potential energy
         """
         dx2 = sys.positions * sys.positions - self.x0 * self.x0
-        return np.dot(self.A, dx2 * dx2)
+        return np.dot(dx2 * dx2, self.A)
 
     def dVdx(self, sys):
         """Derivative of potential energy (-force)
@@ -430,3 +587,7 @@ class DoubleWell(PES):
         """
         dx2 = sys.positions * sys.positions - self.x0 * self.x0
         return 4 * self.A * sys.positions * dx2
+
+    def V_and_dVdx(self, sys):
+        dx2 = sys.positions * sys.positions - self.x0 * self.x0
+        return np.dot(dx2 * dx2, self.A), 4 * self.A * sys.positions * dx2
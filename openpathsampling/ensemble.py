@@ -8,6 +8,8 @@ import abc
 import logging
 import itertools
 
+import numpy as np
+
 from openpathsampling.netcdfplus import StorableNamedObject
 import openpathsampling as paths
 
@@ -71,6 +73,17 @@ def _get_list_traj(trajectory):
     return list(itraj())
 
 
+def _in_volume(volume, snapshot):
+    """Whether the snapshot is in the volume, using the volume's memo
+
+    See :class:`.VolumeMembershipMemo`.
+    """
+    memo = getattr(volume, '_membership_memo', None)
+    if memo is not None:
+        return memo.is_in(volume, snapshot)
+    return volume(snapshot)
+
+
 # note: the cache is not storable, because that would just be silly!
 class EnsembleCache(object):
     """Object used by ensembles to enable fast algorithms for basic functions.
@@ -224,6 +237,25 @@ class EnsembleCache(object):
 
         return reset
 
+    def extend(self, frames):
+        """Record frames added to the last checked trajectory.
+
+        This is used when several frames have been checked at once: a later
+        check of the trajectory including these frames then finds the cache
+        valid.
+
+        Parameters
+        ----------
+        frames : list of :class:`openpathsampling.snapshot.Snapshot`
+            the added frames, in the order they were added
+        """
+        if len(frames) == 0:
+            return
+        self.prev_last_frame = frames[-1]
+        self.last_length += len(frames)
+        if self.direction > 0:
+            self.prev_last_index = self.last_length - 1
+
 
 class Ensemble(with_metaclass(abc.ABCMeta, StorableNamedObject)):
     """
@@ -404,6 +436,55 @@ class Ensemble(with_metaclass(abc.ABCMeta, StorableNamedObject)):
         # default behavior is to be the same as can_prepend
         return self.can_prepend(trajectory, trusted)
 
+    def can_append_frames(self, trajectory, frames):
+        """
+        Results of `can_append` while appending several frames one by one.
+
+        Ensembles that can check several new frames at once override this.
+        Dynamics engines use it to check blocks of frames.
+
+        Parameters
+        ----------
+        trajectory : :class:`openpathsampling.trajectory.Trajectory`
+            the trajectory so far, which has already been checked
+        frames : list of :class:`openpathsampling.snapshot.Snapshot`
+            the frames to append, in order
+
+        Returns
+        -------
+        list of bool or None
+            the result of ``can_append(trajectory + frames[:i+1],
+            trusted=True)`` for each ``i``, up to and including the first
+            `False`. `None` if the ensemble can't check several frames at
+            once; `can_append` must then be used for each frame.
+        """
+        return None
+
+    def can_prepend_frames(self, trajectory, frames):
+        """
+        Results of `can_prepend` while prepending several frames one by one.
+
+        Parameters
+        ----------
+        trajectory : :class:`openpathsampling.trajectory.Trajectory`
+            the trajectory so far, which has already been checked
+        frames : list of :class:`openpathsampling.snapshot.Snapshot`
+            the frames to prepend, in order: each frame goes before the
+            previous one
+
+        Returns
+        -------
+        list of bool or None
+            the result of `can_prepend` with ``trusted=True`` for each
+            frame that is prepended, up to and including the first `False`.
+            `None` if the ensemble can't check several frames at once.
+
+        See Also
+        --------
+        can_append_frames
+        """
+        return None
+
     def iter_valid_slices(
             self,
             trajectory,
@@ -1462,6 +1543,276 @@ class IntersectionEnsemble(EnsembleCombination):
 #             str_fnc='{0}\nand not\n{1}')
 
 
+class _SegmentAutomaton(object):
+    """Frame-by-frame automaton for a subensemble of a SequentialEnsemble.
+
+    The state describes a (growing) subtrajectory. Each frame is given as
+    an integer bitmask: bit ``i`` is set if the frame is in the ``i``-th
+    volume of the :class:`._SequentialAutomaton`. The state must be
+    hashable; the empty subtrajectory has the state ``initial``.
+    """
+    initial = 0
+
+    def step(self, state, mask):
+        raise NotImplementedError  # pragma: no cover
+
+    def can_append(self, state):
+        raise NotImplementedError  # pragma: no cover
+
+    def accepts(self, state):
+        raise NotImplementedError  # pragma: no cover
+
+
+class _AllInAutomaton(_SegmentAutomaton):
+    # states: 0 = empty, 1 = all frames in, 2 = some frame out
+    def __init__(self, bit):
+        self.bit = bit
+
+    def step(self, state, mask):
+        return 1 if state != 2 and mask & self.bit else 2
+
+    def can_append(self, state):
+        return state != 2
+
+    def accepts(self, state):
+        return state == 1
+
+
+class _PartInAutomaton(_SegmentAutomaton):
+    # states: 0 = no frame in, 1 = some frame in
+    def __init__(self, bit):
+        self.bit = bit
+
+    def step(self, state, mask):
+        return 1 if state or mask & self.bit else 0
+
+    def can_append(self, state):
+        return True
+
+    def accepts(self, state):
+        return state == 1
+
+
+class _LengthAutomaton(_SegmentAutomaton):
+    # state: length of the subtrajectory, capped where nothing changes
+    def __init__(self, length):
+        self.length = length
+        if type(length) is int:
+            self.cap = length + 1
+        elif length.stop is not None:
+            self.cap = length.stop
+        else:
+            self.cap = length.start
+
+    def step(self, state, mask):
+        return min(state + 1, self.cap)
+
+    def can_append(self, state):
+        if type(self.length) is int:
+            return state < self.length
+        return self.length.stop is None or state < self.length.stop - 1
+
+    def accepts(self, state):
+        if type(self.length) is int:
+            return state == self.length
+        return state >= self.length.start and (
+            self.length.stop is None or state < self.length.stop)
+
+
+class _ConstantAutomaton(_SegmentAutomaton):
+    def __init__(self, value):
+        self.value = value
+
+    def step(self, state, mask):
+        return 0
+
+    def can_append(self, state):
+        return self.value
+
+    def accepts(self, state):
+        return self.value
+
+
+class _CombinationAutomaton(_SegmentAutomaton):
+    def __init__(self, automaton1, automaton2, use_and):
+        self.automaton1 = automaton1
+        self.automaton2 = automaton2
+        self.use_and = use_and
+        self.initial = (automaton1.initial, automaton2.initial)
+
+    def _combine(self, a, b):
+        return (a and b) if self.use_and else (a or b)
+
+    def step(self, state, mask):
+        return (self.automaton1.step(state[0], mask),
+                self.automaton2.step(state[1], mask))
+
+    def can_append(self, state):
+        return self._combine(self.automaton1.can_append(state[0]),
+                             self.automaton2.can_append(state[1]))
+
+    def accepts(self, state):
+        return self._combine(self.automaton1.accepts(state[0]),
+                             self.automaton2.accepts(state[1]))
+
+
+def _compile_segment(ensemble, volumes):
+    """Build the :class:`._SegmentAutomaton` for an ensemble.
+
+    Volumes are added to ``volumes`` as needed. Returns None if the ensemble
+    is not made only from volume-based and length-based ensembles.
+    """
+    def volume_bit(volume):
+        for (i, vol) in enumerate(volumes):
+            if vol is volume:
+                return 1 << i
+        volumes.append(volume)
+        return 1 << (len(volumes) - 1)
+
+    ens_type = type(ensemble)
+    if ens_type in (AllInXEnsemble, AllOutXEnsemble):
+        return _AllInAutomaton(volume_bit(ensemble._volume))
+    elif ens_type in (PartInXEnsemble, PartOutXEnsemble):
+        return _PartInAutomaton(volume_bit(ensemble._volume))
+    elif ens_type is LengthEnsemble:
+        length = ensemble.length
+        if type(length) is int or (isinstance(length, slice)
+                                   and type(length.start) is int):
+            return _LengthAutomaton(length)
+    elif ens_type in (FullEnsemble, EmptyEnsemble):
+        return _ConstantAutomaton(ens_type is FullEnsemble)
+    elif ens_type in (IntersectionEnsemble, UnionEnsemble):
+        automaton1 = _compile_segment(ensemble.ensemble1, volumes)
+        automaton2 = _compile_segment(ensemble.ensemble2, volumes)
+        if automaton1 is not None and automaton2 is not None:
+            return _CombinationAutomaton(
+                automaton1, automaton2,
+                use_and=(ens_type is IntersectionEnsemble)
+            )
+    elif ens_type in (OptionalEnsemble, SingleFrameEnsemble,
+                      AppendedNameEnsemble):
+        return _compile_segment(ensemble._new_ensemble, volumes)
+    return None
+
+
+class _SequentialAutomaton(object):
+    """Finite-state automaton for `SequentialEnsemble.can_append`.
+
+    This reproduces the decision tree of `can_append` (or, with reversed
+    subensembles and frames, of `can_prepend`). That algorithm assigns the
+    frames greedily to the subensembles. If that fails (and not `strict`),
+    it starts over, assigning the first frames to the next subensemble. All
+    of these attempts are tracked at once, so each frame is only processed
+    once.
+
+    A state is identified by an integer. The states and the transitions
+    between them are created when they are first needed, so each new frame
+    usually costs a single dictionary lookup.
+
+    Parameters
+    ----------
+    segments : list of :class:`._SegmentAutomaton`
+        automata for the subensembles, in the order frames are assigned
+    volumes : list of :class:`.Volume`
+        the volumes that define the bits of the frame masks
+    strict : bool
+        if True, the first frame must be in the first subensemble
+    """
+    _FAILED = "failed"      # this attempt failed; try the next one
+    _REJECTED = "rejected"  # can't append, however the trajectory goes on
+
+    def __init__(self, segments, volumes, strict):
+        self.segments = segments
+        self.volumes = volumes
+        self._program = paths.VolumeProgram(volumes)
+        n_attempts = 1 if strict else len(segments)
+        initial = tuple((first_ens, False, segments[first_ens].initial)
+                        for first_ens in range(n_attempts))
+        self._state_ids = {}
+        self._states = []
+        self._results = []
+        self._transitions = {}
+        self.initial = self._state_id(initial)
+
+    def _state_id(self, state):
+        try:
+            return self._state_ids[state]
+        except KeyError:
+            state_id = len(self._states)
+            self._state_ids[state] = state_id
+            self._states.append(state)
+            self._results.append(self._result(state))
+            return state_id
+
+    def _advance(self, attempt, mask):
+        last_ens = len(self.segments) - 1
+        while attempt not in (self._FAILED, self._REJECTED):
+            (ens_num, nonempty, sub_state) = attempt
+            segment = self.segments[ens_num]
+            new_sub_state = segment.step(sub_state, mask)
+            if (segment.can_append(new_sub_state)
+                    or segment.accepts(new_sub_state)):
+                return (ens_num, True, new_sub_state)
+            elif nonempty:
+                # frame ends this subtrajectory
+                if ens_num == last_ens:
+                    return self._REJECTED
+            elif not segment.accepts(segment.initial):
+                return self._FAILED
+            # frame starts the subtrajectory for the next subensemble
+            attempt = (ens_num + 1, False,
+                       self.segments[ens_num + 1].initial)
+        return attempt
+
+    def _result(self, state):
+        for attempt in state:
+            if attempt == self._FAILED:
+                continue
+            elif attempt == self._REJECTED:
+                return False
+            (ens_num, nonempty, sub_state) = attempt
+            if ens_num == len(self.segments) - 1:
+                return self.segments[ens_num].can_append(sub_state)
+            return True
+        return False
+
+    def frame_masks(self, frames):
+        """Bitmasks of volume membership for a list of frames"""
+        if len(frames) == 1:
+            # avoid the numpy overhead for the frame-by-frame case
+            return [sum(1 << i for (i, volume) in enumerate(self.volumes)
+                        if _in_volume(volume, frames[0]))]
+        in_volumes = self._program.frames_in(frames).astype(int)
+        masks = np.zeros(len(frames), dtype=int)
+        for (i, in_volume) in enumerate(in_volumes):
+            masks |= in_volume << i
+        return masks.tolist()
+
+    def step(self, state_id, mask):
+        """State (ID) after appending a frame with the given mask"""
+        key = (state_id, mask)
+        try:
+            return self._transitions[key]
+        except KeyError:
+            state = self._states[state_id]
+            new_state = tuple(self._advance(attempt, mask)
+                              for attempt in state)
+            new_id = self._state_id(new_state)
+            self._transitions[key] = new_id
+            return new_id
+
+    def run(self, frames):
+        """State (ID) after all frames, starting from the initial state"""
+        state_id = self.initial
+        for mask in self.frame_masks(frames):
+            state_id = self.step(state_id, mask)
+        return state_id
+
+    def result(self, state_id):
+        """Result of `can_append` for a trajectory in the given state"""
+        return self._results[state_id]
+
+
 class SequentialEnsemble(Ensemble):
     """Ensemble which satisfies several subensembles in sequence.
 
@@ -1492,6 +1843,13 @@ class SequentialEnsemble(Ensemble):
     -----
         TODO: Overlap features not implemented because ohmygod this was hard
         enough already.
+
+        If all subensembles are built from volume ensembles (e.g.,
+        :class:`.AllInXEnsemble`, :class:`.PartOutXEnsemble`),
+        :class:`.LengthEnsemble`, and their combinations, `can_append` and
+        `can_prepend` (and the strict versions) are calculated by a
+        finite-state automaton, which only needs to look at each new frame
+        once.
     """
 
     def __init__(self, ensembles, min_overlap=0, max_overlap=0, greedy=False):
@@ -1508,6 +1866,7 @@ class SequentialEnsemble(Ensemble):
         self.greedy = greedy
 
         self._use_cache = True  # cache can be turned off
+        self._use_automaton = True  # automaton can be turned off
         self._cache_can_append = EnsembleCache(+1)
         self._cache_strict_can_append = EnsembleCache(+1)
         self._cache_call = EnsembleCache(+1)
@@ -1515,6 +1874,7 @@ class SequentialEnsemble(Ensemble):
         self._cache_strict_can_prepend = EnsembleCache(-1)
         self._cache_check_reverse = EnsembleCache(-1)
         self._zero_traj = paths.Trajectory([])
+        self._automata = {}
 
         # sanity checks
         if len(self.min_overlap) != len(self.max_overlap):
@@ -1710,6 +2070,99 @@ class SequentialEnsemble(Ensemble):
                          str(subtraj_final) + " / " + str(len(traj)))
         return subtraj_first + 1
 
+    def _get_automaton(self, direction, strict):
+        """Automaton for `can_append` (direction > 0) or `can_prepend`.
+
+        Returns None if the automaton can't reproduce the results of
+        `_generic_can_append`/`_generic_can_prepend`.
+        """
+        if not self._use_automaton:
+            return None
+        key = (direction, strict)
+        try:
+            return self._automata[key]
+        except KeyError:
+            pass
+
+        ensembles = list(self.ensembles)
+        if direction < 0:
+            ensembles.reverse()
+        volumes = []
+        segments = [_compile_segment(ens, volumes) for ens in ensembles]
+        overlaps = list(self.min_overlap) + list(self.max_overlap)
+        # if the last subensemble (in the direction we assign frames)
+        # allows zero frames, the decision tree would go past the end of
+        # self.ensembles
+        if (None in segments or any(overlaps)
+                or segments[-1].accepts(segments[-1].initial)):
+            automaton = None
+        else:
+            automaton = _SequentialAutomaton(segments, volumes, strict)
+        self._automata[key] = automaton
+        return automaton
+
+    def _automaton_can_extend(self, automaton, cache, trajectory):
+        state_id = self._automaton_state(automaton, cache, trajectory)
+        return automaton.result(state_id)
+
+    def _automaton_state(self, automaton, cache, trajectory):
+        # the state of the automaton is cached with the length of the
+        # trajectory, so that one more frame only requires one step
+        n_frames = len(trajectory)
+        state_id = None
+        if self._use_cache and not cache.check(trajectory):
+            state_id = cache.contents.get('automaton_state')
+            prev_n_frames = cache.contents.get('automaton_length')
+            if state_id is not None and n_frames == prev_n_frames + 1:
+                get_frame = getattr(trajectory, "get_as_proxy",
+                                    trajectory.__getitem__)
+                frame = get_frame(-(cache.direction + 1) // 2)
+                mask = automaton.frame_masks([frame])[0]
+                state_id = automaton.step(state_id, mask)
+            elif n_frames != prev_n_frames:
+                state_id = None
+
+        if state_id is None:
+            frames = _get_list_traj(trajectory)
+            if cache.direction < 0:
+                frames.reverse()
+            state_id = automaton.run(frames)
+
+        if self._use_cache:
+            cache.contents['automaton_state'] = state_id
+            cache.contents['automaton_length'] = n_frames
+        return state_id
+
+    def _automaton_extend_frames(self, direction, cache, trajectory,
+                                 frames):
+        automaton = self._get_automaton(direction, strict=False)
+        if automaton is None or len(trajectory) == 0:
+            return None
+
+        state_id = self._automaton_state(automaton, cache, trajectory)
+        results = []
+        # the volumes are evaluated for all frames at once
+        for mask in automaton.frame_masks(frames):
+            state_id = automaton.step(state_id, mask)
+            results.append(automaton.result(state_id))
+            if not results[-1]:
+                break
+
+        if self._use_cache:
+            cache.extend(frames[:len(results)])
+            cache.contents['automaton_state'] = state_id
+            cache.contents['automaton_length'] = len(trajectory) + \
+                len(results)
+        return results
+
+    def can_append_frames(self, trajectory, frames):
+        return self._automaton_extend_frames(
+            +1, self._cache_can_append, trajectory, frames)
+
+    def can_prepend_frames(self, trajectory, frames):
+        return self._automaton_extend_frames(
+            -1, self._cache_can_prepend, trajectory, frames)
+
     def _generic_can_append(self, trajectory, trusted, strict):
         # treat this like we're implementing a regular expression parser ...
         # .*ensemble.+ ; but we have to do this for all possible matches
@@ -1727,6 +2180,10 @@ class SequentialEnsemble(Ensemble):
         if strict:
             cache = self._cache_strict_can_append
 
+        automaton = self._get_automaton(+1, strict)
+        if automaton is not None and len(trajectory) > 0:
+            return self._automaton_can_extend(automaton, cache, trajectory)
+
         if trusted:
             cache.trusted = True
 
@@ -1908,6 +2365,11 @@ class SequentialEnsemble(Ensemble):
         cache = self._cache_can_prepend
         if strict:
             cache = self._cache_strict_can_prepend
+
+        automaton = self._get_automaton(-1, strict)
+        if automaton is not None and len(trajectory) > 0:
+            return self._automaton_can_extend(automaton, cache, trajectory)
+
         if trusted:
             cache.trusted = True
 
@@ -2224,7 +2686,7 @@ class AllInXEnsemble(VolumeEnsemble):
             get_frame = getattr(trajectory, "get_as_proxy",
                                 trajectory.__getitem__)
             frame = get_frame(frame_num)
-            cache.contents['previous'] = self._volume(frame)
+            cache.contents['previous'] = _in_volume(self._volume, frame)
             return cache.contents['previous']
         else:
             # cached_val is false, result must be false
@@ -2260,11 +2722,10 @@ class AllInXEnsemble(VolumeEnsemble):
             logger.debug("Untrusted VolumeEnsemble " + repr(self))
             # logger.debug("Trajectory " + repr(trajectory))
             # This can sometimes get a list instead of a Trajectory
-            # Make sure this is a proxy list
-            for frame in _get_list_traj(trajectory):
-                if not self._volume(frame):
-                    return False
-            return True
+            # Make sure this is a proxy list; all frames are evaluated in
+            # one batch (e.g., one call to the CV)
+            frames = _get_list_traj(trajectory)
+            return bool(np.all(self._volume.frames_in(frames)))
 
     def check_reverse(self, trajectory, trusted=False):
         # order in this one only matters if it is trusted
@@ -2320,10 +2781,9 @@ class PartInXEnsemble(VolumeEnsemble):
         trajectory : :class:`openpathsampling.trajectory.Trajectory`
             The trajectory to be checked
         """
-        for frame in _get_list_traj(trajectory):
-            if self._volume(frame):
-                return True
-        return False
+        # all frames are evaluated in one batch (e.g., one call to the CV)
+        frames = _get_list_traj(trajectory)
+        return bool(np.any(self._volume.frames_in(frames)))
 
     def __invert__(self):
         return AllOutXEnsemble(self.volume, self.trusted)
@@ -2349,10 +2809,8 @@ class PartOutXEnsemble(PartInXEnsemble):
 
     def __call__(self, trajectory, trusted=None, candidate=False):
         # Don't load proxies if this is a Trajectory
-        for frame in _get_list_traj(trajectory):
-            if self._volume(frame):
-                return True
-        return False
+        frames = _get_list_traj(trajectory)
+        return bool(np.any(self._volume.frames_in(frames)))
 
 
 class WrappedEnsemble(Ensemble):
@@ -2515,6 +2973,17 @@ class PrefixTrajectoryEnsemble(WrappedEnsemble):
 
         return self._cached_trajectory
 
+    def can_append_frames(self, trajectory, frames):
+        results = self._new_ensemble.can_append_frames(
+            self._alter(trajectory), frames)
+        if results is not None:
+            # keep the prefixed trajectory in line with `trajectory` once
+            # the frames have been appended to it
+            checked = frames[:len(results)]
+            self._cached_trajectory.extend(checked)
+            self._cache_can_append.extend(checked)
+        return results
+
     def can_prepend(self, trajectory, trusted=None):
         raise RuntimeError("PrefixTrajectoryEnsemble.can_prepend is nonsense.")
 
@@ -399,14 +399,16 @@ class StorableFunction(StorableNamedObject):
         if self.func is None and uuid_items:
             raise RuntimeError("No function attached to %s. Can not "
                                + "evaluate for %s." % (self, uuid_items))
-        values = list(uuid_items.values())
+        postprocessed = self._eval_values(list(uuid_items.values()))
+        results = dict(zip(uuid_items.keys(), postprocessed))
+        return results, {}
+
+    def _eval_values(self, values):
+        """Evaluate the function for a list of values, without caching"""
         preprocessed = self.func_config.item_preprocess(values)
         preprocessed = self.func_config.list_preprocess(preprocessed)
         values = [self.func(item, **self.kwargs) for item in preprocessed]
-        postprocessed = [self.func_config.item_postprocess(val)
-                         for val in values]
-        results = dict(zip(uuid_items.keys(), postprocessed))
-        return results, {}
+        return [self.func_config.item_postprocess(val) for val in values]
 
     def _get_cached(self, uuid_items):
         return self.local_cache.get_results_as_dict(uuid_items)
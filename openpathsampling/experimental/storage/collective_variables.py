@@ -1,3 +1,5 @@
+import dill
+
 import openpathsampling as paths
 
 from ..simstore.storable_functions import (
@@ -7,13 +9,52 @@ from ..simstore.storable_functions import (
 from openpathsampling.netcdfplus import StorableNamedObject
 from ..simstore.serialization_helpers import get_uuid
 
+
+class StorableFunctionTask(object):
+    """Evaluation of a :class:`.StorableFunction` in a worker process
+
+    Only the function, its configuration, and its keyword arguments are
+    sent to the worker (with ``dill``); the worker evaluates them without
+    caching or storage. See :class:`.ProcessPoolCVBackend`.
+
+    Parameters
+    ----------
+    function : :class:`.StorableFunction`
+        the function to evaluate
+    """
+    def __init__(self, function):
+        self.func = function.func
+        self.func_config = function.func_config
+        self.kwargs = function.kwargs
+
+    def __getstate__(self):
+        return dill.dumps((self.func, self.func_config, self.kwargs),
+                          recurse=True)
+
+    def __setstate__(self, state):
+        self.func, self.func_config, self.kwargs = dill.loads(state)
+
+    def __call__(self, snapshots):
+        function = StorableFunction(self.func, func_config=self.func_config,
+                                    store_source=False, **self.kwargs)
+        return function._eval_values(snapshots)
+
+
 class CollectiveVariable(StorableFunction):
     """Wrapper around functions that map snapshots to values.
 
     This specializes the generic :class:`.StorableFunction` for OPS
     snapshots. In particular, it makes it so that trajectories and sampls
     are seen as lists of snapshots.
+
+    Attributes
+    ----------
+    execution_backend : :class:`.ProcessPoolCVBackend` or None
+        if not ``None``, evaluations of more snapshots than the backend's
+        ``chunk_size`` are made by the backend. This is not stored.
     """
+    execution_backend = None
+
     def is_scalar(self, item):
         # override is_scalar so that Trajectories and Samples are treated
         # as iterables over snapshots
@@ -22,6 +63,15 @@ class CollectiveVariable(StorableFunction):
         else:
             return super(CollectiveVariable, self).is_scalar(item)
 
+    def _eval(self, uuid_items):
+        backend = self.execution_backend
+        if (backend is None or self.func is None
+                or len(uuid_items) <= backend.chunk_size):
+            return super(CollectiveVariable, self)._eval(uuid_items)
+        values = backend.evaluate(StorableFunctionTask(self),
+                                  list(uuid_items.values()))
+        return dict(zip(uuid_items.keys(), values)), {}
+
 
 class ReversibleStorableFunction(StorableFunction):
     """Wrapper around functions that don't depend on the arrow of time.
@@ -120,3 +170,92 @@ class MDTrajFunctionCV(CoordinateFunctionCV):
 class PyEMMAFeaturizerCV(FunctionFactoryCV, CoordinateFunctionCV):
     # TODO
     pass
+
+
+class CVGroup(object):
+    """Evaluate several collective variables for the same snapshots
+
+    :class:`.MDTrajFunctionCV` instances that use the same topology (and
+    no other preprocessing than the conversion to MDTraj) share a single
+    conversion of the snapshots that they have not seen yet. The results
+    are added to the local caches of the CVs, so this only changes the
+    results of CVs that cache their evaluations. All other CVs are
+    evaluated as usual.
+
+    Parameters
+    ----------
+    cvs : list of :class:`.StorableFunction`
+        the collective variables to evaluate
+    """
+    def __init__(self, cvs):
+        self.cvs = list(cvs)
+
+    @staticmethod
+    def _shares_mdtraj(cv):
+        config = cv.func_config
+        return (isinstance(cv, MDTrajFunctionCV)
+                and cv.func is not None
+                and (cv._eval, True) in cv._modes[cv.mode]
+                and not config.item_preprocessors
+                and [proc.name for proc in config.list_preprocessors]
+                == ['mdtraj'])
+
+    @staticmethod
+    def _missing(cv, uuid_items):
+        # run the stages of the CV's mode that come before evaluation
+        missing = uuid_items
+        for stage, do_caching in cv._modes[cv.mode]:
+            if stage == cv._eval or not missing:
+                break
+            results, missing = stage(missing)
+            if do_caching:
+                cv.local_cache.cache_results(results)
+        return missing
+
+    def _fill_caches(self, uuid_items):
+        missing = {}
+        processors = {}
+        for cv in self.cvs:
+            if self._shares_mdtraj(cv) and cv not in missing:
+                missing[cv] = self._missing(cv, uuid_items)
+                processor = cv.func_config.processor_dict['mdtraj']
+                processors.setdefault(processor.topology,
+                                      (processor, []))[1].append(cv)
+
+        for processor, cvs in processors.values():
+            needed = [uuid for uuid in uuid_items
+                      if any(uuid in missing[cv] for cv in cvs)]
+            if not needed:
+                continue
+            md_trajectory = processor([uuid_items[uuid] for uuid in needed])
+            frames = dict(zip(needed, md_trajectory))
+            for cv in cvs:
+                values = [cv.func(frames[uuid], **cv.kwargs)
+                          for uuid in missing[cv]]
+                results = [cv.func_config.item_postprocess(val)
+                           for val in values]
+                cv.local_cache.cache_results(dict(zip(missing[cv],
+                                                      results)))
+
+    def __call__(self, items):
+        """Values of all CVs for the items
+
+        Parameters
+        ----------
+        items : list of :class:`.BaseSnapshot` or :class:`.Trajectory`
+            the snapshots to evaluate the CVs for
+
+        Returns
+        -------
+        list
+            for each CV, its values for the items (as returned by calling
+            the CV with ``items``)
+        """
+        if isinstance(items, paths.BaseSnapshot):
+            snapshots = [items]
+        else:
+            snapshots = items
+        uuid_items = {get_uuid(item): item for item in snapshots}
+        if uuid_items:
+            self._fill_caches(uuid_items)
+        return [cv(items) for cv in self.cvs]
@@ -4,9 +4,12 @@ try:
 except ImportError:
     import mock
 
+import pickle
+
 import numpy as np
 
 import openpathsampling as paths
+from openpathsampling.collectivevariables import ProcessPoolCVBackend
 from openpathsampling.tests.test_helpers import make_1d_traj, data_filename
 from openpathsampling.engines import openmm as ops_omm
 from openpathsampling.engines.topology import MDTrajTopology
@@ -116,6 +119,32 @@ class TestCoordinateFunctionCV(object):
             assert self.storage.backend.called_load[get_uuid(item)] == 1
 
 
+class TestExecutionBackend(object):
+    def setup(self):
+        self.traj = make_1d_traj([float(x) for x in range(7)])
+        self.cv = CoordinateFunctionCV(lambda s, scale: s.xyz[0][0] * scale,
+                                       scale=2.0)
+        self.backend = ProcessPoolCVBackend(n_workers=2, chunk_size=3)
+
+    def teardown(self):
+        self.backend.close()
+
+    def test_storable_function_task(self):
+        task = pickle.loads(pickle.dumps(StorableFunctionTask(self.cv)))
+        assert task(self.traj) == [2.0 * x for x in range(7)]
+
+    def test_eval_with_backend(self):
+        self.cv.execution_backend = self.backend
+        assert self.cv(self.traj) == [2.0 * x for x in range(7)]
+        assert self.backend.n_chunks == 3
+        assert len(self.cv.local_cache) == 7
+
+    def test_small_lists_evaluated_locally(self):
+        self.cv.execution_backend = self.backend
+        assert self.cv(self.traj[:3]) == [0.0, 2.0, 4.0]
+        assert self.backend.n_chunks == 0
+
+
 class TestMDTrajFunctionCV(object):
     def setup(self):
         if not HAS_MDTRAJ:
@@ -143,3 +172,26 @@ class TestMDTrajFunctionCV(object):
         by_snap = np.array([self.cv(snap) for snap in self.traj])
         np.testing.assert_array_equal(by_traj, by_snap)
         assert by_traj.shape == (len(self.traj),)
+
+    def test_cv_group(self):
+        top = self.cv.topology
+        psi = MDTrajFunctionCV(md.compute_dihedrals, top,
+                               indices=[[6, 8, 14, 16]])
+        x = CoordinateFunctionCV(lambda snap: snap.xyz[0][0])
+        expected = [self.cv(self.traj), psi(self.traj), x(self.traj)]
+        for cv in [self.cv, psi, x]:
+            cv.local_cache.clear()
+
+        group = CVGroup([self.cv, psi, x])
+        with mock.patch.object(MDTrajProcessor, '__call__',
+                               autospec=True,
+                               side_effect=MDTrajProcessor.__call__) as conv:
+            results = group(self.traj)
+            assert conv.call_count == 1
+            # the MDTraj CVs now answer from their caches
+            self.cv(self.traj)
+            psi(self.traj)
+            assert conv.call_count == 1
+
+        for result, expect in zip(results, expected):
+            np.testing.assert_array_equal(result, expect)
@@ -3,6 +3,8 @@ import openpathsampling.netcdfplus as netcdfplus
 import collections
 import copy
 
+import numpy as np
+
 from functools import partial
 
 def _cv_max_func(trajectory, cv):
@@ -153,6 +155,79 @@ class InterfaceSet(netcdfplus.StorableNamedObject):
     def __reversed__(self):
         return self.volumes.__reversed__()
 
+    # compiled interface volumes; see frames_in
+    _volume_program = None
+
+    def frames_in(self, snapshots):
+        """Which of the snapshots are in which interface volume
+
+        The interface volumes are evaluated together by a
+        :class:`.VolumeProgram`, so a CV shared by the interfaces is
+        only evaluated once for each snapshot.
+
+        Parameters
+        ----------
+        snapshots : list of :class:`.BaseSnapshot` or :class:`.Trajectory`
+            the snapshots to test
+
+        Returns
+        -------
+        numpy.ndarray of bool
+            array with shape ``(len(self), len(snapshots))``; element
+            ``[i, j]`` is whether snapshot ``j`` is in interface ``i``
+        """
+        if self._volume_program is None:
+            self._volume_program = paths.VolumeProgram(self.volumes)
+        return self._volume_program.frames_in(snapshots)
+
+    def _n_outside(self, snapshots):
+        # for each snapshot, the number of interfaces it is outside of;
+        # with nested interfaces, these are the innermost ones
+        in_volumes = self.frames_in(snapshots)
+        return np.where(in_volumes.any(axis=0), in_volumes.argmax(axis=0),
+                        len(self))
+
+    def innermost_interface(self, snapshot):
+        """Index of the innermost interface volume containing the snapshot
+
+        This assumes that the interface volumes are nested, with the
+        innermost interface first.
+
+        Parameters
+        ----------
+        snapshot : :class:`.BaseSnapshot`
+            the snapshot to test
+
+        Returns
+        -------
+        int
+            index of the innermost interface containing the snapshot;
+            ``len(self)`` if the snapshot is outside all interfaces
+        """
+        return int(self._n_outside([snapshot])[0])
+
+    def max_interface_crossed(self, trajectory):
+        """Index of the outermost interface the trajectory crosses
+
+        An interface is crossed if any frame of the trajectory is outside
+        the interface volume. This assumes that the interface volumes are
+        nested, with the innermost interface first.
+
+        Parameters
+        ----------
+        trajectory : :class:`.Trajectory`
+            the trajectory to test
+
+        Returns
+        -------
+        int
+            index of the outermost interface crossed; -1 if the trajectory
+            does not cross any interface
+        """
+        if len(trajectory) == 0:
+            return -1
+        return int(self._n_outside(trajectory).max()) - 1
+
 
 class GenericVolumeInterfaceSet(InterfaceSet):
     """Abstract class for InterfaceSets for CVRange-based volumes.
@@ -189,6 +264,78 @@ class GenericVolumeInterfaceSet(InterfaceSet):
             volumes=volumes, cv=cv, lambdas=lambdas, direction=direction)
         self._set_volume_func(volume_func)
 
+    # data for the bisection of CV values; False if not possible
+    _bisection = None
+
+    def _get_bisection(self):
+        """Data to find interfaces by bisection, or None if not possible
+
+        Bisection requires interfaces that are plain CV ranges (nothing to
+        intersect with), where only the maximum (or only the minimum)
+        changes, monotonically.
+        """
+        if self._bisection is None:
+            self._bisection = False
+            if (self.direction != 0 and self.lambdas is not None
+                    and type(self.intersect_with) is paths.FullVolume):
+                bisection = self._make_bisection()
+                if bisection is not None:
+                    self._bisection = bisection
+        if self._bisection is False:
+            return None
+        return self._bisection
+
+    @staticmethod
+    def _is_sorted(keys):
+        return bool(np.all(np.diff(keys) >= 0))
+
+    def _make_bisection(self):
+        if not all(type(vol) is paths.CVDefinedVolume
+                   for vol in self.volumes):
+            return None
+        # keys increase with the interface index
+        if self.direction > 0:
+            keys = np.array([vol.lambda_max for vol in self.volumes])
+            bounds = set(vol.lambda_min for vol in self.volumes)
+        else:
+            keys = -np.array([vol.lambda_min for vol in self.volumes])
+            bounds = set(vol.lambda_max for vol in self.volumes)
+        if len(bounds) != 1 or not self._is_sorted(keys):
+            return None
+        return (keys, bounds.pop())
+
+    def _bisect(self, bisection, values):
+        """Number of interfaces each CV value is outside of"""
+        # same comparisons as CVDefinedVolume.__call__
+        (keys, bound) = bisection
+        if self.direction > 0:
+            n_outside = np.searchsorted(keys, values, side='right')
+            if bound != float('-inf'):
+                n_outside[values < bound] = len(self)
+        else:
+            n_outside = np.searchsorted(keys, -values, side='left')
+            if bound != float('inf'):
+                n_outside[values >= bound] = len(self)
+        n_outside[np.isnan(values)] = 0  # NaN is inside the volumes
+        return n_outside
+
+    def _n_outside(self, snapshots):
+        snapshots = list(snapshots)
+        bisection = self._get_bisection()
+        values = None
+        if bisection is not None and len(snapshots) > 0:
+            values = self.cv(snapshots)
+            try:
+                values = np.array([val.__float__() for val in values],
+                                  dtype=float)
+            except (TypeError, AttributeError):
+                values = None  # e.g., quantities with units
+        if values is None:
+            return super(GenericVolumeInterfaceSet, self)._n_outside(
+                snapshots
+            )
+        return self._bisect(bisection, values)
+
     def _slice_dict(self, slicer):
         dct = super(GenericVolumeInterfaceSet, self)._slice_dict(slicer)
         try:
@@ -389,6 +536,56 @@ class PeriodicVolumeInterfaceSet(GenericVolumeInterfaceSet):
                                                          intersect_with,
                                                          volume_func)
 
+    def _make_bisection(self):
+        # The interfaces are sorted into the inner ones, the outer ones
+        # that wrap around the periodic domain, and the ones that cover all
+        # of it. Bisection uses the wrapped bounds of the volumes, so that
+        # it makes the same comparisons as the volumes.
+        volumes = self.volumes
+        if not all(isinstance(vol, paths.PeriodicCVDefinedVolume)
+                   for vol in volumes):
+            return None
+        full = [vol._overrides_call(paths.PeriodicCVDefinedVolume)
+                for vol in volumes]
+        n_partial = full.index(True) if True in full else len(volumes)
+        if any(full[:n_partial]) or not all(full[n_partial:]):
+            return None
+        partial = volumes[:n_partial]
+        if self.direction > 0:
+            bounds = set(vol.lambda_min for vol in partial)
+            keys = np.array([vol.lambda_max for vol in partial])
+        else:
+            bounds = set(vol.lambda_max for vol in partial)
+            keys = -np.array([vol.lambda_min for vol in partial])
+        if len(bounds) > 1:
+            return None
+        bound = bounds.pop() if bounds else 0.0
+        n_inner = int(np.sum(keys > self.direction * bound))
+        (inner, outer) = (keys[:n_inner], keys[n_inner:])
+        if (np.any(outer > self.direction * bound)
+                or not self._is_sorted(inner) or not self._is_sorted(outer)):
+            return None
+        wrap_volume = volumes[0] if volumes[0].wrap else None
+        return (inner, outer, bound, wrap_volume)
+
+    def _bisect(self, bisection, values):
+        # same comparisons as PeriodicCVDefinedVolume.__call__
+        (inner, outer, bound, wrap_volume) = bisection
+        if wrap_volume is not None:
+            values = wrap_volume._do_wrap_array(values)
+        if self.direction > 0:
+            # inner interfaces are [bound, key), outer ones are wrapped
+            # around: [bound, period_max) and [period_min, key)
+            past_bound = values >= bound
+            inner_outside = np.searchsorted(inner, values, side='right')
+            outer_outside = np.searchsorted(outer, values, side='right')
+        else:
+            past_bound = values < bound
+            inner_outside = np.searchsorted(inner, -values, side='left')
+            outer_outside = np.searchsorted(outer, -values, side='left')
+        return np.where(past_bound, inner_outside,
+                        len(inner) + outer_outside)
+
     def to_dict(self):
         dct = super(PeriodicVolumeInterfaceSet, self).to_dict()
         dct['period_min'] = self.period_min
@@ -440,6 +440,33 @@ class MoveScheme(StorableNamedObject):
         mover_ensembles = list(mover_ensemble_dict.keys())
         return mover_ensembles
 
+    def volume_membership_memo(self, size_limit=100000):
+        """
+        Memo of volume membership for all volumes used by the network.
+
+        Once the memo is attached, all ensembles of the network share the
+        results of the volumes for each snapshot. Only the ensembles and
+        :meth:`.Volume.frames_in` use the memo; calling a volume directly,
+        as in ``volume(snapshot)``, always evaluates it. The memo can also
+        be used as a context manager::
+
+            with scheme.volume_membership_memo() as memo:
+                sampler.run(n_steps)
+            print(memo.hit_rate)
+
+        Parameters
+        ----------
+        size_limit : int
+            maximum number of snapshots in the memo
+
+        Returns
+        -------
+        :class:`.VolumeMembershipMemo`
+            the memo (not attached yet)
+        """
+        return paths.VolumeMembershipMemo.from_objects(self.network,
+                                                       size_limit=size_limit)
+
     def find_hidden_ensembles(self, root=None):
         """
         All ensembles which exist in the move scheme but not in the network.
@@ -61,6 +61,10 @@ class MoveChange(TreeMixin, StorableObject):
         self.details = details
 
     def __getattr__(self, item):
+        if item.startswith('_'):
+            # private attributes are never in details; this also avoids
+            # infinite recursion before details is set (e.g., unpickling)
+            raise AttributeError(item)
         # try to get attributes from details dict
         try:
             return getattr(self.details, item)
@@ -1,8 +1,10 @@
 from .base import StorableNamedObject, StorableObject, create_to_dict
 from .cache import WeakKeyCache, WeakLRUCache, WeakValueCache, MaxCache, \
-    NoCache, Cache, LRUCache, LRUChunkLoadingCache
+    NoCache, Cache, LRUCache, LRUChunkLoadingCache, ByteLRUCache
 from .dictify import ObjectJSON, StorableObjectJSON, UUIDObjectJSON
 from .netcdfplus import NetCDFPlus
+from .writer import BackgroundWriter
+from .buffer import WriteBuffer
 
 from .stores import ObjectStore
 from .stores import IndexedObjectStore
@@ -97,6 +97,35 @@ class PseudoAttribute(cd.Wrap, StorableNamedObject):
         self.diskcache_enabled = False
         return self
 
+    @property
+    def value_cache(self):
+        """
+        :class:`openpathsampling.netcdfplus.cache.Cache` : the in-memory
+        cache of computed values
+        """
+        return self._cache_dict.cache
+
+    def set_value_cache(self, cache):
+        """
+        Replace the in-memory cache of computed values
+
+        The values of the current cache are transferred to the new one.
+
+        Parameters
+        ----------
+        cache : :class:`openpathsampling.netcdfplus.cache.Cache`
+            the new cache, e.g. a :class:`ByteLRUCache` with
+            ``weak_keys=True`` to limit the memory used by the values
+
+        Returns
+        -------
+        :class:`PseudoAttribute`
+            this object
+        """
+        cache.transfer(self._cache_dict.cache)
+        self._cache_dict.cache = cache
+        return self
+
     def set_cache_store(self, value_store):
         """
         Attach store variables to the collective variables.
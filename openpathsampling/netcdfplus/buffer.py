@@ -0,0 +1,203 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedValueDelegate(object):
+    """
+    Keep rows written to a variable in memory until the buffer is flushed
+
+    Writes of complete rows (``delegate[idx] = value`` or
+    ``delegate[idx, :, :] = value``) are converted and kept in memory.
+    Reading such a row is answered from memory. All other reads and writes
+    flush the buffer first and go to the wrapped delegate.
+
+    Parameters
+    ----------
+    delegate : :class:`openpathsampling.netcdfplus.NetCDFPlus.ValueDelegate`
+        the delegate to be buffered
+    buffer : :class:`WriteBuffer`
+        the buffer of the store this variable belongs to
+
+    Attributes
+    ----------
+    rows : dict of int, numpy.ndarray
+        the converted values of the buffered rows by row index
+    """
+
+    def __init__(self, delegate, buffer):
+        self.delegate = delegate
+        self.buffer = buffer
+        self.rows = {}
+
+    @staticmethod
+    def _row(key):
+        # return the row index if the key addresses one complete row
+        if isinstance(key, tuple):
+            if not all(isinstance(part, slice) and part == slice(None)
+                       for part in key[1:]):
+                return None
+            key = key[0]
+
+        if isinstance(key, (int, np.integer)) and key >= 0:
+            return int(key)
+
+        return None
+
+    def __setitem__(self, key, value):
+        row = self._row(key)
+        if row is None:
+            self.buffer.flush()
+            self.delegate[key] = value
+        else:
+            self.buffer.add_row(row)
+            variable = self.delegate.variable
+            self.rows[row] = np.asarray(
+                self.delegate.setter(value), dtype=variable.dtype)
+
+    def __getitem__(self, key):
+        row = self._row(key)
+        if row is not None and row in self.rows:
+            # a single value is returned as numpy scalar, like netCDF4 does
+            return self.delegate.getter(self.rows[row][()])
+
+        self.buffer.flush()
+        return self.delegate[key]
+
+    def __getattr__(self, item):
+        return getattr(self.delegate, item)
+
+    def __len__(self):
+        return max(len(self.delegate), self.buffer.stop)
+
+    def flush(self):
+        """
+        Write all buffered rows as contiguous slices and empty the buffer
+        """
+        if not self.rows:
+            return
+
+        variable = self.delegate.variable
+        rows = sorted(self.rows)
+        start = 0
+        for pos in range(1, len(rows) + 1):
+            if pos == len(rows) or rows[pos] != rows[pos - 1] + 1:
+                first, last = rows[start], rows[pos - 1]
+                variable[first:last + 1] = np.stack(
+                    [self.rows[row] for row in rows[start:pos]])
+                start = pos
+
+        self.rows.clear()
+
+
+class WriteBuffer(object):
+    """
+    Write-combining buffer for the variables of a store
+
+    Rows saved to the buffered variables of a store are collected and
+    written as contiguous slices before row number `max_rows + 1` is started
+    or when the storage is synced. This replaces many small writes (and dimension
+    extensions) in the netCDF file by few large ones.
+
+    Parameters
+    ----------
+    max_rows : int
+        the maximal number of pending rows
+
+    Attributes
+    ----------
+    delegates : dict of str, :class:`BufferedValueDelegate`
+        the buffered variables by their full name in the storage
+    rows : set of int
+        the indices of all pending rows
+    n_flushes : int
+        the number of times pending rows have been written
+    """
+
+    def __init__(self, max_rows):
+        self.max_rows = max_rows
+        self.delegates = {}
+        self.rows = set()
+        self.n_flushes = 0
+
+    @staticmethod
+    def is_bufferable(variable, dimension):
+        """
+        Check if a netCDF variable can be buffered
+
+        Only numeric, unpacked variables of fixed size along the given (the
+        store's) dimension can be buffered.
+
+        Parameters
+        ----------
+        variable : netCDF4.Variable
+            the variable to check
+        dimension : str
+            the name of the dimension that counts the stored objects
+
+        Returns
+        -------
+        bool
+        """
+        return (
+            len(variable.dimensions) > 0 and
+            variable.dimensions[0] == dimension and
+            isinstance(variable.dtype, np.dtype) and
+            variable.dtype.kind in 'biuf' and
+            not hasattr(variable, 'var_vlen') and
+            not hasattr(variable, 'maskable') and
+            not hasattr(variable, 'scale_factor')
+        )
+
+    def wrap(self, name, delegate):
+        """
+        Return a buffered version of a value delegate
+
+        Parameters
+        ----------
+        name : str
+            the full name of the variable in the storage
+        delegate : :class:`openpathsampling.netcdfplus.NetCDFPlus.ValueDelegate`
+            the delegate to buffer
+
+        Returns
+        -------
+        :class:`BufferedValueDelegate`
+        """
+        buffered = BufferedValueDelegate(delegate, self)
+        self.delegates[name] = buffered
+        return buffered
+
+    @property
+    def stop(self):
+        """
+        int : one after the largest pending row index, 0 if none is pending
+        """
+        return max(self.rows) + 1 if self.rows else 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add_row(self, row):
+        # flush before a new row is started, so that rows are written
+        # completely
+        if row not in self.rows and len(self.rows) >= self.max_rows:
+            self.flush()
+
+        self.rows.add(row)
+
+    def flush(self):
+        """
+        Write all pending rows to the file
+        """
+        if not self.rows:
+            return
+
+        logger.debug('Writing %d buffered rows' % len(self.rows))
+        for delegate in self.delegates.values():
+            delegate.flush()
+
+        self.rows.clear()
+        self.n_flushes += 1
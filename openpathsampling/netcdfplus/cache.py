@@ -1,6 +1,13 @@
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import threading
 import weakref
 
+import numpy as np
+
+from openpathsampling.integration_tools import is_simtk_quantity
+
 __author__ = 'Jan-Hendrik Prinz'
 
 
@@ -207,6 +214,225 @@ class LRUCache(Cache):
         return len(self._cache)
 
 
+def value_nbytes(value):
+    """
+    Number of bytes used by a cached value
+
+    For numpy arrays (and numpy scalars) this is exactly the size of the
+    data; for lists and tuples it is the size of the container plus the sum
+    of its elements. Other objects count with ``sys.getsizeof``.
+
+    Parameters
+    ----------
+    value : object
+        the value
+
+    Returns
+    -------
+    int
+        the number of bytes
+    """
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.nbytes
+    elif is_simtk_quantity(value):
+        return value_nbytes(value._value)
+    elif isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(map(value_nbytes, value))
+    else:
+        return sys.getsizeof(value)
+
+
+class ByteLRUCache(Cache):
+    """
+    Least Recently Used Cache that is limited by the bytes of its values
+
+    The size of each value is computed once with :func:`value_nbytes` when
+    it is added. The least recently used values are removed as soon as the
+    total exceeds the limit. A single value larger than the limit is not
+    kept at all.
+
+    Parameters
+    ----------
+    byte_limit : int
+        the maximal number of bytes of all values in the cache
+    weak_keys : bool
+        if `True` the cache keeps only weak references to the keys, and
+        entries disappear with their keys (like :class:`WeakKeyCache`)
+
+    Attributes
+    ----------
+    nbytes : int
+        the number of bytes of all values in the cache
+    hits : int
+        number of lookups that found a value
+    misses : int
+        number of lookups that did not find a value
+    evictions : int
+        number of values removed because the cache was full
+    """
+
+    def __init__(self, byte_limit, weak_keys=False):
+        super(ByteLRUCache, self).__init__()
+        self._byte_limit = byte_limit
+        self.weak_keys = weak_keys
+        self._cache = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if weak_keys:
+            self_ref = weakref.ref(self)
+
+            def remove(key_ref):
+                cache = self_ref()
+                if cache is not None:
+                    cache._remove(key_ref)
+
+            self._remove_callback = remove
+
+    def _key(self, key):
+        if self.weak_keys:
+            return weakref.ref(key)
+        return key
+
+    def _new_key(self, key):
+        if self.weak_keys:
+            return weakref.ref(key, self._remove_callback)
+        return key
+
+    def _remove(self, key):
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[1]
+
+    @property
+    def count(self):
+        return len(self._cache), 0
+
+    @property
+    def size(self):
+        return -1, 0
+
+    @property
+    def byte_limit(self):
+        return self._byte_limit
+
+    @byte_limit.setter
+    def byte_limit(self, new_limit):
+        self._byte_limit = new_limit
+        self._check_byte_limit()
+
+    @property
+    def hit_rate(self):
+        """float : fraction of lookups that found a value"""
+        n_lookups = self.hits + self.misses
+        return float(self.hits) / n_lookups if n_lookups else 0.0
+
+    def reset_counters(self):
+        """Set hits, misses and evictions back to zero"""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __str__(self):
+        return '%s(%d items, %d/%d bytes, hit rate %.1f%%)' % (
+            self.__class__.__name__, len(self), self.nbytes,
+            self.byte_limit, 100.0 * self.hit_rate
+        )
+
+    def __iter__(self):
+        for key in list(self._cache):
+            if self.weak_keys:
+                key = key()
+                if key is None:
+                    continue
+            yield key
+
+    def __reversed__(self):
+        for key in reversed(list(self._cache)):
+            if self.weak_keys:
+                key = key()
+                if key is None:
+                    continue
+            yield key
+
+    def __getitem__(self, item):
+        key = self._key(item)
+        try:
+            entry = self._cache[key]
+        except KeyError:
+            self.misses += 1
+            raise KeyError(item)
+
+        # keep the stored key: it holds the callback for weak keys
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def get_silent(self, item):
+        """
+        Return item from the cache without reordering the LRU or counting
+
+        Parameters
+        ----------
+        item : object
+            the item index to be retrieved from the cache
+
+        Returns
+        -------
+        `object` or `None`
+            the requested object if it exists else `None`
+        """
+        try:
+            return self._cache[self._key(item)][0]
+        except (KeyError, TypeError):
+            return None
+
+    def __setitem__(self, key, value, **kwargs):
+        self._remove(self._key(key))
+        nbytes = value_nbytes(value)
+        self._cache[self._new_key(key)] = (value, nbytes)
+        self.nbytes += nbytes
+        self._check_byte_limit()
+
+    def transfer(self, old_cache):
+        # the other caches iterate from the least recently used key
+        for key in list(old_cache):
+            try:
+                self[key] = old_cache[key]
+            except KeyError:
+                pass
+
+        return self
+
+    def _check_byte_limit(self):
+        while self.nbytes > self.byte_limit and self._cache:
+            _, (_, nbytes) = self._cache.popitem(last=False)
+            self.nbytes -= nbytes
+            self.evictions += 1
+
+    def __contains__(self, item):
+        try:
+            return self._key(item) in self._cache
+        except TypeError:
+            return False
+
+    def items(self):
+        for key in self:
+            try:
+                yield key, self._cache[self._key(key)][0]
+            except KeyError:
+                pass
+
+    def clear(self):
+        self._cache.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+
 class WeakLRUCache(Cache):
     """
     Implements a cache that keeps weak references to all elements
@@ -374,13 +600,51 @@ class LRUChunkLoadingCache(Cache):
     """
     Implements a cache that keeps references loaded in chunks
 
+    If `prefetch` is larger than zero, sequential access is detected (a
+    chunk is accessed right after its predecessor) and the next `prefetch`
+    chunks are read ahead with a single read from the variable. With
+    `background=True` this read happens in a separate reader thread, so
+    that it overlaps with the work done on the values of the current chunk.
+
+    Notes
+    -----
+    Most builds of netCDF/HDF5 are not thread-safe. All reads from the
+    variable, in the reader thread as well as on the calling thread, hold
+    `variable_lock`. Code that writes to the variable while background
+    prefetching is active has to hold this lock too. Pass the lock of the
+    storage as `lock` to share it with all other variables of the file.
+    With `background=True` the lock must not be held while values are
+    looked up, since a lookup might wait for the reader thread.
+
+    Attributes
+    ----------
+    prefetch : int
+        the number of chunks to read ahead on sequential access
+    variable_lock : threading.RLock
+        the lock held while accessing the variable
+    hits : int
+        the number of lookups answered from loaded chunks
+    misses : int
+        the number of lookups that had to load a chunk
+    prefetched : int
+        the number of chunks read ahead
+    prefetch_hits : int
+        the number of chunks read ahead that were used later
+    prefetch_waste : int
+        the number of chunks read ahead that were dropped before being used
     """
 
-    def __init__(self, chunksize=256, max_chunks=4*8192, variable=None):
+    def __init__(self, chunksize=256, max_chunks=4*8192, variable=None,
+                 prefetch=0, background=False, lock=None):
         super(LRUChunkLoadingCache, self).__init__()
         self.max_chunks = max_chunks
         self.chunksize = chunksize
         self.variable = variable
+        self.prefetch = prefetch
+        self.background = background
+        if lock is None:
+            lock = threading.RLock()
+        self.variable_lock = lock
 
         self._chunkdict = OrderedDict()
         self._firstchunk = 0
@@ -392,6 +656,12 @@ class LRUChunkLoadingCache(Cache):
 
         self._lastchunk_idx = self._size // self.chunksize
 
+        self._executor = None
+        self._pending = {}
+        self._prefetched_chunks = set()
+        self._last_accessed = None
+        self.reset_counters()
+
     @property
     def count(self):
         return sum(map(len, self._chunkdict.values())), 0
@@ -400,11 +670,41 @@ class LRUChunkLoadingCache(Cache):
     def size(self):
         return self.max_chunks * self.chunksize, 0
 
+    @property
+    def hit_rate(self):
+        """float : fraction of lookups that found a loaded chunk"""
+        n_lookups = self.hits + self.misses
+        return float(self.hits) / n_lookups if n_lookups else 0.0
+
+    def reset_counters(self):
+        """Set all access and prefetch counters back to zero"""
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.prefetch_hits = 0
+        self.prefetch_waste = 0
+
     def clear(self):
+        self.prefetch_waste += \
+            len(self._prefetched_chunks) + len(self._pending)
+        for future, _ in self._pending.values():
+            future.cancel()
+
+        self._pending.clear()
+        self._prefetched_chunks.clear()
+        self._last_accessed = None
         self._chunkdict.clear()
         self._firstchunk = 0
         self._lastchunk = []
 
+    def close(self):
+        """
+        Stop the reader thread used for background prefetching
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
     def update_size(self, size=None):
         """
         Update the knowledge of the size of the attached store
@@ -420,7 +720,8 @@ class LRUChunkLoadingCache(Cache):
 
         """
         if size is None:
-            self._size = len(self.variable)
+            with self.variable_lock:
+                self._size = len(self.variable)
         else:
             self._size = size
 
@@ -443,8 +744,7 @@ class LRUChunkLoadingCache(Cache):
                 # chunk not cached, load full
                 left = chunk_idx * self.chunksize
                 right = min(self._size, left + self.chunksize)
-                self._chunkdict[chunk_idx] = []
-                self._chunkdict[chunk_idx].extend(self.variable[left:right])
+                self._chunkdict[chunk_idx] = self._read(left, right)
 
                 self._check_size_limit()
 
@@ -456,7 +756,77 @@ class LRUChunkLoadingCache(Cache):
                 right = min(self._size, (chunk_idx + 1) * self.chunksize)
 
                 if right > left:
-                    chunk.extend(self.variable[left:right])
+                    chunk.extend(self._read(left, right))
+
+    def _read(self, left, right):
+        with self.variable_lock:
+            return list(self.variable[left:right])
+
+    def _read_ahead(self, chunk_idx):
+        # read the missing chunks after `chunk_idx` at once
+        last = min(chunk_idx + self.prefetch,
+                   (self._size - 1) // self.chunksize)
+        chunks = [
+            idx for idx in range(chunk_idx + 1, last + 1)
+            if idx not in self._chunkdict and idx not in self._pending
+        ]
+        if not chunks:
+            return
+
+        left = chunks[0] * self.chunksize
+        right = min(self._size, (chunks[-1] + 1) * self.chunksize)
+
+        if self.background:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+
+            future = self._executor.submit(self._read, left, right)
+            for idx in chunks:
+                self._pending[idx] = (future, left)
+        else:
+            values = self._read(left, right)
+            for idx in chunks:
+                self._add_prefetched(idx, left, values)
+
+    def _add_prefetched(self, chunk_idx, left, values):
+        if chunk_idx in self._chunkdict:
+            # has been filled in the meantime
+            self.prefetch_waste += 1
+            return
+
+        start = chunk_idx * self.chunksize - left
+        self._chunkdict[chunk_idx] = values[start:start + self.chunksize]
+        self._prefetched_chunks.add(chunk_idx)
+        self.prefetched += 1
+        self._check_size_limit()
+
+    def _collect(self, chunk_idx):
+        # add all chunks from the same background read
+        future, left = self._pending[chunk_idx]
+        values = future.result()
+        for idx in [idx for idx, (other, _) in self._pending.items()
+                    if other is future]:
+            del self._pending[idx]
+            self._add_prefetched(idx, left, values)
+
+    def _access_chunk(self, chunk_idx):
+        # returns `True` if the chunks following `chunk_idx` should be read
+        sequential = self._last_accessed is not None and \
+            chunk_idx == self._last_accessed + 1
+        self._last_accessed = chunk_idx
+
+        if chunk_idx in self._pending:
+            self._collect(chunk_idx)
+
+        if chunk_idx in self._prefetched_chunks:
+            self._prefetched_chunks.discard(chunk_idx)
+            self.prefetch_hits += 1
+
+        # refill only once the prefetched chunks are used up, so that
+        # several chunks are read at once
+        next_idx = chunk_idx + 1
+        return sequential and self.prefetch > 0 and \
+            next_idx not in self._chunkdict and next_idx not in self._pending
 
     def _update_chunk_order(self, chunk_idx):
         chunk = self._chunkdict[chunk_idx]
@@ -465,17 +835,28 @@ class LRUChunkLoadingCache(Cache):
         self._firstchunk = chunk_idx
 
     def __getitem__(self, item):
+        chunk_idx = item // self.chunksize
+        if chunk_idx != self._last_accessed and \
+                self._access_chunk(chunk_idx):
+            obj = self._lookup(item, chunk_idx)
+            self._read_ahead(chunk_idx)
+            return obj
+
+        return self._lookup(item, chunk_idx)
+
+    def _lookup(self, item, chunk_idx):
         chunksize = self.chunksize
-        chunk_idx = item // chunksize
         if chunk_idx in self._chunkdict:
             try:
                 obj = self._chunkdict[chunk_idx][item % chunksize]
                 if chunk_idx != self._firstchunk:
                     self._update_chunk_order(chunk_idx)
+                self.hits += 1
                 return obj
             except IndexError:
                 pass
 
+        self.misses += 1
         self.load_chunk(chunk_idx)
 
         try:
@@ -507,7 +888,7 @@ class LRUChunkLoadingCache(Cache):
         right = key
 
         if right > left:
-            chunk.extend(self.variable[left:right])
+            chunk.extend(self._read(left, right))
 
         chunk.append(value)
 
@@ -521,7 +902,10 @@ class LRUChunkLoadingCache(Cache):
 
     def _check_size_limit(self):
         if len(self._chunkdict) > self.max_chunks:
-            self._chunkdict.popitem(last=False)
+            chunk_idx, _ = self._chunkdict.popitem(last=False)
+            if chunk_idx in self._prefetched_chunks:
+                self._prefetched_chunks.discard(chunk_idx)
+                self.prefetch_waste += 1
 
     def __contains__(self, item):
         return any(item in chunk for chunk in self._chunkdict)
@@ -330,11 +330,19 @@ class Function(ChainDict):
             a list of results. In case your function does so, you can
             treat it as returning a scalar.
 
+        Attributes
+        ----------
+        list_evaluator : callable or None
+            if not `None`, lists of keys are passed to this callable instead
+            of being evaluated here (e.g., to evaluate them in other
+            processes). It must return the same values as `_eval_list`.
+
         """
         super(Function, self).__init__()
         self._eval = fnc
         self.requires_lists = requires_lists
         self.scalarize_numpy_singletons = scalarize_numpy_singletons
+        self.list_evaluator = None
 
     def _get(self, item):
         if self._eval is None:
@@ -355,6 +363,13 @@ class Function(ChainDict):
         if self._eval is None:
             return [None] * len(items)
 
+        if self.list_evaluator is not None:
+            return self.list_evaluator(items)
+
+        return self._eval_list(items)
+
+    def _eval_list(self, items):
+        """Evaluate the function for a list of keys in this process"""
         if self.requires_lists:
             results = self._eval(items)
 
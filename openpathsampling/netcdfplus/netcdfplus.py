@@ -3,8 +3,10 @@ author
 """
 
 import abc
+import fnmatch
 import logging
 import os.path
+import threading
 from collections import OrderedDict
 from uuid import UUID
 
@@ -88,12 +90,18 @@ class NetCDFPlus(netCDF4.Dataset):
             on the variable
         store : openpathsampling.netcdfplus.ObjectStore
             a reference to an object store used for convenience in some cases
+        lock : threading.RLock
+            the lock held while the variable is read or written
 
         """
 
-        def __init__(self, variable, getter=None, setter=None, store=None):
+        def __init__(self, variable, getter=None, setter=None, store=None,
+                     lock=None):
             self.variable = variable
             self.store = store
+            if lock is None:
+                lock = threading.RLock()
+            self.lock = lock
 
             if setter is None:
                 # None should not be used
@@ -111,12 +119,14 @@ class NetCDFPlus(netCDF4.Dataset):
                 self.support_simtk_unit = False
 
         def __setitem__(self, key, value):
-            self.variable[key] = self.setter(value)
+            value = self.setter(value)
+            with self.lock:
+                self.variable[key] = value
 
         def __getitem__(self, key):
-            # print(self.variable[key])
-            # print(type(self.variable[key]))
-            return self.getter(self.variable[key])
+            with self.lock:
+                value = self.variable[key]
+            return self.getter(value)
 
         def __getattr__(self, item):
             return getattr(self.variable, item)
@@ -128,7 +138,8 @@ class NetCDFPlus(netCDF4.Dataset):
             return repr(self.variable)
 
         def __len__(self):
-            return len(self.variable)
+            with self.lock:
+                return len(self.variable)
 
     @property
     def objects(self):
@@ -298,7 +309,13 @@ class NetCDFPlus(netCDF4.Dataset):
         elif mode == 'a' or mode == 'r+' or mode == 'r':
             logger.debug("Restore the dict of units from the storage")
 
-            self.check_version()
+            try:
+                self.check_version()
+            except Exception:
+                # do not leave the file open, it would be closed whenever
+                # this object is garbage collected
+                super(NetCDFPlus, self).close()
+                raise
 
             # self.reference_by_uuid = hasattr(self, 'use_uuid')
             # self.reference_by_uuid = True
@@ -438,6 +455,133 @@ class NetCDFPlus(netCDF4.Dataset):
         self._storages_base_cls = {}
         self.vars = dict()
         self.units = dict()
+        self._write_buffer_rows = None
+        self.storage_profile = []
+
+        # held by all reads and writes of the variables, so that a
+        # BackgroundWriter can write while other threads load
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def storage_profiles():
+        """
+        The named storage profiles that can be used with this storage
+
+        A profile is a list of pairs `(pattern, settings)`. The settings of
+        the first pattern that matches the full name of a new variable (see
+        :func:`fnmatch.fnmatch`) are used when it is created. Allowed
+        settings are
+
+        * `chunk_rows` : the chunk size along the first (object) dimension.
+          `'store'` uses the chunk size of the store the variable belongs
+          to, for stores that have one (like the CV value stores, whose
+          cache loads values in chunks of that size)
+        * `zlib` : if `True` use zlib compression
+        * `complevel` : the zlib compression level from 1 to 9
+        * `shuffle` : if `True` use the HDF5 shuffle filter
+        * `precision` : store floating point values rounded to multiples of
+          this value as packed 32 bit integers (lossy). Values are unpacked
+          transparently on loading. Together with compression this makes
+          coordinates and velocities much smaller, similar to XTC files.
+
+        Returns
+        -------
+        dict of str, list of tuple
+        """
+        return {
+            'default': []
+        }
+
+    def set_storage_profile(self, profile='default'):
+        """
+        Set the chunking and compression for variables created from now on
+
+        Existing variables are not changed. Stores that are created later,
+        like the stores for new snapshot types or CV values, use the profile.
+
+        Parameters
+        ----------
+        profile : str or list of tuple
+            the name of one of the :meth:`storage_profiles` or a list of
+            pairs `(pattern, settings)`
+        """
+        if isinstance(profile, str):
+            available_profiles = self.storage_profiles()
+            if profile not in available_profiles:
+                raise ValueError(
+                    "profile '" + profile + "' is not supported. Try one of "
+                    + str(list(available_profiles.keys()))
+                )
+
+            profile = available_profiles[profile]
+
+        self.storage_profile = list(profile)
+
+    def variable_settings(self, var_name):
+        """
+        Return the storage profile settings for a variable name
+
+        Parameters
+        ----------
+        var_name : str
+            the full name of the variable
+
+        Returns
+        -------
+        dict
+            the settings of the first matching pattern or an empty dict
+        """
+        for pattern, settings in self.storage_profile:
+            if fnmatch.fnmatchcase(var_name, pattern):
+                return settings
+
+        return {}
+
+    def set_write_buffer(self, max_rows):
+        """
+        Use write buffers for all stores that support them
+
+        Saved rows of numeric variables are collected in memory and written
+        in contiguous blocks of up to `max_rows` rows, see
+        :meth:`ObjectStore.set_write_buffer`. This also applies to stores
+        that are created later, like the stores for new snapshot types.
+
+        Parameters
+        ----------
+        max_rows : int or None
+            the number of rows to collect per store. `None` or 0 writes all
+            pending rows and disables the buffers.
+        """
+        self._write_buffer_rows = max_rows
+        for store in self._stores.values():
+            self._apply_write_buffer(store)
+
+    def _apply_write_buffer(self, store):
+        if store.supports_write_buffer:
+            store.set_write_buffer(self._write_buffer_rows)
+
+    def flush_write_buffers(self):
+        """
+        Write the pending rows of all store write buffers to the file
+        """
+        for store in self._stores.values():
+            store.flush()
+
+    def sync(self):
+        """
+        Write pending buffered rows and sync the file to disk
+        """
+        with self.lock:
+            self.flush_write_buffers()
+            super(NetCDFPlus, self).sync()
+
+    def close(self):
+        """
+        Write pending buffered rows and close the file
+        """
+        if self.isopen():
+            self.flush_write_buffers()
+            super(NetCDFPlus, self).close()
 
     def create_store(self, name, store, register_attr=True):
         """
@@ -481,6 +625,11 @@ class NetCDFPlus(netCDF4.Dataset):
         self.update_delegates()
         self.simplifier.update_class_list()
 
+        if self._write_buffer_rows:
+            for store in self._stores.values():
+                if store.write_buffer is None:
+                    self._apply_write_buffer(store)
+
     def register_store(self, name, store, register_attr=True):
         """
         Add a object store to the file
@@ -989,6 +1138,19 @@ class NetCDFPlus(netCDF4.Dataset):
                         for u in to_uuid_chunks(v)
                     ]
 
+            if hasattr(var, 'scale_factor'):
+                # unpacked values have the dtype of the scale factor, so
+                # return them in the type of the variable instead
+                dtype = self.var_type_to_nc_type(var.var_type)
+
+                def _unpack(my_getter):
+                    if my_getter is None:
+                        return lambda v: v.astype(dtype)
+                    else:
+                        return lambda v: my_getter(v.astype(dtype))
+
+                getter = _unpack(getter)
+
             if True or self.support_simtk_unit:
                 if hasattr(var, 'unit_simtk'):
                     if var_name not in self.units:
@@ -1025,7 +1187,8 @@ class NetCDFPlus(netCDF4.Dataset):
                     else:
                         getter = _get2(lambda v: v)
 
-            delegate = NetCDFPlus.ValueDelegate(var, getter, setter, store)
+            delegate = NetCDFPlus.ValueDelegate(
+                var, getter, setter, store, lock=self.lock)
 
             # this is a trick to speed up the s/getter. If we do not need
             # to _cast_ because of python objects of units we can copy
@@ -1077,7 +1240,8 @@ class NetCDFPlus(netCDF4.Dataset):
             A tuple of ints per number of dimensions. This specifies in what
             block sizes a variable is stored. Usually for object related stuff
             we want to store everything of one object at once so this is often
-            (1, ..., ...)
+            (1, ..., ...). The first size and the compression can be changed
+            by the storage profile, see :meth:`set_storage_profile`.
         simtk_unit : str
             A string representing the units used for this variable. Can be
             used with all var_types although it makes sense only for numeric
@@ -1135,6 +1299,22 @@ class NetCDFPlus(netCDF4.Dataset):
 
             chunksizes = tuple(chunksizes)
 
+        settings = self.variable_settings(var_name)
+
+        # with `'store'` the store already passes its own chunk size
+        if chunksizes is not None and \
+                settings.get('chunk_rows', 'store') != 'store':
+            chunksizes = tuple([settings['chunk_rows']] + list(chunksizes[1:]))
+
+        # lossy packing of floats as integers of the given precision, which
+        # netCDF4 undoes on reading using the `scale_factor` attribute
+        packed = (
+            'precision' in settings and not variable_length and
+            np.dtype(nc_type).kind == 'f'
+        )
+        if packed:
+            nc_type = np.int32
+
         if variable_length:
             vlen_t = ncfile.createVLType(nc_type, var_name + '_vlen')
             ncvar = ncfile.createVariable(
@@ -1143,12 +1323,21 @@ class NetCDFPlus(netCDF4.Dataset):
 
             setattr(ncvar, 'var_vlen', 'True')
         else:
+            # compression filters are not available for variable length types
+            compression = {
+                key: settings[key] for key in ['zlib', 'complevel', 'shuffle']
+                if key in settings
+            }
             ncvar = ncfile.createVariable(
                 var_name, nc_type, dimensions, chunksizes=chunksizes,
+                **compression
             )
 
         setattr(ncvar, 'var_type', var_type)
 
+        if packed:
+            setattr(ncvar, 'scale_factor', float(settings['precision']))
+
         if self.support_simtk_unit and simtk_unit is not None:
 
             if isinstance(simtk_unit, u.Unit):
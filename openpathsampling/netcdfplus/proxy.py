@@ -93,7 +93,9 @@ class LoaderProxy(object):
         Call the loader and get the referenced object
         """
         try:
-            return self._store.load(self.__uuid__)
+            # the storage might be written to by a BackgroundWriter
+            with self._store.storage.lock:
+                return self._store.load(self.__uuid__)
         except KeyError:
             if type(self.__uuid__) is int:
                 raise RuntimeWarning(
@@ -124,6 +126,15 @@ class DelayedLoader(object):
     def __set__(self, instance, value):
         instance._lazy[self] = value
 
+    def __set_name__(self, owner, name):
+        self._owner = owner
+        self._name = name
+
+    def __reduce__(self):
+        # pickle as a reference to the class attribute, so that the keys of
+        # instance._lazy are still this descriptor after unpickling
+        return getattr, (self._owner, self._name)
+
 
 def lazy_loading_attributes(*attributes):
     """
@@ -163,7 +174,9 @@ def lazy_loading_attributes(*attributes):
     """
     def _decorator(cls):
         for attr in attributes:
-            setattr(cls, attr, DelayedLoader())
+            loader = DelayedLoader()
+            loader.__set_name__(cls, attr)
+            setattr(cls, attr, loader)
 
         _super_init = cls.__init__
 
@@ -12,9 +12,32 @@ class PseudoAttributeStore(UniqueNamedObjectStore):
             PseudoAttribute
         )
         self.value_store = obj_store
+        self.value_cache_factory = None
+
+    def set_value_cache_factory(self, factory):
+        """
+        Give the attributes in this store new in-memory value caches
+
+        Parameters
+        ----------
+        factory : callable or None
+            called without arguments, it returns a new cache (see
+            :meth:`PseudoAttribute.set_value_cache`). All attributes in the
+            store, and attributes saved or loaded later, get their own
+            cache from it. If `None` the attributes keep their caches.
+        """
+        self.value_cache_factory = factory
+        if factory is not None:
+            for cv in self:
+                cv.set_value_cache(factory())
+
+    def _apply_value_cache_factory(self, cv):
+        if self.value_cache_factory is not None:
+            cv.set_value_cache(self.value_cache_factory())
 
     def _save(self, cv, idx):
         self.vars['json'][idx] = cv
+        self._apply_value_cache_factory(cv)
 
         if cv.diskcache_enabled:
             self.add_diskcache(cv)
@@ -34,6 +57,7 @@ class PseudoAttributeStore(UniqueNamedObjectStore):
             cv.diskcache_chunksize = cache_store.chunksize
             cv.allow_incomplete = cache_store.allow_incomplete
 
+        self._apply_value_cache_factory(cv)
         return cv
 
     def key_store(self, cv):
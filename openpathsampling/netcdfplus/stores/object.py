@@ -6,6 +6,7 @@ from openpathsampling.netcdfplus.base import StorableNamedObject, StorableObject
 from openpathsampling.netcdfplus.cache import MaxCache, Cache, NoCache, \
     WeakLRUCache
 from openpathsampling.netcdfplus.proxy import LoaderProxy
+from openpathsampling.netcdfplus.buffer import WriteBuffer
 
 from future.utils import iteritems
 
@@ -92,6 +93,10 @@ class ObjectStore(StorableNamedObject):
 
     default_store_chunk_size = 256
 
+    # whether saved rows can be collected in a write buffer, see
+    # :meth:`set_write_buffer`
+    supports_write_buffer = True
+
     _log_debug = False
 
     class DictDelegator(object):
@@ -184,6 +189,7 @@ class ObjectStore(StorableNamedObject):
         self.units = dict()
 
         self.index = None
+        self.write_buffer = None
 
         self.proxy_index = WeakValueDictionary()
 
@@ -311,6 +317,47 @@ class ObjectStore(StorableNamedObject):
         if isinstance(caching, Cache):
             self.cache = caching.transfer(self.cache)
 
+    def set_write_buffer(self, max_rows):
+        """
+        Collect saved rows in memory and write them in contiguous blocks
+
+        The numeric variables of this store (e.g. coordinates and velocities
+        of snapshots) are buffered. Pending rows are written once `max_rows`
+        of them have been collected and when the storage is synced or
+        closed. Buffered rows can be loaded before they are written.
+
+        Parameters
+        ----------
+        max_rows : int or None
+            the number of rows to collect before writing. `None` or 0
+            writes all pending rows and disables the buffer.
+
+        """
+        if self.write_buffer is not None:
+            self.write_buffer.flush()
+            for name, delegate in self.write_buffer.delegates.items():
+                self.storage.vars[name] = delegate.delegate
+
+            self.write_buffer = None
+
+        if max_rows:
+            buffer = WriteBuffer(max_rows)
+            prefix = self.prefix + '_'
+            for name, variable in self.storage.variables.items():
+                if name.startswith(prefix) and name in self.storage.vars \
+                        and buffer.is_bufferable(variable, self.prefix):
+                    self.storage.vars[name] = buffer.wrap(
+                        name, self.storage.vars[name])
+
+            self.write_buffer = buffer
+
+    def flush(self):
+        """
+        Write pending rows of the write buffer (if any) to the file
+        """
+        if self.write_buffer is not None:
+            self.write_buffer.flush()
+
     def idx(self, obj):
         """
         Return the index in this store for a given object
@@ -347,7 +394,11 @@ class ObjectStore(StorableNamedObject):
             number of stored objects
 
         """
-        return len(self.storage.dimensions[self.prefix])
+        n = len(self.storage.dimensions[self.prefix])
+        if self.write_buffer is not None:
+            n = max(n, self.write_buffer.stop)
+
+        return n
 
     def write(self, variable, idx, obj, attribute=None):
         if attribute is None:
@@ -13,21 +13,42 @@ class ValueStore(ObjectStore):
 
     Usually used to save additional attributes for objects
 
+    Parameters
+    ----------
+    key_class : class
+        the class of the objects the values belong to
+    allow_incomplete : bool
+        if `True` values are only stored for some of the objects
+    chunksize : int
+        the number of values loaded at once into the cache
+    prefetch : int
+        the number of chunks the cache reads ahead when values are
+        accessed sequentially. Default is `0`, no read ahead
+    background : bool
+        if `True` the cache reads ahead in a separate reader thread
+
     See Also
     --------
     `PseudoAttribute`, `PseudoAttributeStore`
     """
+
+    # the chunk loading cache reads values directly from the file
+    supports_write_buffer = False
     def __init__(
             self,
             key_class,
             allow_incomplete=False,
-            chunksize=256
+            chunksize=256,
+            prefetch=0,
+            background=False
     ):
         super(ValueStore, self).__init__(None)
         self.key_class = key_class
         self.object_index = None
         self.allow_incomplete = allow_incomplete
         self.chunksize = chunksize
+        self.prefetch = prefetch
+        self.background = background
 
         self.object_pos = None
         self._len = 0
@@ -36,7 +57,9 @@ class ValueStore(ObjectStore):
         return {
             'key_class': self.key_class,
             'allow_incomplete': self.allow_incomplete,
-            'chunksize': self.chunksize
+            'chunksize': self.chunksize,
+            'prefetch': self.prefetch,
+            'background': self.background
         }
 
     def create_uuid_index(self):
@@ -80,9 +103,11 @@ class ValueStore(ObjectStore):
         except KeyError:
             pass
 
-        obj = self.vars['value'][n_idx]
-
-        self.cache[n_idx] = obj
+        # the lookup might wait for the reader thread of the cache, so the
+        # lock is only held for the read itself
+        with self.cache.variable_lock:
+            obj = self.vars['value'][n_idx]
+            self.cache[n_idx] = obj
 
         return obj
 
@@ -106,15 +131,25 @@ class ValueStore(ObjectStore):
 
             n_idx = idx
 
+        # the cache might read the variable in a background thread
+        with self.cache.variable_lock:
+            if self.allow_incomplete:
+                # only if partial storage is used store index and update
+                self.vars['index'][n_idx] = pos
+
+            self.vars['value'][n_idx] = value
+
         if self.allow_incomplete:
-            # only if partial storage is used store index and update
-            self.vars['index'][n_idx] = pos
             self.index[pos] = n_idx
 
-        self.vars['value'][n_idx] = value
         self.cache[n_idx] = value
         self._len = max(self._len, n_idx + 1)
 
+    def set_write_buffer(self, max_rows):
+        if max_rows:
+            raise NotImplementedError(
+                'ValueStores do not support write buffers')
+
     def fill_cache(self):
         self.cache.load_max()
 
@@ -132,7 +167,10 @@ class ValueStore(ObjectStore):
     def initialize_cache(self):
         self.cache = LRUChunkLoadingCache(
             chunksize=self.chunksize,
-            variable=self.vars['value']
+            variable=self.vars['value'],
+            prefetch=self.prefetch,
+            background=self.background,
+            lock=self.storage.lock
         )
         self.cache.update_size()
 
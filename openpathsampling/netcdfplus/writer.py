@@ -0,0 +1,292 @@
+import logging
+import threading
+
+try:
+    import queue
+except ImportError:  # py2
+    import Queue as queue
+
+from .base import StorableObject
+from .proxy import LoaderProxy
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWriter(object):
+    """
+    Perform saves and syncs of a storage in a separate writer thread
+
+    Save and sync requests are queued and the writer thread handles them in
+    the order they were made. Since an object is only written after all
+    objects saved before it, every object it references has already been
+    written (or is written in the same save) and the UUID/index mapping of
+    the storage stays consistent.
+
+    Until an object has been written, the writer keeps a reference to it and
+    reports it as being part of the storage (see :meth:`__contains__`).
+
+    The writer thread holds the `lock` of the storage while it handles a
+    request. The same lock is taken by every read and write of a storage
+    variable, by loading through a :class:`LoaderProxy` and by the caches of
+    value stores, so other threads can keep loading from the storage while
+    the writer is busy. Attributes (e.g. CVs) that are saved with new
+    objects are evaluated in :meth:`save` on the calling thread, so that the
+    writer only reads their cached values.
+
+    All other attributes are taken from the storage after waiting for the
+    queue to be empty.
+
+    Parameters
+    ----------
+    storage : :class:`openpathsampling.netcdfplus.NetCDFPlus`
+        the storage to write to
+    max_pending : int
+        the maximal number of queued requests. If the queue is full,
+        :meth:`save` blocks until the writer has caught up. Use 0 for an
+        unbounded queue.
+
+    Attributes
+    ----------
+    storage : :class:`openpathsampling.netcdfplus.NetCDFPlus`
+        the storage that is written to
+    n_written : int
+        the number of save requests that have been written
+
+    Examples
+    --------
+    >>> writer = BackgroundWriter(storage)
+    >>> writer.save(step)  # returns immediately
+    >>> writer.flush()  # wait until everything is synced to disk
+    """
+
+    def __init__(self, storage, max_pending=100):
+        self.storage = storage
+        self.n_written = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run,
+            name='BackgroundWriter(%s)' % storage.filename
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __getattr__(self, item):
+        # only called for attributes this class does not have itself
+        if item.startswith('_') or item == 'storage':
+            raise AttributeError(item)
+
+        self.flush(sync=False)
+        return getattr(self.storage, item)
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+
+                method, obj = task
+                if self._error is None:
+                    try:
+                        with self.storage.lock:
+                            if obj is None:
+                                method()
+                            else:
+                                method(obj)
+                        if obj is not None:
+                            self.n_written += 1
+                    except Exception as e:
+                        logger.error('Background write failed: %s' % e)
+                        self._error = e
+
+                if obj is not None:
+                    self._release(obj)
+
+            finally:
+                self._queue.task_done()
+
+    def _pending_uuids(self, obj):
+        if type(obj) in (list, tuple):
+            return sum([self._pending_uuids(part) for part in obj], [])
+        elif hasattr(obj, '__uuid__'):
+            return [obj.__uuid__]
+        else:
+            # cannot be saved, which the writer thread will report
+            return []
+
+    def _is_saved(self, obj):
+        if obj.__uuid__ in self._pending:
+            return True
+
+        try:
+            store = self.storage.find_store(obj)
+        except ValueError:
+            return False
+
+        return obj.__uuid__ in store.index
+
+    def _new_objects(self, obj, key_classes):
+        # all storable objects reachable from `obj` that need to be saved.
+        # The objects of `key_classes` are not searched any further
+        found = {}
+        parts = [obj]
+        while parts:
+            part = parts.pop()
+            if isinstance(part, LoaderProxy):
+                # has been loaded from a storage
+                continue
+            elif isinstance(part, StorableObject):
+                if part.__uuid__ in found or self._is_saved(part):
+                    continue
+
+                found[part.__uuid__] = part
+                if not isinstance(part, key_classes):
+                    parts.append(part.to_dict())
+
+            elif isinstance(part, dict):
+                parts.extend(part.values())
+            elif isinstance(part, (list, tuple)):
+                parts.extend(part)
+
+        return found.values()
+
+    def _resolve_attributes(self, obj):
+        # evaluate the attributes that are saved together with new objects
+        # on this thread. The writer then finds their values in the caches
+        stores = [
+            store for store in list(self.storage.objects.values())
+            if store.attribute_list
+        ]
+        if not stores:
+            return
+
+        key_classes = tuple(store.content_class for store in stores)
+        with self._pending_lock:
+            new_objects = list(self._new_objects(obj, key_classes))
+
+        for store in stores:
+            attributes = [
+                attribute for attribute, attribute_store
+                in list(store.attribute_list.items())
+                if not attribute_store.allow_incomplete and
+                attribute._eval_dict is not None
+            ]
+            for key in new_objects:
+                if isinstance(key, store.content_class):
+                    for attribute in attributes:
+                        attribute(key)
+
+    def _release(self, obj):
+        with self._pending_lock:
+            for uuid in self._pending_uuids(obj):
+                count = self._pending[uuid] - 1
+                if count == 0:
+                    del self._pending[uuid]
+                else:
+                    self._pending[uuid] = count
+
+    def _raise_error(self):
+        if self._error is not None:
+            error = self._error
+            self._error = None
+            raise error
+
+    def _put(self, method, obj=None):
+        if not self._thread.is_alive():
+            raise RuntimeError('BackgroundWriter is closed')
+
+        self._raise_error()
+
+        if obj is not None:
+            with self._pending_lock:
+                for uuid in self._pending_uuids(obj):
+                    self._pending[uuid] = self._pending.get(uuid, 0) + 1
+
+        # blocks if `max_pending` requests are queued already
+        self._queue.put((method, obj))
+
+    @property
+    def n_pending(self):
+        """
+        int : the number of queued requests that have not been handled yet
+        """
+        return self._queue.unfinished_tasks
+
+    def save(self, obj):
+        """
+        Queue an object (or a list/tuple of objects) for saving
+
+        Parameters
+        ----------
+        obj : :class:`openpathsampling.netcdfplus.StorableObject` or list
+            the object(s) to be saved
+        """
+        self._resolve_attributes(obj)
+        self._put(self.storage.save, obj)
+
+    # the name used by :class:`.StorageHook`
+    stash = save
+
+    def sync(self):
+        """
+        Queue a sync of the storage to disk
+        """
+        self._put(self.storage.sync)
+
+    def sync_all(self):
+        """
+        Queue a `sync_all` of the storage, if it has one, else a `sync`
+        """
+        self._put(getattr(self.storage, 'sync_all', self.storage.sync))
+
+    def flush(self, sync=True):
+        """
+        Block until all queued requests have been handled
+
+        Parameters
+        ----------
+        sync : bool
+            if `True` (default) the storage is synced to disk afterwards so
+            that all saved objects are durable
+
+        Raises
+        ------
+        Exception
+            the first error that occurred in the writer thread since it was
+            last reported. Requests queued after an error are dropped until
+            it has been reported.
+        """
+        if sync and self._thread.is_alive():
+            self.sync_all()
+
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """
+        Write all queued requests, stop the writer and close the storage
+        """
+        if self._thread.is_alive():
+            try:
+                self.flush()
+            finally:
+                self._queue.put(None)
+                self._thread.join()
+                self.storage.close()
+
+    def __contains__(self, item):
+        with self._pending_lock:
+            if item.__uuid__ in self._pending:
+                return True
+
+        self.flush(sync=False)
+        return item in self.storage
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -5,9 +5,11 @@ Created on 19.07.2014
 @author: David W. H. Swenson
 """
 import abc
+import concurrent.futures
 import logging
 import numpy as np
 import random
+import threading
 
 import openpathsampling as paths
 from openpathsampling.netcdfplus import StorableNamedObject, StorableObject
@@ -2283,7 +2285,56 @@ class OneWayExtendMover(SpecializedRandomChoiceMover):
         return self.movers[0].engine
 
 
+def _locked_condition(condition, lock, direction):
+    """Stopping condition that is evaluated while holding `lock`
+
+    Returns `condition` itself if `lock` is None. The check for blocks of
+    frames of `condition` (see :meth:`.DynamicsEngine._block_check`) is
+    kept as the `block_check` of the locked condition.
+    """
+    if lock is None:
+        return condition
+
+    def locked(trajectory, trusted=None):
+        with lock:
+            return condition(trajectory, trusted)
+
+    engine_class = paths.engines.DynamicsEngine
+    block_check = engine_class._block_check(condition, direction)
+    if block_check is not None:
+        def locked_block_check(trajectory, frames):
+            with lock:
+                return block_check(trajectory, frames)
+
+        locked.block_check = locked_block_check
+
+    return locked
+
+
 class AbstractTwoWayShootingMover(EngineMover):
+    """Two-way shooting: one forward and one backward segment
+
+    By default, the second segment is generated after the first one, using
+    the trajectory that includes the new first segment to decide when to
+    stop. If :attr:`.parallel_engine` is set to a second engine instance,
+    both segments are generated at the same time instead: the forward
+    segment runs on :attr:`.engine` and the backward segment runs on
+    ``parallel_engine`` in a worker thread. Each segment then only sees
+    the old trajectory on the other side of the shooting point, so this
+    should only be used if the stopping conditions of each half do not
+    depend on the other half (as for TPS and TIS ensembles).
+
+    The worker thread only waits on the engine, so this is useful for
+    engines that release the GIL (OpenMM) or that run the dynamics in a
+    separate process (external engines, where the two engines must write
+    to different files, e.g., by using different prefixes).
+
+    The stopping conditions of both segments use the same CVs and volumes,
+    and with them the same caches and volume membership memo, none of which
+    are thread-safe. The conditions are therefore evaluated under a lock
+    that both segments share, so that only the dynamics themselves run at
+    the same time.
+    """
     def __init__(self, ensemble, selector, modifier, engine=None):
         super(AbstractTwoWayShootingMover, self).__init__(
             ensemble=ensemble,
@@ -2293,6 +2344,21 @@ class AbstractTwoWayShootingMover(EngineMover):
             modifier=modifier
         )
         # TODO OPS 2.0: This init signature should be aligned with EngineMover
+        self._parallel_engine = None
+
+    @property
+    def parallel_engine(self):
+        """Engine for the backward segment when running both at once"""
+        return self._parallel_engine
+
+    @parallel_engine.setter
+    def parallel_engine(self, engine):
+        self._parallel_engine = engine
+
+    @property
+    def _run_in_parallel(self):
+        return (self._parallel_engine is not None
+                and self._parallel_engine is not self.engine)
 
     # required for concrete class; not really used
     @property
@@ -2300,26 +2366,90 @@ class AbstractTwoWayShootingMover(EngineMover):
         return 'bidrectional'
 
     def _make_forward_trajectory(self, trajectory, initial_snapshot,
-                                 shooting_index):
+                                 shooting_index, engine=None, lock=None):
+        engine = engine or self.engine
         fwd_ens = paths.PrefixTrajectoryEnsemble(
             self.target_ensemble,
             trajectory[0:shooting_index]
         )
-        fwd_partial = self.engine.generate(initial_snapshot,
-                                           running=[fwd_ens.can_append])
+        running = _locked_condition(fwd_ens.can_append, lock, +1)
+        fwd_partial = engine.generate(initial_snapshot, running=[running])
         return fwd_partial
 
     def _make_backward_trajectory(self, trajectory, initial_snapshot,
-                                  shooting_index):
+                                  shooting_index, engine=None, lock=None):
+        engine = engine or self.engine
         # run backward
         bkwd_ens = paths.SuffixTrajectoryEnsemble(
             self.target_ensemble,
             trajectory[shooting_index + 1:]
         )
-        bkwd_partial = self.engine.generate(initial_snapshot.reversed,
-                                            running=[bkwd_ens.can_prepend])
+        running = _locked_condition(bkwd_ens.can_prepend, lock, -1)
+        bkwd_partial = engine.generate(initial_snapshot.reversed,
+                                       running=[running])
         return bkwd_partial
 
+    def _make_backward_trajectory_in_thread(self, trajectory,
+                                            initial_snapshot,
+                                            shooting_index, lock):
+        # signal handlers can only be installed from the main thread, so
+        # the main thread takes care of delaying KeyboardInterrupt
+        engine = self.parallel_engine
+        interrupter = engine.interrupter
+        engine.interrupter = paths.engines.delayedinterrupt.EmptyContext
+        try:
+            return self._make_backward_trajectory(trajectory,
+                                                  initial_snapshot,
+                                                  shooting_index,
+                                                  engine=engine,
+                                                  lock=lock)
+        finally:
+            engine.interrupter = interrupter
+
+    def _make_parallel_trajectories(self, trajectory, initial_snapshot,
+                                    shooting_index, forward_first):
+        """Generate both segments at once; see :attr:`.parallel_engine`
+
+        Errors from the engines are raised after both segments are done.
+        If both segments fail, the error of the segment that would have
+        been run first in serial is raised.
+
+        Returns
+        -------
+        fwd_partial : :class:`.Trajectory`
+            the forward segment, starting with ``initial_snapshot``
+        bkwd_partial : :class:`.Trajectory`
+            the backward segment, starting with ``initial_snapshot``
+            reversed
+        """
+        fwd_error = bkwd_error = None
+        # CVs, their caches and the volume memo are shared by both segments
+        lock = threading.Lock()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            bkwd_future = pool.submit(
+                self._make_backward_trajectory_in_thread,
+                trajectory, initial_snapshot, shooting_index, lock
+            )
+            try:
+                fwd_partial = self._make_forward_trajectory(
+                    trajectory, initial_snapshot, shooting_index, lock=lock
+                )
+            except Exception as e:
+                fwd_error = e
+            try:
+                bkwd_partial = bkwd_future.result()
+            except Exception as e:
+                bkwd_error = e
+
+        errors = [fwd_error, bkwd_error]
+        if not forward_first:
+            errors.reverse()
+        for error in errors:
+            if error is not None:
+                raise error
+
+        return fwd_partial, bkwd_partial
+
     def _run(self, trajectory, shooting_index):
         # to override the default implementation in EngineMover
         raise NotImplementedError
@@ -2356,13 +2486,19 @@ class ForwardFirstTwoWayShootingMover(AbstractTwoWayShootingMover):
         # TODO OPS 2.0: Modification+bias should be done in engine mover
         modified = self.modifier(original)
 
-        fwd_partial = self._make_forward_trajectory(trajectory, modified,
-                                                    shooting_index)
-        # TODO: come up with a test that shows why you need mid_traj here;
-        # should be a SeqEns with OptionalEnsembles. Exact example is hard!
-        mid_traj = trajectory[0:shooting_index] + fwd_partial
-        bkwd_partial = self._make_backward_trajectory(mid_traj, modified,
-                                                      shooting_index)
+        if self._run_in_parallel:
+            fwd_partial, bkwd_partial = self._make_parallel_trajectories(
+                trajectory, modified, shooting_index, forward_first=True
+            )
+        else:
+            fwd_partial = self._make_forward_trajectory(trajectory, modified,
+                                                        shooting_index)
+            # TODO: come up with a test that shows why you need mid_traj
+            # here; should be a SeqEns with OptionalEnsembles. Exact example
+            # is hard!
+            mid_traj = trajectory[0:shooting_index] + fwd_partial
+            bkwd_partial = self._make_backward_trajectory(mid_traj, modified,
+                                                          shooting_index)
 
         # join the two
         trial_trajectory = bkwd_partial.reversed + fwd_partial[1:]
@@ -2402,16 +2538,22 @@ class BackwardFirstTwoWayShootingMover(AbstractTwoWayShootingMover):
         # TODO OPS 2.0: Modification+bias should be done in engine mover
         modified = self.modifier(original)
 
-        bkwd_partial = self._make_backward_trajectory(trajectory, modified,
-                                                      shooting_index)
-        # logger.info("Complete backward shot (length " +
-        #             str(len(bkwd_partial)) + ")")
-        # TODO: come up with a test that shows why you need mid_traj here;
-        # should be a SeqEns with OptionalEnsembles. Exact example is hard!
-        mid_traj = bkwd_partial.reversed + trajectory[shooting_index + 1:]
-        mid_traj_shoot_idx = len(bkwd_partial) - 1
-        fwd_partial = self._make_forward_trajectory(mid_traj, modified,
-                                                    mid_traj_shoot_idx)
+        if self._run_in_parallel:
+            fwd_partial, bkwd_partial = self._make_parallel_trajectories(
+                trajectory, modified, shooting_index, forward_first=False
+            )
+        else:
+            bkwd_partial = self._make_backward_trajectory(trajectory, modified,
+                                                          shooting_index)
+            # logger.info("Complete backward shot (length " +
+            #             str(len(bkwd_partial)) + ")")
+            # TODO: come up with a test that shows why you need mid_traj
+            # here; should be a SeqEns with OptionalEnsembles. Exact example
+            # is hard!
+            mid_traj = bkwd_partial.reversed + trajectory[shooting_index + 1:]
+            mid_traj_shoot_idx = len(bkwd_partial) - 1
+            fwd_partial = self._make_forward_trajectory(mid_traj, modified,
+                                                        mid_traj_shoot_idx)
         # logger.info("Complete forward shot (length " +
         #             str(len(fwd_partial)) + ")")
 
@@ -2452,6 +2594,19 @@ class TwoWayShootingMover(SpecializedRandomChoiceMover):
     def modifier(self):
         return self.movers[0].modifier
 
+    @property
+    def parallel_engine(self):
+        """Second engine to generate both segments at once.
+
+        See :class:`.AbstractTwoWayShootingMover`.
+        """
+        return self.movers[0].parallel_engine
+
+    @parallel_engine.setter
+    def parallel_engine(self, engine):
+        for mover in self.movers:
+            mover.parallel_engine = engine
+
 
 class MinusMover(SubPathMover):
     """
@@ -0,0 +1,174 @@
+"""
+Tools to run independent parts of a simulation in a local process pool.
+
+Worker processes are created by forking, so they start with a copy of all
+objects that exist in the main process (including collective variables
+defined by arbitrary functions, which could not be sent by pickling). The
+results of a worker are sent back by pickling, where objects that already
+existed in the main process are only sent as a reference to their UUID.
+"""
+import io
+import logging
+import multiprocessing
+import pickle
+import random
+import uuid
+
+import numpy as np
+
+from openpathsampling.netcdfplus import StorableObject
+from openpathsampling import rng as ops_rng
+
+logger = logging.getLogger(__name__)
+
+
+def collect_storables(*objects):
+    """Find all storable objects that can be reached from ``objects``
+
+    Parameters
+    ----------
+    objects : list
+        objects to start the search from
+
+    Returns
+    -------
+    dict
+        mapping of UUID to :class:`.StorableObject`
+    """
+    found = {}
+    seen = set()
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, StorableObject):
+            found[obj.__uuid__] = obj
+            stack.extend(vars(obj).values())
+        # storable objects can also be containers (e.g., trajectories)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+
+    return found
+
+
+# persistent ID of objects that are replaced by None
+_DROPPED = "dropped"
+
+
+class _KnownObjectPickler(pickle.Pickler):
+    def __init__(self, file, known, drop=None):
+        super(_KnownObjectPickler, self).__init__(file,
+                                                  pickle.HIGHEST_PROTOCOL)
+        self.known = known
+        self.drop = drop
+
+    def persistent_id(self, obj):
+        if isinstance(obj, StorableObject):
+            if self.known.get(obj.__uuid__) is obj:
+                return obj.__uuid__
+            if self.drop is not None and self.drop(obj):
+                return _DROPPED
+        return None
+
+
+class _KnownObjectUnpickler(pickle.Unpickler):
+    def __init__(self, file, known):
+        super(_KnownObjectUnpickler, self).__init__(file)
+        self.known = known
+
+    def persistent_load(self, pid):
+        if pid == _DROPPED:
+            return None
+        return self.known[pid]
+
+
+def dumps(obj, known, drop=None):
+    """Pickle ``obj``, with objects in ``known`` replaced by their UUID
+
+    Parameters
+    ----------
+    obj : object
+        object to pickle
+    known : dict
+        mapping of UUID to :class:`.StorableObject` for objects that both
+        sides have
+    drop : callable or None
+        if given, storable objects (that are not in ``known``) for which
+        ``drop(obj)`` is True are loaded as None. Use this to avoid sending
+        objects that the other side doesn't need, such as the history of a
+        sample.
+    """
+    buffer = io.BytesIO()
+    _KnownObjectPickler(buffer, known, drop).dump(obj)
+    return buffer.getvalue()
+
+
+def loads(data, known):
+    """Unpickle data from :func:`.dumps`, using objects in ``known``"""
+    return _KnownObjectUnpickler(io.BytesIO(data), known).load()
+
+
+def new_uuid_prefix():
+    """Use a new prefix for UUIDs of storable objects created from now on
+
+    A forked process inherits the UUID counter of its parent, so it would
+    create objects with the same UUIDs as its siblings.
+    """
+    # uuid4 is based on os.urandom, which is safe to use after a fork
+    fields = list(uuid.uuid4().fields[:-1])
+    StorableObject.INSTANCE_UUID = fields
+    StorableObject.ACTIVE_LONG = int(uuid.UUID(fields=tuple(fields + [0])))
+
+
+def seed_rngs(seed, task_number):
+    """Seed all random number generators OPS uses for the given task
+
+    The seed only depends on ``seed`` and ``task_number``, so the results
+    do not depend on which worker runs a task.
+    """
+    seed_seq = np.random.SeedSequence([seed, task_number])
+    state = int(seed_seq.generate_state(1)[0])
+    random.seed(state)
+    np.random.seed(state)
+    default_rng = ops_rng.default_rng()
+    try:
+        bit_generator = default_rng.bit_generator
+    except AttributeError:  # pragma: no cover
+        default_rng.seed(state)  # legacy RandomState
+    else:
+        # reseed in place: many objects keep a reference to this generator
+        bit_generator.state = type(bit_generator)(seed_seq).state
+
+
+def fork_pool(n_workers, initializer=None, initargs=()):
+    """Create a process pool with forked workers
+
+    Raises
+    ------
+    RuntimeError
+        if the platform does not support forking processes
+    """
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError:
+        raise RuntimeError("Parallel runs require the 'fork' start method, "
+                           "which is not available on this platform")
+    return context.Pool(n_workers, initializer=initializer,
+                        initargs=initargs)
+
+
+def worker_counter():
+    """Shared counter that workers use to find their index"""
+    return multiprocessing.get_context('fork').Value('i', 0)
+
+
+def next_worker_index(counter):
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    return index
@@ -4,13 +4,18 @@ import os
 
 import openpathsampling as paths
 from .path_simulator import PathSimulator, MCStep
+from . import parallel
 from ..ops_logging import initialization_logging
 from openpathsampling.beta import hooks
+from openpathsampling.rng import default_rng
 
 
 logger = logging.getLogger(__name__)
 init_log = logging.getLogger('openpathsampling.initialization')
 
+# state of the simulation in a worker of run_parallel; inherited by forking
+_worker_state = {}
+
 
 class PathSampling(PathSimulator):
     """
@@ -278,6 +283,128 @@ class PathSampling(PathSimulator):
         # after simulation hooks
         self.run_hooks('after_simulation', sim=self, hook_state=hook_state)
 
+    def run_parallel(self, n_steps, n_workers=None, seed=None):
+        """Run the simulation, running independent moves in parallel.
+
+        Each batch of ``n_workers`` consecutive MC steps is run at the same
+        time in forked worker processes, all starting from the current
+        sample set. The steps are then applied in order. A step is only
+        applied if none of the ensembles it could have read samples from
+        (the input ensembles of its canonical mover) were changed by an
+        earlier step in the batch. Otherwise, it is run again (with the same
+        random numbers) in the next batch, starting from the updated sample
+        set.
+
+        Every step uses random numbers seeded from ``seed`` and its step
+        number, so the resulting chain is the same as if the steps were run
+        one after the other with those random numbers; it does not depend
+        on the number of workers. This is efficient when most moves only
+        touch a few of many ensembles (e.g., shooting in RETIS).
+
+        The movers that decide which move to do must do so without looking
+        at the samples, as the ones made by :class:`.MoveScheme` do
+        (:class:`.RandomChoiceMover`). Other movers above the canonical
+        mover are treated as reading all their input ensembles. External
+        engines should use :class:`.RandomStringFilenames`, so that the
+        workers write to different files.
+
+        Parameters
+        ----------
+        n_steps : int
+            number of MC steps to run
+        n_workers : int or None
+            number of worker processes; default is the number of CPUs
+        seed : int or None
+            seed for the random numbers used in the steps; if None, it is
+            drawn from the OPS random number generator
+        """
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        if seed is None:
+            seed = int(default_rng().integers(2**32))
+
+        known = parallel.collect_storables(self)
+        # workers are forked (also when the pool replaces one), so the state
+        # has to be there until the pool is closed
+        _worker_state.update(simulation=self, known=known, seed=seed)
+        pool = None
+        hook_state = None
+        self.run_hooks('before_simulation', sim=self, n_steps=n_steps)
+        final_step = self.step + n_steps
+        first_step = self.step + 1
+        try:
+            pool = parallel.fork_pool(
+                n_workers, initializer=parallel.new_uuid_prefix
+            )
+            while self.step < final_step:
+                step_numbers = list(range(
+                    self.step + 1, min(self.step + n_workers, final_step) + 1
+                ))
+                hook_state = self._run_parallel_batch(
+                    pool, step_numbers, known, first_step, n_steps,
+                    hook_state
+                )
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            _worker_state.clear()
+
+        self.run_hooks('after_simulation', sim=self, hook_state=hook_state)
+
+    def _run_parallel_batch(self, pool, step_numbers, known, first_step,
+                            n_steps, hook_state):
+        sample_set = self.sample_set
+        current = set(sample.__uuid__ for sample in sample_set)
+
+        def is_history(obj):
+            return (isinstance(obj, paths.Sample)
+                    and obj.__uuid__ not in current)
+
+        data = parallel.dumps(sample_set, known, drop=is_history)
+        batch_known = dict(known)
+        batch_known.update(_sample_set_storables(sample_set))
+
+        results = pool.imap(_path_sampling_worker_task,
+                            [(step_number, data)
+                             for step_number in step_numbers])
+        changed = set()
+        for step_number, result in zip(step_numbers, results):
+            movepath = parallel.loads(result, batch_known)
+            if changed & _read_ensembles(movepath):
+                # this step depends on an earlier step in this batch
+                logger.info("Rerunning MC cycle " + str(step_number))
+                break
+
+            self.step += 1
+            logger.info("Beginning MC cycle " + str(self.step))
+            step_info = step_number - first_step, n_steps
+            self.run_hooks('before_step', sim=self, step_number=step_number,
+                           step_info=step_info, state=self.sample_set)
+
+            samples = movepath.results
+            new_sampleset = self.sample_set.apply_samples(samples)
+            changed.update(_changed_ensembles(self.sample_set,
+                                              new_sampleset))
+            mcstep = MCStep(
+                simulation=self,
+                mccycle=self.step,
+                previous=self.sample_set,
+                active=new_sampleset,
+                change=movepath
+            )
+            self._current_step = mcstep
+            self.sample_set = new_sampleset
+
+            hook_state = self.run_hooks('after_step', sim=self,
+                                        step_number=step_number,
+                                        step_info=step_info,
+                                        state=self.sample_set,
+                                        results=mcstep,
+                                        hook_state=hook_state
+                                        )
+        return hook_state
+
     def run_one_step(self, step_info, hook_state=None):
         # bookkeeping and before_step hooks
         self.step += 1
@@ -315,3 +442,54 @@ class PathSampling(PathSimulator):
                                     hook_state=hook_state
                                     )
         return hook_state, mcstep
+
+
+def _sample_set_storables(sample_set):
+    """Samples, trajectories and snapshots in a sample set, by UUID"""
+    objects = {}
+    for sample in sample_set:
+        objects[sample.__uuid__] = sample
+        objects[sample.trajectory.__uuid__] = sample.trajectory
+        for snapshot in sample.trajectory:
+            objects[snapshot.__uuid__] = snapshot
+    return objects
+
+
+def _read_ensembles(change):
+    """Ensembles that the move in ``change`` may have taken samples from"""
+    ensembles = set()
+    pmc = change
+    # same walk as MoveChange.canonical
+    while pmc.subchange is not None and pmc.mover.is_canonical is not True:
+        mover = pmc.mover
+        sample_independent = (
+            isinstance(mover, (paths.RandomChoiceMover,
+                               paths.PathSimulatorMover))
+            and not isinstance(mover, paths.RandomAllowedChoiceMover)
+        )
+        if not sample_independent:
+            ensembles.update(mover.input_ensembles)
+        pmc = pmc.subchange
+    ensembles.update(pmc.mover.input_ensembles)
+    return ensembles
+
+
+def _changed_ensembles(old_sample_set, new_sample_set):
+    """Ensembles with a different sample after the move"""
+    old = set(old_sample_set)
+    new = set(new_sample_set)
+    return set(sample.ensemble for sample in old ^ new)
+
+
+def _path_sampling_worker_task(task):
+    step_number, sample_set_data = task
+    sim = _worker_state['simulation']
+    known = dict(_worker_state['known'])
+    sample_set = parallel.loads(sample_set_data, known)
+    known.update(_sample_set_storables(sample_set))
+
+    parallel.seed_rngs(_worker_state['seed'], step_number)
+    time_start = time.time()  # we time **only** the MCStep (as run_one_step)
+    movepath = sim._mover.move(sample_set, step=step_number)
+    setattr(movepath.details, "timing", time.time() - time_start)
+    return parallel.dumps(movepath, known)
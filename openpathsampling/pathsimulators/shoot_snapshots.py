@@ -3,7 +3,12 @@ import openpathsampling as paths
 
 logger = logging.getLogger(__name__)
 from .path_simulator import PathSimulator, MCStep
+from . import parallel
 from openpathsampling.beta import hooks
+from openpathsampling.rng import default_rng
+
+# state of the simulation in a worker of run_parallel; inherited by forking
+_worker_state = {}
 
 class ShootFromSnapshotsSimulation(PathSimulator):
     """
@@ -144,26 +149,7 @@ class ShootFromSnapshotsSimulation(PathSimulator):
                 else:
                     start_snap = self.randomizer(snapshot)
 
-                sample_set = paths.SampleSet([
-                    paths.Sample(replica=0,
-                                 trajectory=paths.Trajectory([start_snap]),
-                                 ensemble=self.starting_ensemble)
-                ])
-                sample_set.sanity_check()
-
-                # shoot_snapshot_task (start)
-                new_pmc = self.mover.move(sample_set)
-                samples = new_pmc.results
-                new_sample_set = sample_set.apply_samples(samples)
-
-                mcstep = MCStep(
-                    simulation=self,
-                    mccycle=self.step,
-                    previous=sample_set,
-                    active=new_sample_set,
-                    change=new_pmc
-                )
-                # shoot_snapshot_task (end)
+                mcstep = self._shoot_snapshot_task(start_snap, step_number)
 
                 hook_state = self.run_hooks(
                     'after_step', sim=self, step_number=step_number,
@@ -176,6 +162,158 @@ class ShootFromSnapshotsSimulation(PathSimulator):
             snap_num += 1
         self.run_hooks('after_simulation', sim=self, hook_state=hook_state)
 
+    def _shoot_snapshot_task(self, start_snap, step_number):
+        sample_set = paths.SampleSet([
+            paths.Sample(replica=0,
+                         trajectory=paths.Trajectory([start_snap]),
+                         ensemble=self.starting_ensemble)
+        ])
+        sample_set.sanity_check()
+
+        new_pmc = self.mover.move(sample_set)
+        samples = new_pmc.results
+        new_sample_set = sample_set.apply_samples(samples)
+
+        mcstep = MCStep(
+            simulation=self,
+            mccycle=step_number,
+            previous=sample_set,
+            active=new_sample_set,
+            change=new_pmc
+        )
+        return mcstep
+
+    def run_parallel(self, n_per_snapshot, as_chain=False, n_workers=None,
+                     engines=None, seed=None):
+        """Run the simulation, spreading the shots over a process pool.
+
+        The shots are run by worker processes that are forked from this
+        process, so this requires a platform that supports ``fork``. The
+        steps are returned to this process and passed to the hooks (and
+        thereby saved to storage) in the same order as in :meth:`.run`.
+        Since the shots are run before their hooks are called, the
+        ``before_step`` hook is called just before the ``after_step`` hook
+        of the same step.
+
+        Each step uses random numbers seeded from ``seed`` and its step
+        number, so the results do not depend on the number of workers.
+        They are not the same as the results of :meth:`.run`.
+
+        Parameters
+        ----------
+        n_per_snapshot : int
+            number of shots per snapshot
+        as_chain : bool
+            see :meth:`.run`. If True, all shots from a given snapshot are
+            run by the same worker.
+        n_workers : int or None
+            number of worker processes; if None, the number of engines if
+            ``engines`` is given, otherwise the number of CPUs
+        engines : list of :class:`.DynamicsEngine` or None
+            engines to use instead of :attr:`.engine`, one per worker. If
+            None, each worker uses its own copy of :attr:`.engine`. Engines
+            that write files (such as external engines) need one instance
+            per worker, writing to different files.
+        seed : int or None
+            seed for the random numbers used in the shots; if None, it is
+            drawn from the OPS random number generator
+        """
+        if engines is not None:
+            engines = list(engines)
+            if n_workers is None:
+                n_workers = len(engines)
+            elif n_workers > len(engines):
+                raise ValueError("Need one engine per worker: got "
+                                 + str(len(engines)) + " engines for "
+                                 + str(n_workers) + " workers")
+        if seed is None:
+            seed = int(default_rng().integers(2**32))
+
+        n_snapshots = len(self.initial_snapshots)
+        tasks = []
+        for snap_num in range(n_snapshots):
+            step_numbers = [snap_num * n_per_snapshot + step
+                            for step in range(n_per_snapshot)]
+            if as_chain:
+                tasks.append((snap_num, step_numbers))
+            else:
+                tasks.extend((snap_num, [num]) for num in step_numbers)
+
+        known = parallel.collect_storables(self, engines)
+        # workers are forked (also when the pool replaces one), so the state
+        # has to be there until the pool is closed
+        _worker_state.update(simulation=self, engines=engines, known=known,
+                             seed=seed, as_chain=as_chain)
+        pool = None
+        self.step = 0
+        hook_state = None
+        self.run_hooks('before_simulation', sim=self,
+                       n_per_snapshot=n_per_snapshot)
+        try:
+            pool = parallel.fork_pool(
+                n_workers,
+                initializer=_init_shooting_worker,
+                initargs=(parallel.worker_counter(),)
+            )
+            results = pool.imap(_shooting_worker_task, tasks)
+            state = None
+            for (snap_num, _), data in zip(tasks, results):
+                for mcstep in parallel.loads(data, known):
+                    step_number = mcstep.mccycle
+                    step = step_number - snap_num * n_per_snapshot
+                    step_info = (snap_num, n_snapshots, step, n_per_snapshot)
+                    if step == 0:
+                        state = self.initial_snapshots[snap_num]
+                    self.run_hooks('before_step', sim=self,
+                                   step_number=step_number,
+                                   step_info=step_info, state=state)
+
+                    state = mcstep.previous[0].trajectory[0]
+                    hook_state = self.run_hooks(
+                        'after_step', sim=self, step_number=step_number,
+                        step_info=step_info, state=state, results=mcstep,
+                        hook_state=hook_state
+                    )
+                    self.step += 1
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            _worker_state.clear()
+        self.run_hooks('after_simulation', sim=self, hook_state=hook_state)
+
+
+def _init_shooting_worker(counter):
+    parallel.new_uuid_prefix()
+    engines = _worker_state['engines']
+    if engines is not None:
+        sim = _worker_state['simulation']
+        # a worker that replaces a dead one gets the next index; reuse the
+        # engines (spare ones first) instead of running out of them
+        index = parallel.next_worker_index(counter) % len(engines)
+        engine = engines[index]
+        for obj in _worker_state['known'].values():
+            if isinstance(obj, paths.EngineMover) and obj._engine is sim.engine:
+                obj.engine = engine
+        sim.engine = engine
+        paths.EngineMover.default_engine = engine
+
+
+def _shooting_worker_task(task):
+    snap_num, step_numbers = task
+    sim = _worker_state['simulation']
+    snapshot = sim.initial_snapshots[snap_num]
+    start_snap = snapshot
+    mcsteps = []
+    for step_number in step_numbers:
+        parallel.seed_rngs(_worker_state['seed'], step_number)
+        if _worker_state['as_chain']:
+            start_snap = sim.randomizer(start_snap)
+        else:
+            start_snap = sim.randomizer(snapshot)
+        mcsteps.append(sim._shoot_snapshot_task(start_snap, step_number))
+    return parallel.dumps(mcsteps, _worker_state['known'])
+
 
 class CommittorSimulation(ShootFromSnapshotsSimulation):
     """Committor simulations. What state do you hit from a given snapshot?
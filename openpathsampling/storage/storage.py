@@ -9,7 +9,7 @@ import time
 
 import openpathsampling as paths
 from openpathsampling.netcdfplus import NetCDFPlus, WeakLRUCache, ObjectStore, \
-    ImmutableDictStore, NamedObjectStore, PseudoAttributeStore
+    ImmutableDictStore, NamedObjectStore, PseudoAttributeStore, ByteLRUCache
 
 from .stores import SnapshotWrapperStore
 
@@ -41,6 +41,9 @@ class Storage(NetCDFPlus):
     template : :class:`openpathsampling.Snapshot`
         a Snapshot instance that contains a reference to a Topology, the
         number of atoms and used units
+    profile : str or list of tuple or None
+        the storage profile that sets chunking and compression of new
+        variables, see :meth:`storage_profiles`. `None` uses `'default'`.
     """
 
     @property
@@ -55,7 +58,8 @@ class Storage(NetCDFPlus):
             filename,
             mode=None,
             template=None,
-            fallback=None):
+            fallback=None,
+            profile=None):
 
         self._template = template
         super(Storage, self).__init__(
@@ -63,6 +67,9 @@ class Storage(NetCDFPlus):
             mode,
             fallback=fallback)
 
+        if profile is not None:
+            self.set_storage_profile(profile)
+
     def _create_simplifier(self):
         super(Storage, self)._create_simplifier()
         self.simplifier.safemode = False
@@ -159,7 +166,7 @@ class Storage(NetCDFPlus):
         self.cvs.sync_all()
         self.sync()
 
-    def set_caching_mode(self, mode='default'):
+    def set_caching_mode(self, mode='default', cv_cache_bytes=None):
         r"""
         Set default values for all caches
 
@@ -168,6 +175,10 @@ class Storage(NetCDFPlus):
         mode : str
             One of the following values is allowed `default`, `production`,
             `analysis`, `off`, `lowmemory` and `memtest`
+        cv_cache_bytes : int or None
+            if not `None`, each CV in this storage keeps its computed values
+            in a :class:`.ByteLRUCache` limited to this many bytes (instead
+            of keeping the values of all snapshots in memory)
 
         """
 
@@ -191,6 +202,13 @@ class Storage(NetCDFPlus):
                 str(available_cache_sizes.keys())
             )
 
+        if cv_cache_bytes is not None:
+            # before the store caches change, so that the CVs in memory
+            # get the new value caches
+            self.attributes.set_value_cache_factory(
+                lambda: ByteLRUCache(cv_cache_bytes, weak_keys=True)
+            )
+
         for store_name, caching in cache_sizes.items():
             if hasattr(self, store_name):
                 store = getattr(self, store_name)
@@ -222,6 +240,58 @@ class Storage(NetCDFPlus):
                 logger.info('Loaded version is older. Should be no problem '
                             'other then missing features and information')
 
+    @staticmethod
+    def storage_profiles():
+        """
+        Chunking and compression profiles for snapshot features and CVs
+
+        * `default` : chunks of 256 snapshots, no compression
+        * `simulation` : small chunks of 32 snapshots for coordinates,
+          velocities and box vectors, so appending a snapshot touches little
+          data
+        * `analysis` : CV values are chunked like the values that the cache
+          of their store loads at once, so that reading CV values frame by
+          frame reads whole chunks. By default, CVs that are stored for all
+          snapshots use chunks of a single value.
+        * `archive` : like `analysis` but snapshot features and CV values
+          are compressed with zlib and the shuffle filter
+        * `compact` : like `archive` but coordinates and velocities are
+          rounded to a precision of 0.001 (nm and nm/ps for OpenMM) and
+          stored as integers, like in XTC files. This loses information, so
+          use it only for trajectories that are kept for analysis.
+
+        Returns
+        -------
+        dict of str, list of tuple
+            pairs of variable name patterns and settings per profile, see
+            :meth:`NetCDFPlus.storage_profiles`
+        """
+        features = ['*_coordinates', '*_velocities', '*_box_vectors']
+        compressed = {'zlib': True, 'complevel': 4, 'shuffle': True}
+        cv_values = ('cv*_value', {'chunk_rows': 'store'})
+
+        return {
+            'default': [],
+            'simulation': [
+                (pattern, {'chunk_rows': 32}) for pattern in features
+            ],
+            'analysis': [
+                cv_values
+            ],
+            'archive': [
+                (pattern, compressed) for pattern in features
+            ] + [
+                (cv_values[0], dict(compressed, **cv_values[1]))
+            ],
+            'compact': [
+                (pattern, dict(compressed, precision=0.001))
+                for pattern in features[:2]
+            ] + [
+                (features[2], compressed),
+                (cv_values[0], dict(compressed, **cv_values[1]))
+            ]
+        }
+
     @staticmethod
     def default_cache_sizes():
         """
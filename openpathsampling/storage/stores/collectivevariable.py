@@ -30,4 +30,5 @@ class CVStore(PseudoAttributeStore):
             cv.diskcache_chunksize = cache_store.chunksize
             cv.allow_incomplete = cache_store.allow_incomplete
 
+        self._apply_value_cache_factory(cv)
         return cv
@@ -210,4 +210,4 @@ class BaseSnapshotStore(IndexedObjectStore):
             return None
 
     def __len__(self):
-        return len(self.storage.dimensions[self.prefix]) * 2
+        return super(BaseSnapshotStore, self).__len__() * 2
@@ -12,12 +12,16 @@ class SnapshotValueStore(ValueStore):
             self,
             time_reversible=True,
             allow_incomplete=False,
-            chunksize=256
+            chunksize=256,
+            prefetch=0,
+            background=False
     ):
         super(SnapshotValueStore, self).__init__(
             peng.BaseSnapshot,
             allow_incomplete=allow_incomplete,
-            chunksize=chunksize)
+            chunksize=chunksize,
+            prefetch=prefetch,
+            background=background)
 
         if not time_reversible and not allow_incomplete:
             raise RuntimeError(
@@ -30,7 +34,9 @@ class SnapshotValueStore(ValueStore):
         return {
             'time_reversible': self.time_reversible,
             'allow_incomplete': self.allow_incomplete,
-            'chunksize': self.chunksize
+            'chunksize': self.chunksize,
+            'prefetch': self.prefetch,
+            'background': self.background
         }
 
     def __len__(self):
@@ -71,9 +77,11 @@ class SnapshotValueStore(ValueStore):
         except KeyError:
             pass
 
-        obj = self.vars['value'][n_idx]
-
-        self.cache[n_idx] = obj
+        # the lookup might wait for the reader thread of the cache, so the
+        # lock is only held for the read itself
+        with self.cache.variable_lock:
+            obj = self.vars['value'][n_idx]
+            self.cache[n_idx] = obj
 
         return obj
 
@@ -100,11 +108,16 @@ class SnapshotValueStore(ValueStore):
 
             n_idx = idx
 
+        # the cache might read the variable in a background thread
+        with self.cache.variable_lock:
+            if self.allow_incomplete:
+                # only if partial storage is used store index and update
+                self.vars['index'][n_idx] = pos
+
+            self.vars['value'][n_idx] = value
+
         if self.allow_incomplete:
-            # only if partial storage is used store index and update
-            self.vars['index'][n_idx] = pos
             self.index[pos] = n_idx
 
-        self.vars['value'][n_idx] = value
         self.cache[n_idx] = value
         self._len = max(self._len, n_idx + 1)
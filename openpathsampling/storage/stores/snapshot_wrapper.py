@@ -208,8 +208,13 @@ class SnapshotWrapperStore(ObjectStore):
 
         return obj
 
+    def _store_idx(self, pos):
+        # read through `vars` to see rows still in a write buffer
+        store_idx = self.vars['store'][pos]
+        return -1 if store_idx is None else store_idx
+
     def _load(self, idx):
-        store_idx = int(self.variables['store'][idx // 2])
+        store_idx = self._store_idx(idx // 2)
 
         if store_idx < 0:
             if self.fallback_store is not None:
@@ -225,7 +230,7 @@ class SnapshotWrapperStore(ObjectStore):
             return snap
 
     def __len__(self):
-        return len(self.storage.dimensions[self.prefix]) * 2
+        return super(SnapshotWrapperStore, self).__len__() * 2
 
     def initialize(self):
         super(SnapshotWrapperStore, self).initialize()
@@ -325,7 +330,7 @@ class SnapshotWrapperStore(ObjectStore):
 
         if n_idx is not None:
             # snapshot is mentioned
-            store_idx = int(self.variables['store'][n_idx // 2])
+            store_idx = self._store_idx(n_idx // 2)
             if not store_idx == -1:
                 # and stored
                 return self.reference(obj)
@@ -659,6 +664,11 @@ class SnapshotWrapperStore(ObjectStore):
             # dimension Even if the other variables all share the same chunksize
             chunksize = 1
 
+            settings = self.storage.variable_settings(store_name + '_value')
+            if settings.get('chunk_rows') == 'store':
+                # chunks of the values that the cache of the store loads
+                chunksize = store.chunksize
+
             if shape is not None:
                 shape = tuple(['snapshots'] + list(shape))
                 chunksizes = tuple([chunksize] + list(chunksizes))
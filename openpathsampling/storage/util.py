@@ -1,7 +1,7 @@
 import openpathsampling as paths
 
 
-def split_md_storage(filename):
+def split_md_storage(filename, profile=None):
     """
     Split storage into two files; trajectories and the rest
 
@@ -9,6 +9,14 @@ def split_md_storage(filename):
     additional stores. Otherwise we need to store the full snapshots for
     CVs anyway and nothing is gained.
 
+    Parameters
+    ----------
+    filename : str
+        the file to be split
+    profile : str or list of tuple or None
+        the storage profile used for both new files, see
+        :meth:`.Storage.storage_profiles`
+
     """
 
     st_from = paths.AnalysisStorage(
@@ -21,8 +29,8 @@ def split_md_storage(filename):
     filename_data = filename_base + '_frames.nc'
 
     # `use_uuid=True`, otherwise we cannot later recombine the two!
-    st_main = paths.Storage(filename=filename_main, mode='w')
-    st_traj = paths.Storage(filename=filename_data, mode='w')
+    st_main = paths.Storage(filename=filename_main, mode='w', profile=profile)
+    st_traj = paths.Storage(filename=filename_data, mode='w', profile=profile)
 
     st_main.snapshots.save(st_from.snapshots[0])
     st_traj.snapshots.save(st_from.snapshots[0])
@@ -31,14 +39,19 @@ def split_md_storage(filename):
     st_main.snapshots.only_mention = True
 
     # save trajectories to data
-    map(st_traj.trajectories.save, st_from.trajectories)
+    for traj in st_from.trajectories:
+        st_traj.trajectories.save(traj)
+
     q = st_from.snapshots.all()
     cvs = st_from.cvs
 
     [cv(q) for cv in cvs]
 
-    map(st_main.cvs.save, st_from.cvs)
-    map(st_main.trajectories.mention, st_from.trajectories)
+    for cv in st_from.cvs:
+        st_main.cvs.save(cv)
+
+    for traj in st_from.trajectories:
+        st_main.trajectories.mention(traj)
 
     for storage_name in [
         'steps', 'pathmovers', 'topologies', 'networks', 'details',
@@ -46,17 +59,29 @@ def split_md_storage(filename):
         'samplesets', 'ensembles', 'transitions', 'movechanges',
         'pathsimulators', 'cvs', 'interfacesets', 'msouters'
     ]:
-        map(
-            getattr(st_main, storage_name).save,
-            getattr(st_from, storage_name)
-        )
+        for obj in getattr(st_from, storage_name):
+            getattr(st_main, storage_name).save(obj)
 
     st_main.close()
     st_traj.close()
     st_from.close()
 
 
-def join_md_storage(filename_main, filename_data=None):
+def join_md_storage(filename_main, filename_data=None, profile=None):
+    """
+    Join a storage split by :func:`split_md_storage` into a single file
+
+    Parameters
+    ----------
+    filename_main : str
+        the file with everything but the trajectories (`*_main.nc`)
+    filename_data : str or None
+        the file with the trajectories. `None` uses `*_frames.nc`
+    profile : str or list of tuple or None
+        the storage profile used for the joined file, see
+        :meth:`.Storage.storage_profiles`
+
+    """
     if filename_data is None:
         filename_data = filename_main[:-7] + 'frames.nc'
 
@@ -74,10 +99,12 @@ def join_md_storage(filename_main, filename_data=None):
 
     st_to = paths.Storage(
         filename_to,
-        mode='w'
+        mode='w',
+        profile=profile
     )
 
-    map(st_to.trajectories.save, st_traj.trajectories)
+    for traj in st_traj.trajectories:
+        st_to.trajectories.save(traj)
 
     for storage_name in [
         'steps',
@@ -86,9 +113,8 @@ def join_md_storage(filename_main, filename_data=None):
         'samplesets', 'ensembles', 'transitions', 'movechanges',
         'samples', 'pathsimulators', 'cvs', 'interfacesets', 'msouters'
     ]:
-        map(
-            getattr(st_to, storage_name).save,
-            getattr(st_main, storage_name))
+        for obj in getattr(st_main, storage_name):
+            getattr(st_to, storage_name).save(obj)
 
     st_traj.close()
     st_main.close()
@@ -265,6 +265,13 @@ class TestStorageHook(object):
         self.hook.after_simulation(self.simulation, {})
         self.storage.sync_all.assert_called_once()
 
+    def test_after_simulation_background_writer(self):
+        writer = MagicMock(spec=["stash", "sync_all", "flush"])
+        hook = StorageHook(storage=writer, frequency=10)
+        hook.after_simulation(self.simulation, {})
+        writer.flush.assert_called_once()
+        writer.sync_all.assert_not_called()
+
 
 class TestShootFromSnapshotsOutputHook(object):
     def setup(self):
@@ -0,0 +1,71 @@
+import pickle
+import random
+
+import numpy as np
+
+import openpathsampling as paths
+from openpathsampling.netcdfplus import StorableObject
+from openpathsampling.pathsimulators import parallel
+from openpathsampling.rng import default_rng
+
+from ..test_helpers import make_1d_traj
+
+
+class TestParallelTools(object):
+    def setup(self):
+        cv = paths.FunctionCV("x", lambda snap: snap.xyz[0][0])
+        self.volume = paths.CVDefinedVolume(cv, 0.0, 1.0)
+        self.ensemble = paths.AllInXEnsemble(self.volume)
+        self.traj = make_1d_traj([0.1, 0.2, 0.3])
+
+    def test_collect_storables(self):
+        known = parallel.collect_storables(self.ensemble, [self.traj])
+        for obj in [self.ensemble, self.volume, self.traj, self.traj[0]]:
+            assert known[obj.__uuid__] is obj
+
+    def test_dumps_loads(self):
+        known = parallel.collect_storables(self.ensemble)
+        sample = paths.Sample(replica=0, trajectory=self.traj,
+                              ensemble=self.ensemble)
+        # the ensemble contains a lambda, so it can't be pickled by value
+        data = parallel.dumps(sample, known)
+        new_sample = parallel.loads(data, known)
+        assert new_sample is not sample
+        assert new_sample.__uuid__ == sample.__uuid__
+        assert new_sample.ensemble is self.ensemble
+        assert new_sample.trajectory == sample.trajectory
+        assert new_sample.parent is None
+
+    def test_new_uuid_prefix(self):
+        prefix = StorableObject.INSTANCE_UUID
+        active = StorableObject.ACTIVE_LONG
+        try:
+            parallel.new_uuid_prefix()
+            assert StorableObject.INSTANCE_UUID != prefix
+            assert StorableObject.get_uuid() >> 48 != active >> 48
+        finally:
+            StorableObject.INSTANCE_UUID = prefix
+            StorableObject.ACTIVE_LONG = active
+
+    def test_seed_rngs(self):
+        def draw():
+            return (random.random(), np.random.random(),
+                    default_rng().random())
+
+        parallel.seed_rngs(11, 3)
+        first = draw()
+        parallel.seed_rngs(11, 4)
+        assert draw() != first
+        parallel.seed_rngs(11, 3)
+        assert draw() == first
+
+
+def test_pickle_movechange():
+    traj = make_1d_traj([0.1, 0.2])
+    ensemble = paths.LengthEnsemble(2)
+    sample = paths.Sample(replica=0, trajectory=traj, ensemble=ensemble)
+    change = paths.AcceptedSampleMoveChange(samples=[sample],
+                                            details=paths.Details(foo=1))
+    new_change = pickle.loads(pickle.dumps(change))
+    assert new_change.foo == 1
+    assert new_change.samples[0].trajectory == traj
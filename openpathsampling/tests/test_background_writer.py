@@ -0,0 +1,120 @@
+import os
+import threading
+
+import pytest
+
+import openpathsampling as paths
+from openpathsampling.netcdfplus import BackgroundWriter
+
+from .test_helpers import make_1d_traj
+
+
+class TestBackgroundWriter(object):
+    def setup(self):
+        self.filename = "test_background_writer.nc"
+        self.storage = paths.Storage(self.filename, 'w')
+        self.writer = BackgroundWriter(self.storage, max_pending=2)
+        self.trajs = [make_1d_traj([float(i), float(i) + 0.5])
+                      for i in range(5)]
+
+    def teardown(self):
+        self.writer.close()
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    def test_save_and_flush(self):
+        for traj in self.trajs:
+            self.writer.save(traj)
+        self.writer.flush()
+        assert self.writer.n_pending == 0
+        assert self.writer.n_written == 5
+        assert len(self.storage.trajectories) == 5
+        for traj in self.trajs:
+            assert self.storage.trajectories.index[traj.__uuid__] >= 0
+
+    def test_pending_objects_are_contained(self):
+        block = threading.Event()
+        self.writer._put(block.wait)
+        self.writer.save(self.trajs[0])
+        assert self.trajs[0] in self.writer
+        assert self.trajs[0].__uuid__ not in self.storage.trajectories.index
+        block.set()
+        self.writer.flush()
+        assert self.trajs[0] in self.storage
+
+    def test_references_to_queued_objects(self):
+        # a sample referencing a trajectory that has not been written yet
+        ensemble = paths.LengthEnsemble(2)
+        sample = paths.Sample(replica=0, trajectory=self.trajs[0],
+                              ensemble=ensemble)
+        self.writer.save(self.trajs[0])
+        self.writer.save(sample)
+        self.writer.flush()
+        assert len(self.storage.trajectories) == 1
+        loaded = self.storage.samples.vars['trajectory'][0]
+        assert loaded.__uuid__ == self.trajs[0].__uuid__
+
+    def test_attributes_wait_for_writer(self):
+        self.writer.save(self.trajs)
+        assert len(self.writer.trajectories) == 5
+
+    def test_errors_are_raised(self):
+        self.writer.save(self.trajs[0])
+        self.writer.save("not storable")
+        with pytest.raises(RuntimeWarning):
+            self.writer.flush()
+        # the writer continues after the error has been reported
+        self.writer.save(self.trajs[1])
+        self.writer.flush()
+        assert len(self.storage.trajectories) == 2
+
+
+class TestBackgroundWriterPathSampling(object):
+    def setup(self):
+        self.filename = "test_background_writer_sim.nc"
+        self.cv = paths.FunctionCV("x", lambda s: s.xyz[0][0],
+                                   cv_time_reversible=True).with_diskcache()
+        state_A = paths.CVDefinedVolume(self.cv, float("-inf"), 0.0)
+        state_B = paths.CVDefinedVolume(self.cv, 1.0, float("inf"))
+        pes = paths.engines.toy.LinearSlope([0, 0, 0], 0)
+        integ = paths.engines.toy.LangevinBAOABIntegrator(0.01, 0.1, 2.5)
+        topology = paths.engines.toy.Topology(n_spatial=3, masses=[1.0],
+                                              pes=pes)
+        engine = paths.engines.toy.Engine(options={'integ': integ},
+                                          topology=topology)
+        network = paths.TPSNetwork(state_A, state_B)
+        self.scheme = paths.OneWayShootingMoveScheme(
+            network, selector=paths.UniformSelector(), engine=engine)
+        init_traj = make_1d_traj([-0.1, 0.2, 0.5, 0.8, 1.1])
+        self.init_cond = \
+            self.scheme.initial_conditions_from_trajectories(init_traj)
+
+    def teardown(self):
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    def test_storage_hook(self):
+        storage = paths.Storage(self.filename, 'w')
+        storage.save(self.init_cond[0].trajectory[0])
+        # the values of the CV are read and written during the simulation
+        storage.save(self.cv)
+        writer = BackgroundWriter(storage, max_pending=2)
+        sim = paths.PathSampling(storage=None, move_scheme=self.scheme,
+                                 sample_set=self.init_cond)
+        sim.output_stream = open(os.devnull, 'w')
+        sim.attach_hook(paths.beta.hooks.StorageHook(storage=writer,
+                                                     frequency=5))
+        sim.run(20)
+        writer.flush()
+        sim.output_stream.close()
+
+        assert writer.n_written == 20
+        assert len(storage.steps) == 20
+        assert storage.steps[-1].mccycle == sim.step
+        # the values saved by the writer belong to the snapshots
+        values = storage.variables['cv0_value'][:]
+        assert len(values) == len(storage.snapshots) // 2
+        for idx, value in enumerate(values):
+            snapshot = storage.snapshots[2 * idx]
+            assert value == pytest.approx(snapshot.xyz[0][0])
+        writer.close()
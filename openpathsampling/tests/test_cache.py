@@ -0,0 +1,309 @@
+import gc
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import openpathsampling as paths
+from openpathsampling.netcdfplus import ByteLRUCache, WeakKeyCache, \
+    LRUChunkLoadingCache
+from openpathsampling.netcdfplus.cache import value_nbytes
+
+from openpathsampling.storage.stores.snapshot_value import SnapshotValueStore
+
+from .test_helpers import make_1d_traj
+
+
+class Key(object):
+    # weak references to ints are not possible
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def test_value_nbytes():
+    assert value_nbytes(np.zeros((10, 3))) == 240
+    assert value_nbytes(np.float32(1.0)) == 4
+    assert value_nbytes([np.zeros(4), np.zeros(2, dtype=np.int32)]) == \
+        sys.getsizeof([None, None]) + 32 + 8
+    assert value_nbytes(1.0) == sys.getsizeof(1.0)
+
+
+class TestByteLRUCache(object):
+    def setup(self):
+        self.cache = ByteLRUCache(1000)
+
+    def test_byte_limit(self):
+        for key in range(4):
+            self.cache[key] = np.zeros(30)  # 240 bytes each
+        assert self.cache.nbytes == 960
+        assert self.cache.evictions == 0
+        self.cache[4] = np.zeros(30)
+        assert self.cache.nbytes == 960
+        assert self.cache.evictions == 1
+        assert 0 not in self.cache
+        assert list(self.cache) == [1, 2, 3, 4]
+
+    def test_lru_order(self):
+        for key in range(4):
+            self.cache[key] = np.zeros(30)
+        _ = self.cache[0]
+        self.cache[4] = np.zeros(30)
+        assert 0 in self.cache
+        assert 1 not in self.cache
+
+    def test_replace_value(self):
+        self.cache[0] = np.zeros(30)
+        self.cache[0] = np.zeros(10)
+        assert self.cache.nbytes == 80
+        assert len(self.cache) == 1
+
+    def test_too_large_value(self):
+        self.cache[0] = np.zeros(30)
+        self.cache[1] = np.zeros(200)
+        assert len(self.cache) == 0
+        assert self.cache.nbytes == 0
+
+    def test_counters(self):
+        self.cache[0] = 1.0
+        assert self.cache[0] == 1.0
+        assert self.cache.get(1) is None
+        assert self.cache.get_silent(0) == 1.0
+        assert (self.cache.hits, self.cache.misses) == (1, 1)
+        assert self.cache.hit_rate == 0.5
+        assert "hit rate 50.0%" in str(self.cache)
+        self.cache.reset_counters()
+        assert (self.cache.hits, self.cache.misses) == (0, 0)
+
+    def test_byte_limit_setter(self):
+        for key in range(4):
+            self.cache[key] = np.zeros(30)
+        self.cache.byte_limit = 500
+        assert self.cache.nbytes == 480
+        assert list(self.cache) == [2, 3]
+
+    def test_weak_keys(self):
+        cache = ByteLRUCache(1000, weak_keys=True)
+        keys = [Key(i) for i in range(3)]
+        for key in keys:
+            cache[key] = np.zeros(30)
+        assert cache[Key(1)] is not None
+        del keys[1]
+        gc.collect()
+        assert len(cache) == 2
+        assert cache.nbytes == 480
+        assert [key.value for key in cache] == [0, 2]
+        assert [key.value for (key, _) in cache.items()] == [0, 2]
+
+
+class CountingVariable(object):
+    # list-like variable that records the slices read from it
+    def __init__(self, n):
+        self.values = list(range(n))
+        self.reads = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, item):
+        self.reads.append((item.start, item.stop))
+        return self.values[item]
+
+
+class SlowVariable(CountingVariable):
+    # records whether two threads ever read at the same time
+    def __init__(self, n):
+        super(SlowVariable, self).__init__(n)
+        self.active = 0
+        self.overlaps = 0
+        self._lock = threading.Lock()
+
+    def __getitem__(self, item):
+        with self._lock:
+            self.active += 1
+            if self.active > 1:
+                self.overlaps += 1
+        time.sleep(0.01)
+        with self._lock:
+            self.active -= 1
+        return super(SlowVariable, self).__getitem__(item)
+
+
+class TestLRUChunkLoadingCache(object):
+    def setup(self):
+        self.variable = CountingVariable(100)
+
+    def test_no_prefetch(self):
+        cache = LRUChunkLoadingCache(chunksize=10, variable=self.variable)
+        assert [cache[idx] for idx in range(30)] == list(range(30))
+        assert self.variable.reads == [(0, 10), (10, 20), (20, 30)]
+        assert (cache.hits, cache.misses) == (27, 3)
+        assert cache.prefetched == 0
+
+    def test_sequential_prefetch(self):
+        cache = LRUChunkLoadingCache(chunksize=10, variable=self.variable,
+                                     prefetch=3)
+        assert [cache[idx] for idx in range(100)] == list(range(100))
+        # after the second chunk the following chunks are read ahead
+        assert self.variable.reads == [(0, 10), (10, 20), (20, 50),
+                                       (50, 80), (80, 100)]
+        assert cache.misses == 2
+        assert cache.prefetched == 8
+        assert cache.prefetch_hits == 8
+        assert cache.prefetch_waste == 0
+
+    def test_random_access_does_not_prefetch(self):
+        cache = LRUChunkLoadingCache(chunksize=10, variable=self.variable,
+                                     prefetch=3)
+        for idx in [55, 5, 35, 85]:
+            assert cache[idx] == idx
+        assert cache.prefetched == 0
+        assert cache.misses == 4
+
+    def test_prefetch_waste(self):
+        cache = LRUChunkLoadingCache(chunksize=10, variable=self.variable,
+                                     prefetch=3, max_chunks=2)
+        cache[0]
+        cache[10]
+        assert cache.prefetched == 3
+        # chunk 2 has been evicted to make room for chunks 3 and 4
+        assert cache.prefetch_waste == 1
+        cache.clear()
+        assert cache.prefetch_waste == 3
+        cache.reset_counters()
+        assert cache.prefetch_waste == 0
+
+    def test_background_prefetch(self):
+        cache = LRUChunkLoadingCache(chunksize=10, variable=self.variable,
+                                     prefetch=3, background=True)
+        assert [cache[idx] for idx in range(100)] == list(range(100))
+        assert cache.misses == 2
+        assert cache.prefetch_hits == 8
+        cache.close()
+
+    def test_background_prefetch_locks_reads(self):
+        variable = SlowVariable(100)
+        cache = LRUChunkLoadingCache(chunksize=10, variable=variable,
+                                     prefetch=3, background=True)
+        cache[0]
+        cache[10]
+        # chunks 2-4 are read in the background, chunk 8 synchronously
+        assert cache[85] == 85
+        assert [cache[idx] for idx in range(20, 50)] == list(range(20, 50))
+        assert variable.overlaps == 0
+        cache.close()
+
+
+class TestValueStorePrefetch(object):
+    def test_prefetch_parameter(self):
+        store = SnapshotValueStore(chunksize=10, prefetch=3)
+        assert store.prefetch == 3
+        restored = SnapshotValueStore.from_dict(store.to_dict())
+        assert restored.prefetch == 3
+        assert SnapshotValueStore().prefetch == 0
+
+    def setup(self):
+        self.filename = "test_value_store_prefetch.nc"
+        self.traj = make_1d_traj([float(x) for x in range(50)])
+
+    def teardown(self):
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    def _stored_cv_values(self):
+        storage = paths.Storage(self.filename, 'w')
+        storage.snapshots.save(self.traj[0])
+        cv = paths.FunctionCV('x', lambda s: s.xyz[0][0],
+                              cv_time_reversible=True)
+        cv.diskcache_allow_incomplete = True
+        cv.with_diskcache(chunksize=10)
+        storage.save(cv)
+        cv(self.traj)
+        storage.save(self.traj)
+        storage.snapshots.sync_cv(cv)
+        store = cv._store_dict.value_store
+        assert len(store) == 50
+        return storage, store
+
+    def test_cache_uses_prefetch(self):
+        storage, store = self._stored_cv_values()
+        store.prefetch = 3
+        store.initialize_cache()
+        assert store.cache.prefetch == 3
+        # the cache shares the lock of the storage
+        assert store.cache.variable_lock is storage.lock
+        values = [store.cache[idx] for idx in range(50)]
+        assert values == [float(x) for x in range(50)]
+        assert store.cache.misses == 2
+        storage.close()
+
+    def test_background_parameter(self):
+        store = SnapshotValueStore(chunksize=10, prefetch=3, background=True)
+        restored = SnapshotValueStore.from_dict(store.to_dict())
+        assert restored.background
+        assert not SnapshotValueStore().background
+
+    def test_background_load(self):
+        storage, store = self._stored_cv_values()
+        store.prefetch = 3
+        store.background = True
+        store.initialize_cache()
+        assert store.cache.background
+        values = []
+
+        def load_all():
+            values.extend(store.load(snap) for snap in self.traj)
+
+        # loading must not wait on a reader thread blocked by the lock
+        reader = threading.Thread(target=load_all)
+        reader.daemon = True
+        reader.start()
+        reader.join(30.0)
+        assert not reader.is_alive()
+        assert values == [float(x) for x in range(50)]
+        assert store.cache.hits > 0
+        store.cache.close()
+        storage.close()
+
+
+class TestCVValueCache(object):
+    def setup(self):
+        self.cv = paths.FunctionCV("x", lambda snap: snap.xyz[0])
+        self.traj = make_1d_traj([float(x) for x in range(5)])
+        self.filename = "test_cache.nc"
+
+    def teardown(self):
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    def test_set_value_cache(self):
+        values = self.cv(self.traj)
+        assert isinstance(self.cv.value_cache, WeakKeyCache)
+        cache = ByteLRUCache(100, weak_keys=True)
+        self.cv.set_value_cache(cache)
+        assert self.cv.value_cache is cache
+        # values are transferred up to the limit (24 bytes each)
+        assert len(cache) == 4
+        np.testing.assert_array_equal(self.cv(self.traj[-1]), values[-1])
+        assert cache.hits == 1
+
+    def test_storage_caching_mode(self):
+        storage = paths.Storage(self.filename, 'w')
+        storage.save(self.cv)
+        storage.set_caching_mode('production', cv_cache_bytes=48)
+        assert isinstance(self.cv.value_cache, ByteLRUCache)
+        other_cv = paths.FunctionCV("y", lambda snap: snap.xyz[0])
+        storage.save(other_cv)
+        assert other_cv.value_cache.byte_limit == 48
+        assert other_cv.value_cache is not self.cv.value_cache
+        self.cv(self.traj)
+        assert len(self.cv.value_cache) == 2
+        assert self.cv.value_cache.evictions == 3
+        storage.close()
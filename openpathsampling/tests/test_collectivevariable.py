@@ -83,6 +83,46 @@ class TestFunctionCV(object):
             md_dihed.reshape(md_dihed.shape[:-1]),
             my_dihed, rtol=10 ** -6, atol=10 ** -10)
 
+    def test_cv_group(self):
+        psi_atoms = [6, 8, 14, 16]
+        psi = op.MDTrajFunctionCV("psi", md.compute_dihedrals,
+                                  topology=self.topology,
+                                  indices=[psi_atoms])
+        dist = op.MDTrajFunctionCV("dist", md.compute_distances,
+                                   topology=self.topology,
+                                   atom_pairs=[[0, 1], [10, 14]])
+        x = paths.FunctionCV("x", lambda snap: snap.xyz[0][0])
+        # psi is already known for some of the snapshots
+        psi(self.traj_topology[:2])
+
+        n_conversions = [0]
+        trajectory_to_mdtraj = op.trajectory_to_mdtraj
+
+        def counting(trajectory, md_topology):
+            n_conversions[0] += 1
+            return trajectory_to_mdtraj(trajectory, md_topology)
+
+        op.trajectory_to_mdtraj = counting
+        try:
+            group = op.CVGroup([psi, dist, x])
+            results = group(self.traj_topology)
+            assert n_conversions[0] == 1
+            # the CVs now answer from their caches
+            psi(self.traj_topology)
+            dist(self.traj_topology)
+            assert n_conversions[0] == 1
+        finally:
+            op.trajectory_to_mdtraj = trajectory_to_mdtraj
+
+        md_dihed = md.compute_dihedrals(self.mdtraj, indices=[psi_atoms])
+        np.testing.assert_allclose(md_dihed.reshape(md_dihed.shape[:-1]),
+                                   results[0], rtol=10 ** -6,
+                                   atol=10 ** -10)
+        md_distances = md.compute_distances(self.mdtraj, [[0, 1], [10, 14]])
+        np.testing.assert_allclose(md_distances, results[1], rtol=10 ** -6,
+                                   atol=10 ** -10)
+        assert results[2] == [snap.xyz[0][0] for snap in self.traj_topology]
+
     def test_atom_pair_featurizer(self):
         """ Create an atom pair collectivevariable using MSMSBuilder3 """
 
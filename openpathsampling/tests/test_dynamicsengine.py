@@ -40,6 +40,32 @@ class StupidEngine(paths.engines.DynamicsEngine):
         pass
 
 
+class CountingEngine(paths.engines.DynamicsEngine):
+    # each frame increases x by 1; frames with x == nan_at are invalid
+    _default_options = {'nan_at': -1.0}
+
+    def __init__(self, options, descriptor):
+        super(CountingEngine, self).__init__(options, descriptor)
+        self.n_generated = 0
+        self.x = 0.0
+
+    def generate_next_frame(self):
+        self.x += 1.0
+        self.n_generated += 1
+        return make_1d_traj([self.x])[0]
+
+    @property
+    def current_snapshot(self):
+        return make_1d_traj([self.x])[0]
+
+    @current_snapshot.setter
+    def current_snapshot(self, snap):
+        self.x = snap.xyz[0][0]
+
+    def is_valid_snapshot(self, snapshot):
+        return snapshot.xyz[0][0] != self.nan_at
+
+
 class TestDynamicsEngine(object):
     def setup(self):
         options = {'n_frames_max' : 100, 'random_option' : True}
@@ -109,3 +135,152 @@ class TestDynamicsEngine(object):
         # doesn't work
         traj = self.stupid.generate(init_snap, conditions)
         assert len(traj) == 2
+
+    @pytest.mark.parametrize('n_frames_per_check', [1, 3, 4, 20])
+    def test_generate_blocks(self, n_frames_per_check):
+        cv = paths.FunctionCV("x", lambda s: s.xyz[0][0])
+        ensemble = paths.AllInXEnsemble(paths.CVDefinedVolume(cv, -1, 9.5))
+        engine = CountingEngine({'n_frames_max': 100,
+                                 'n_frames_per_check': n_frames_per_check},
+                                self.descriptor)
+        init_snap = make_1d_traj([0.0])[0]
+        traj = engine.generate(init_snap, [ensemble.can_append])
+        assert [s.xyz[0][0] for s in traj] == list(range(11))
+        assert engine.n_generated >= 10
+        assert engine.n_generated < 10 + n_frames_per_check
+
+    @pytest.mark.parametrize('n_frames_per_check', [1, 4])
+    def test_generate_blocks_max_length(self, n_frames_per_check):
+        engine = CountingEngine({'n_frames_max': 6,
+                                 'on_max_length': 'stop',
+                                 'n_frames_per_check': n_frames_per_check},
+                                self.descriptor)
+        traj = engine.generate(make_1d_traj([0.0])[0], [lambda t, tr: True])
+        assert [s.xyz[0][0] for s in traj] == list(range(6))
+        assert engine.n_generated == 6
+
+    @pytest.mark.parametrize('n_frames_per_check', [1, 4])
+    def test_generate_blocks_nan(self, n_frames_per_check):
+        engine = CountingEngine({'n_frames_max': 100, 'nan_at': 6.0,
+                                 'n_frames_per_check': n_frames_per_check},
+                                self.descriptor)
+        with pytest.raises(paths.engines.EngineNaNError) as excinfo:
+            engine.generate(make_1d_traj([0.0])[0], [lambda t, tr: True])
+        traj = excinfo.value.last_trajectory
+        assert [s.xyz[0][0] for s in traj] == list(range(6))
+
+    @pytest.mark.parametrize('n_frames_per_check', [1, 4])
+    def test_generate_blocks_nan_intervals(self, n_frames_per_check):
+        # a block that fails on its first frame must not repeat a yield
+        engine = CountingEngine({'n_frames_max': 100, 'nan_at': 5.0,
+                                 'n_frames_per_check': n_frames_per_check},
+                                self.descriptor)
+        lengths = []
+        with pytest.raises(paths.engines.EngineNaNError):
+            for traj in engine.iter_generate(make_1d_traj([0.0])[0],
+                                             [lambda t, tr: True],
+                                             intervals=4):
+                lengths.append(len(traj))
+        assert lengths == [1, 5, 5]
+
+
+class TestDynamicsEngineBlockCheck(object):
+    def setup(self):
+        self.descriptor = paths.engines.SnapshotDescriptor.construct(
+            paths.engines.toy.Snapshot,
+            {'n_atoms': 1, 'n_spatial': 1}
+        )
+        cv = paths.FunctionCV("x", lambda s: s.xyz[0][0])
+        self.state_low = paths.CVDefinedVolume(cv, -1.0, 0.5)
+        self.state_high = paths.CVDefinedVolume(cv, 9.5, 100.0)
+
+    def _tps(self, first, last):
+        return paths.SequentialEnsemble([
+            paths.AllInXEnsemble(first) & paths.LengthEnsemble(1),
+            paths.AllOutXEnsemble(first | last),
+            paths.AllInXEnsemble(last) & paths.LengthEnsemble(1)
+        ])
+
+    def _engine(self, n_frames_per_check):
+        return CountingEngine({'n_frames_max': 100,
+                               'n_frames_per_check': n_frames_per_check},
+                              self.descriptor)
+
+    @staticmethod
+    def _spy(ensemble, name):
+        calls = []
+        check = getattr(ensemble, name)
+
+        def spy(trajectory, frames):
+            calls.append(len(frames))
+            return check(trajectory, frames)
+
+        setattr(ensemble, name, spy)
+        return calls
+
+    @pytest.mark.parametrize('n_frames_per_check', [3, 4, 20])
+    def test_forward(self, n_frames_per_check):
+        ensemble = self._tps(self.state_low, self.state_high)
+        calls = self._spy(ensemble, 'can_append_frames')
+        engine = self._engine(n_frames_per_check)
+        traj = engine.generate(make_1d_traj([0.0])[0], [ensemble.can_append])
+        assert [s.xyz[0][0] for s in traj] == list(range(11))
+        assert ensemble(traj)
+        assert calls == [n_frames_per_check] * len(calls)
+        assert len(calls) == -(-10 // n_frames_per_check)
+
+    @pytest.mark.parametrize('n_frames_per_check', [1, 4])
+    def test_backward(self, n_frames_per_check):
+        ensemble = self._tps(self.state_high, self.state_low)
+        calls = self._spy(ensemble, 'can_prepend_frames')
+        engine = self._engine(n_frames_per_check)
+        traj = engine.generate(make_1d_traj([0.0])[0],
+                               [ensemble.can_prepend], direction=-1)
+        assert [s.xyz[0][0] for s in traj] == list(range(10, -1, -1))
+        assert ensemble(traj)
+        if n_frames_per_check == 1:
+            assert calls == []
+        else:
+            assert len(calls) == 3
+
+    @pytest.mark.parametrize('n_frames_per_check', [1, 4])
+    def test_prefix(self, n_frames_per_check):
+        ensemble = self._tps(self.state_low, self.state_high)
+        prefix = make_1d_traj([0.0, 1.0])
+        prefixed = paths.PrefixTrajectoryEnsemble(ensemble, prefix)
+        engine = self._engine(n_frames_per_check)
+        traj = engine.generate(make_1d_traj([2.0])[0],
+                               [prefixed.can_append])
+        assert [s.xyz[0][0] for s in traj] == list(range(2, 11))
+        assert ensemble(prefix + traj)
+
+    def test_not_supported(self):
+        # conditions without a block check are checked frame by frame
+        ensemble = paths.LengthEnsemble(6)
+        engine = self._engine(4)
+        traj = engine.generate(make_1d_traj([0.0])[0], [ensemble.can_append])
+        assert len(traj) == 6
+
+    def test_block_check_attribute(self):
+        ensemble = self._tps(self.state_low, self.state_high)
+        calls = self._spy(ensemble, 'can_append_frames')
+
+        def condition(trajectory, trusted=None):
+            return ensemble.can_append(trajectory, trusted)
+
+        condition.block_check = ensemble.can_append_frames
+        engine = self._engine(4)
+        traj = engine.generate(make_1d_traj([0.0])[0], [condition])
+        assert [s.xyz[0][0] for s in traj] == list(range(11))
+        assert len(calls) == 3
+
+    def test_function_named_like_ensemble_check(self):
+        # plain functions are checked frame by frame, whatever their name
+        ensemble = paths.LengthEnsemble(6)
+
+        def can_append(trajectory, trusted=None):
+            return ensemble.can_append(trajectory, trusted)
+
+        engine = self._engine(4)
+        traj = engine.generate(make_1d_traj([0.0])[0], [can_append])
+        assert len(traj) == 6
@@ -1377,6 +1377,8 @@ class TestSequentialEnsembleCache(EnsembleCacheTest):
             self.outX,
             self.inX & self.length1
         ])
+        # these tests check the cache of the generic decision tree
+        self.pseudo_minus._use_automaton = False
         self.traj = ttraj['lower_in_out_in_in_out_in']
 
     def test_all_in_as_seq_can_append(self):
@@ -1473,6 +1475,163 @@ class TestSequentialEnsembleCache(EnsembleCacheTest):
 
 
 
+class TestSequentialEnsembleAutomaton(EnsembleTest):
+    def setup(self):
+        self.inX = AllInXEnsemble(vol1)
+        self.outX = AllOutXEnsemble(vol1)
+        self.pseudo_minus = SequentialEnsemble([
+            self.inX & LengthEnsemble(1),
+            self.outX,
+            self.inX,
+            self.outX,
+            self.inX & LengthEnsemble(1)
+        ])
+        self.pseudo_tis = SequentialEnsemble([
+            SingleFrameEnsemble(self.inX),
+            OptionalEnsemble(AllOutXEnsemble(vol1 | vol3)),
+            SingleFrameEnsemble(AllInXEnsemble(vol1 | vol3))
+        ])
+        self.minus = paths.MinusInterfaceEnsemble(vol1, vol2)
+        self.sequences = [
+            self.pseudo_minus,
+            self.pseudo_tis,
+            self.minus._new_ensemble.ensemble1,
+            SequentialEnsemble([PartOutXEnsemble(vol1),
+                                LengthEnsemble(slice(1, 3)),
+                                AllInXEnsemble(vol2) | LengthEnsemble(1)]),
+            SequentialEnsemble([self.outX,
+                                OptionalEnsemble(AllInXEnsemble(vol2)
+                                                 & PartInXEnsemble(vol1)),
+                                self.outX & LengthEnsemble(2)]),
+        ]
+        # debug output of the generic decision tree makes these tests slow
+        self._log_level = logging.getLogger('openpathsampling.ensemble').level
+        logging.getLogger('openpathsampling.ensemble').setLevel(logging.INFO)
+
+    def teardown(self):
+        logging.getLogger('openpathsampling.ensemble').setLevel(
+            self._log_level
+        )
+
+    def test_automaton_built(self):
+        for ens in self.sequences:
+            for direction in [+1, -1]:
+                for strict in [True, False]:
+                    automaton = ens._get_automaton(direction, strict)
+                    assert automaton is not None
+                    assert ens._get_automaton(direction, strict) is automaton
+
+    def test_no_automaton(self):
+        sliced = SequentialEnsemble([
+            self.inX, SlicedTrajectoryEnsemble(self.outX, slice(0, 2))
+        ])
+        overlap = SequentialEnsemble([self.inX, self.outX], min_overlap=-1)
+        optional_last = SequentialEnsemble([self.inX,
+                                            OptionalEnsemble(self.outX)])
+        switched_off = SequentialEnsemble([self.inX, self.outX])
+        switched_off._use_automaton = False
+        for ens in [sliced, overlap, switched_off]:
+            assert ens._get_automaton(+1, False) is None
+            assert ens._get_automaton(-1, False) is None
+        assert optional_last._get_automaton(+1, False) is None
+        assert optional_last._get_automaton(-1, False) is not None
+
+    def _generic(self, ens):
+        generic = SequentialEnsemble(ens.ensembles, ens.min_overlap,
+                                     ens.max_overlap)
+        generic._use_automaton = False
+        return generic
+
+    def _check_against_generic(self, ens, fname, grow):
+        # compare the automaton with a fresh decision tree for every length
+        for test in sorted(ttraj.keys()):
+            traj = ttraj[test]
+            for length in range(1, len(traj) + 1):
+                subtraj = grow(traj, length)
+                expected = getattr(self._generic(ens), fname)(subtraj)
+                failmsg = ("Failure in " + fname + " " + test + "[" +
+                           str(length) + "] (" + str(subtraj) + "): ")
+                self._single_test(getattr(ens, fname), subtraj, expected,
+                                  failmsg)
+
+    def test_can_append(self):
+        for ens in self.sequences:
+            for fname in ['can_append', 'strict_can_append']:
+                self._check_against_generic(
+                    ens, fname, lambda traj, length: traj[:length]
+                )
+
+    def test_can_prepend(self):
+        for ens in self.sequences:
+            for fname in ['can_prepend', 'strict_can_prepend']:
+                self._check_against_generic(
+                    ens, fname, lambda traj, length: traj[-length:]
+                )
+
+    def test_cached_state(self):
+        traj = ttraj['lower_in_out_in_in_out_in']
+        cache = self.pseudo_minus._cache_can_append
+        automaton = self.pseudo_minus._get_automaton(+1, False)
+        results = [self.pseudo_minus.can_append(traj[:i])
+                   for i in range(1, len(traj) + 1)]
+        assert_equal(results, [True] * 5 + [False])
+        assert_equal(cache.contents['automaton_length'], len(traj))
+        assert_equal(cache.contents['automaton_state'],
+                     automaton.run(list(traj)))
+        # a different trajectory of the same length starts over
+        other = ttraj['lower_out_in_out_out_in_out']
+        assert_equal(self.pseudo_minus.can_append(other), False)
+        assert_equal(cache.contents['automaton_state'],
+                     automaton.run(list(other)))
+
+    def test_can_append_frames(self):
+        for ens in self.sequences:
+            for test in sorted(ttraj.keys()):
+                traj = ttraj[test]
+                expected = []
+                for length in range(2, len(traj) + 1):
+                    expected.append(
+                        self._generic(ens).can_append(traj[:length]))
+                    if not expected[-1]:
+                        break
+                start = traj[:1]
+                assert_equal(ens.can_append(start, trusted=False),
+                             self._generic(ens).can_append(start))
+                assert_equal(ens.can_append_frames(start, list(traj[1:])),
+                             expected)
+                # the cache continues frame by frame after the block
+                n_checked = 1 + len(expected)
+                if expected and expected[-1] and n_checked < len(traj):
+                    cache = ens._cache_can_append
+                    ens.can_append(traj[:n_checked + 1], trusted=True)
+                    assert_equal(cache.contents['automaton_length'],
+                                 n_checked + 1)
+
+    def test_can_prepend_frames(self):
+        for ens in self.sequences:
+            for test in sorted(ttraj.keys()):
+                traj = ttraj[test]
+                expected = []
+                for length in range(2, len(traj) + 1):
+                    expected.append(
+                        self._generic(ens).can_prepend(traj[-length:]))
+                    if not expected[-1]:
+                        break
+                start = traj[-1:]
+                ens.can_prepend(start, trusted=False)
+                frames = list(reversed(traj[:-1]))
+                assert_equal(ens.can_prepend_frames(start, frames),
+                             expected)
+
+    def test_frames_without_automaton(self):
+        generic = self._generic(self.pseudo_minus)
+        traj = ttraj['lower_in_out_in_in_out_in']
+        assert generic.can_append_frames(traj[:1], list(traj[1:])) is None
+        assert generic.can_prepend_frames(traj[-1:], list(traj[:-1])) is None
+        assert LengthEnsemble(3).can_append_frames(traj[:1], [traj[1]]) \
+            is None
+
+
 class TestSlicedTrajectoryEnsemble(EnsembleTest):
     def test_sliced_ensemble_init(self):
         init_as_int = SlicedTrajectoryEnsemble(AllInXEnsemble(vol1), 3)
@@ -5,6 +5,7 @@ import openpathsampling.engines as peng
 from openpathsampling.engines.toy import ToySnapshot
 
 from openpathsampling.engines.external_engine import *
+from openpathsampling.engines.external_engine import _InotifyWatcher
 
 import numpy as np
 import pytest
@@ -203,6 +204,23 @@ class TestExternalEngine(object):
                                          [self.ensemble.can_append])
         assert len(traj) == 5
 
+    @pytest.mark.parametrize('frame_wait', ['poll', 'inotify'])
+    def test_frame_wait_methods(self, frame_wait):
+        if frame_wait == 'inotify' and not _InotifyWatcher.is_available():
+            pytest.skip("inotify not available")
+        self.slow_engine.options['frame_wait'] = frame_wait
+        traj = self.slow_engine.generate(self.template,
+                                         [self.ensemble.can_append])
+        assert len(traj) == 5
+        assert len(self.slow_engine.frame_wait_times) == 4
+        assert all(t >= 0 for t in self.slow_engine.frame_wait_times)
+        assert self.slow_engine._watcher is None
+
+    def test_bad_frame_wait(self):
+        self.fast_engine.options['frame_wait'] = 'foo'
+        with pytest.raises(ValueError):
+            self.fast_engine.start(self.template)
+
     def test_in_shooting_move(self):
         for testfile in glob.glob("test*out") + glob.glob("test*inp"):
             os.remove(testfile)
@@ -236,6 +254,36 @@ class TestExternalEngine(object):
             os.remove(testfile)
 
 
+class TestInotifyWatcher(object):
+    def setup(self):
+        if not _InotifyWatcher.is_available():
+            pytest.skip("inotify not available")
+        self.filename = "test_watched.out"
+        self.watcher = _InotifyWatcher(self.filename)
+
+    def teardown(self):
+        self.watcher.close()
+        for filename in [self.filename, "test_other.out"]:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def test_wait_timeout(self):
+        assert not self.watcher.wait(0.01)
+
+    def test_wait_after_write(self):
+        # event queued before wait must still be seen
+        with open(self.filename, 'w') as f:
+            f.write("1.0 1.0\n")
+        assert self.watcher.wait(1.0)
+        # all events consumed
+        assert not self.watcher.wait(0.01)
+
+    def test_ignores_other_files(self):
+        with open("test_other.out", 'w') as f:
+            f.write("1.0 1.0\n")
+        assert not self.watcher.wait(0.05)
+
+
 class TestFilenameSetter(object):
     def test_default_setter(self):
         setter = FilenameSetter()
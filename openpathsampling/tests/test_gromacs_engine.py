@@ -5,6 +5,7 @@ from nose.tools import (assert_equal, assert_not_equal, assert_almost_equal,
 from nose.plugins.skip import Skip, SkipTest
 import numpy.testing as npt
 import tempfile
+import warnings
 
 from .test_helpers import data_filename, assert_items_equal
 
@@ -18,6 +19,7 @@ else:
 
 
 from openpathsampling.engines.gromacs import *
+from openpathsampling.engines.gromacs.engine import _TRRFrameIndex
 
 import logging
 import numpy as np
@@ -78,6 +80,81 @@ class TestGroFileEngine(object):
         npt.assert_array_equal(box, mdt.unitcell_vectors[0])
 
 
+class TestTRRFrameIndex(object):
+    def setup(self):
+        if not HAS_MDTRAJ:
+            pytest.skip("MDTraj not installed.")
+        self.test_dir = data_filename("gromacs_engine")
+        self.trr_99 = os.path.join(self.test_dir, "project_trr",
+                                   "0000099.trr")
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_matches_mdtraj(self):
+        reader = _TRRFrameIndex(self.trr_99)
+        assert len(reader) == 50
+        trr = md.formats.TRRTrajectoryFile(self.trr_99)
+        try:
+            for frame_num in [0, 1, 25, 49, 3]:
+                trr.seek(offset=frame_num)
+                data = trr._read(n_frames=1, atom_indices=None,
+                                 get_velocities=True)
+                xyz, vel, box = reader.read_frame(frame_num)
+                npt.assert_array_equal(xyz, data[0][0])
+                npt.assert_array_equal(vel, data[5][0])
+                npt.assert_array_equal(box, data[3][0])
+        finally:
+            trr.close()
+            reader.close()
+
+    def test_partial_and_missing(self):
+        reader = _TRRFrameIndex(self.trr_99)
+        with pytest.raises(RuntimeError):
+            reader.read_frame(50)
+        with pytest.raises(IndexError):
+            reader.read_frame(51)
+        reader.close()
+
+    def test_growing_file(self):
+        with open(self.trr_99, 'rb') as f:
+            contents = f.read()
+        growing = os.path.join(self.tmpdir, "growing.trr")
+        with open(growing, 'wb') as f:
+            f.write(contents[:10])
+        reader = _TRRFrameIndex(growing)
+        with pytest.raises(RuntimeError):
+            reader.read_frame(0)
+
+        reference = _TRRFrameIndex(self.trr_99)
+        len(reference)
+        frame_size = reference.offsets[1]
+        with open(growing, 'ab') as f:
+            f.write(contents[10:2 * frame_size + 7])
+        assert len(reader) == 2
+        with pytest.raises(RuntimeError):
+            reader.read_frame(2)
+        npt.assert_array_equal(reader.read_frame(1)[0],
+                               reference.read_frame(1)[0])
+
+        with open(growing, 'ab') as f:
+            f.write(contents[2 * frame_size + 7:3 * frame_size])
+        npt.assert_array_equal(reader.read_frame(2)[0],
+                               reference.read_frame(2)[0])
+        assert reader.offsets == reference.offsets[:3]
+
+        # replacing the file resets the index
+        os.remove(growing)
+        with open(growing, 'wb') as f:
+            f.write(contents[frame_size:2 * frame_size])
+        npt.assert_array_equal(reader.read_frame(0)[0],
+                               reference.read_frame(1)[0])
+        assert len(reader) == 1
+        reader.close()
+        reference.close()
+
+
 class TestGromacsEngine(object):
     # Files used (in test_data/gromacs_engine/)
     # conf.gro, md.mdp, topol.top : standard Gromacs input files
@@ -135,6 +212,36 @@ class TestGromacsEngine(object):
         result = self.engine.read_frame_from_file(fname, 4)
         assert_equal(result, None)
 
+    def test_read_frame_from_file_corrupt(self):
+        # a corrupt file must not look like a frame that is not written yet
+        fname = os.path.join(self.test_dir, "project_trr", "0000000.trr")
+        with open(fname, 'rb') as f:
+            contents = f.read()
+        tmpdir = tempfile.mkdtemp()
+        corrupt = os.path.join(tmpdir, "corrupt.trr")
+        with open(corrupt, 'wb') as f:
+            f.write(b'\x00' * 4 + contents[4:])
+        try:
+            with pytest.raises(ValueError):
+                self.engine.read_frame_from_file(corrupt, 0)
+        finally:
+            self.engine.close_trr_readers()
+            shutil.rmtree(tmpdir)
+
+    def test_pickle_with_open_readers(self):
+        import copy
+        import pickle
+        fname = os.path.join(self.test_dir, "project_trr", "0000000.trr")
+        self.engine.read_frame_from_file(fname, 0)
+        assert len(self.engine._trr_readers) == 1
+        for clone in [pickle.loads(pickle.dumps(self.engine)),
+                      copy.deepcopy(self.engine)]:
+            assert len(clone._trr_readers) == 0
+            snap = clone.read_frame_from_file(fname, 3)
+            assert_true(isinstance(snap, ExternalMDSnapshot))
+            clone.close_trr_readers()
+        self.engine.close_trr_readers()
+
     def test_write_frame_to_file_read_back(self):
         # write random frame; read back
         # sinfully, we start by reading in a frame to get the correct dims
@@ -258,12 +365,60 @@ class TestGromacsEngine(object):
         for f in files:
             os.remove(f)
 
+    def test_template_tpr_file(self):
+        template = self.engine.template_tpr_file
+        assert os.path.dirname(template) == self.engine.prefix + "_tpr"
+        # same inputs give the same template
+        other = Engine(gro="conf.gro", mdp="md.mdp", top="topol.top",
+                       options={'mdrun_args': '-nt 2'},
+                       base_dir=self.test_dir, prefix="project")
+        assert other.template_tpr_file == template
+        # different grompp arguments need a different template
+        other.options['grompp_args'] = '-maxwarn 1'
+        assert other.template_tpr_file != template
+
+    def test_tpr_inject_command(self):
+        self.engine.options['tpr_inject_command'] = \
+                "tpbconv -s {template} -f {e.input_file} -o {e.tpr_file}"
+        self.engine.set_filenames(0)
+        template = self.engine.template_tpr_file
+        assert self.engine.tpr_inject_command == (
+            "tpbconv -s " + template + " -f " + self.engine.input_file
+            + " -o " + self.engine.tpr_file
+        )
+        grompp = self.engine.grompp_template_command
+        assert "-o " + template in grompp
+        assert "-t " not in grompp
+
+    def test_tpr_inject_command_warns_for_gmx(self):
+        inject = "tpbconv -s {template} -f {e.input_file} -o {e.tpr_file}"
+        with pytest.warns(UserWarning, match="gmx_executable"):
+            Engine(gro="conf.gro", mdp="md.mdp", top="topol.top",
+                   options={'tpr_inject_command': inject},
+                   base_dir=self.test_dir, prefix="project")
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            Engine(gro="conf.gro", mdp="md.mdp", top="topol.top",
+                   options={'tpr_inject_command': inject,
+                            'gmx_executable': ""},
+                   base_dir=self.test_dir, prefix="project")
+
     def test_open_file_caching(self):
         # read several frames from one file, then switch to another file
         # first read from 0000000, then 0000099
-        # TODO: what was I trying to test here? that I can switch between
-        # files?
-        pytest.skip()
+        trr_0 = os.path.join(self.test_dir, "project_trr", "0000000.trr")
+        trr_99 = os.path.join(self.test_dir, "project_trr", "0000099.trr")
+        self.engine.max_open_trr_files = 1
+        xyz_0 = self.engine.read_frame_data(trr_0, 3)[0]
+        reader = self.engine._trr_readers[trr_0]
+        _ = self.engine.read_frame_data(trr_0, 1)
+        assert self.engine._trr_readers[trr_0] is reader
+        _ = self.engine.read_frame_data(trr_99, 10)
+        assert list(self.engine._trr_readers) == [trr_99]
+        npt.assert_array_equal(self.engine.read_frame_data(trr_0, 3)[0],
+                               xyz_0)
+        self.engine.close_trr_readers()
+        assert len(self.engine._trr_readers) == 0
 
     def test_iter_generate_clear_cache(self):
         # when running with iter_generate, only the most recently generated
@@ -34,6 +34,21 @@ class TestInterfaceSet(object):
                                              list(reversed(self.lambdas)))
         self.no_lambda_set = paths.InterfaceSet(self.volumes, self.cv)
 
+    def test_innermost_interface(self):
+        traj = make_1d_traj([-0.05, 0.05, 0.25, 0.35])
+        assert_equal([self.interface_set.innermost_interface(snap)
+                      for snap in traj], [0, 1, 3, 4])
+
+    def test_max_interface_crossed(self):
+        assert_equal(self.interface_set.max_interface_crossed(
+            make_1d_traj([-0.1, 0.15, 0.05])), 1)
+        assert_equal(self.interface_set.max_interface_crossed(
+            make_1d_traj([-0.1, -0.05])), -1)
+        assert_equal(self.interface_set.max_interface_crossed(
+            make_1d_traj([-0.1, 0.5])), 3)
+        assert_equal(self.interface_set.max_interface_crossed(
+            paths.Trajectory([])), -1)
+
     def test_direction(self):
         assert_equal(self.interface_set.direction, 1)
         assert_equal(self.no_lambda_set.direction, 0)
@@ -144,6 +159,46 @@ class TestVolumeInterfaceSet(object):
     def test_bad_new_interface(self):
         self.weird_set.new_interface(0.25)
 
+    def test_frames_in(self):
+        traj = make_1d_traj([-0.15, -0.05, 0.05, 0.15, 0.25])
+        for iface_set in [self.increasing_set, self.decreasing_set,
+                          self.weird_set]:
+            expected = [[bool(vol(snap)) for snap in traj]
+                        for vol in iface_set]
+            result = iface_set.frames_in(traj)
+            assert_equal(result.shape, (2, len(traj)))
+            assert_equal(result.tolist(), expected)
+        # all interfaces share one CV
+        assert_equal(len(self.weird_set._volume_program.cvs), 1)
+
+    def test_bisection(self):
+        values = [-0.2, -0.1, -0.05, 0.0, 0.05, 0.1, 0.15, float("nan")]
+        traj = make_1d_traj(values)
+        bounded = paths.VolumeInterfaceSet(cv=self.cv, minvals=-0.15,
+                                           maxvals=[0.0, 0.1])
+        for iface_set in [self.increasing_set, self.decreasing_set,
+                          bounded]:
+            assert iface_set._get_bisection() is not None
+            expected = paths.InterfaceSet._n_outside(iface_set, traj)
+            assert_equal(iface_set._n_outside(traj).tolist(),
+                         expected.tolist())
+            assert_equal([iface_set.innermost_interface(snap)
+                          for snap in traj], expected.tolist())
+            for (i, j) in [(0, 3), (2, 6), (4, 7)]:
+                assert_equal(iface_set.max_interface_crossed(traj[i:j]),
+                             max(expected[i:j]) - 1)
+
+    def test_no_bisection(self):
+        assert self.weird_set._get_bisection() is None
+        intersected = paths.VolumeInterfaceSet(
+            cv=self.cv, minvals=float("-inf"), maxvals=[0.0, 0.1],
+            intersect_with=paths.CVDefinedVolume(self.cv, -0.5, 0.5)
+        )
+        assert intersected._get_bisection() is None
+        traj = make_1d_traj([-0.6, -0.05, 0.05, 0.6])
+        assert_equal([intersected.innermost_interface(snap)
+                      for snap in traj], [2, 0, 1, 2])
+
     def test_storage(self):
         import os
         fname = data_filename("interface_set_storage_test.nc")
@@ -187,6 +242,26 @@ class TestPeriodicVolumeInterfaceSet(object):
         assert_equal(len(self.increasing_set), 3)
         assert_equal(self.increasing_set.lambdas, [100, 150, -160])
 
+    def test_bisection(self):
+        decreasing_set = paths.PeriodicVolumeInterfaceSet(
+            cv=self.cv, minvals=[-20, -100, -270], maxvals=10.0,
+            period_min=-180, period_max=180
+        )
+        not_wrapped = paths.PeriodicVolumeInterfaceSet(
+            cv=self.cv, minvals=0.0, maxvals=[100, 150]
+        )
+        values = [-180, -170, -160, -100, -20, 0, 10, 50, 100, 120, 150,
+                  170, 180, 360]
+        traj = make_1d_traj(values)
+        for iface_set in [self.increasing_set, decreasing_set,
+                          not_wrapped]:
+            assert iface_set._get_bisection() is not None
+            expected = paths.InterfaceSet._n_outside(iface_set, traj)
+            assert_equal(iface_set._n_outside(traj).tolist(),
+                         expected.tolist())
+            assert_equal(iface_set.max_interface_crossed(traj[4:8]),
+                         max(expected[4:8]) - 1)
+
     def test_new_interface(self):
         new_iface = self.increasing_set.new_interface(-140)
         expected = paths.PeriodicCVDefinedVolume(self.cv, 0.0, -140, -180, 180)
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+import openpathsampling as paths
+from openpathsampling.collectivevariables.parallel import (
+    ProcessPoolCVBackend, CVTask
+)
+
+from .test_helpers import make_1d_traj
+
+
+def _x_and_pid(snapshot, scale):
+    import os
+    return (snapshot.xyz[0][0] * scale, os.getpid())
+
+
+class TestProcessPoolCVBackend(object):
+    def setup(self):
+        self.traj = make_1d_traj([float(x) for x in range(12)])
+        self.cv = paths.FunctionCV("x", _x_and_pid, scale=2.0)
+        self.backend = ProcessPoolCVBackend(n_workers=2, chunk_size=5)
+
+    def teardown(self):
+        self.backend.close()
+
+    def test_cv_task(self):
+        task = CVTask(self.cv)
+        results = task(self.traj)
+        assert [value for (value, _) in results] == \
+            [2.0 * x for x in range(12)]
+
+    def test_execution_backend(self):
+        self.cv.execution_backend = self.backend
+        results = self.cv(self.traj)
+        assert self.backend.n_chunks == 3
+        assert [value for (value, _) in results] == \
+            [2.0 * x for x in range(12)]
+        assert os.getpid() not in set(pid for (_, pid) in results)
+        # the results are cached in order
+        assert self.cv(self.traj[3]) == results[3]
+        assert self.backend.n_chunks == 3
+
+    def test_small_lists_evaluated_locally(self):
+        self.cv.execution_backend = self.backend
+        results = self.cv(self.traj[:4])
+        assert self.backend.n_chunks == 0
+        assert set(pid for (_, pid) in results) == {os.getpid()}
+
+    def test_numpy_results(self):
+        cv = paths.FunctionCV("xyz", lambda snap: snap.xyz[0],
+                              cv_wrap_numpy_array=True,
+                              cv_scalarize_numpy_singletons=True)
+        expected = cv(self.traj)
+        cv = paths.FunctionCV("xyz", lambda snap: snap.xyz[0],
+                              cv_wrap_numpy_array=True,
+                              cv_scalarize_numpy_singletons=True)
+        cv.execution_backend = self.backend
+        np.testing.assert_array_equal(cv(self.traj), expected)
+        assert self.backend.n_chunks == 3
+
+    def test_unset_backend(self):
+        self.cv.execution_backend = self.backend
+        self.cv.execution_backend = None
+        results = self.cv(self.traj)
+        assert self.backend.n_chunks == 0
+        assert set(pid for (_, pid) in results) == {os.getpid()}
@@ -9,6 +9,7 @@ from builtins import str
 from builtins import range
 from builtins import object
 import logging
+import time
 from numpy.testing import assert_allclose
 import numpy as np
 import pytest
@@ -313,6 +314,92 @@ class TwoWayShootingMoverTest(TestShootingMover):
         assert (details['modified_shooting_snapshot'] not in
                 self.init_samp[0].trajectory)
 
+    def test_run_parallel(self):
+        mover = self._MoverType(
+            ensemble=self.tps,
+            selector=UniformSelector(),
+            modifier=paths.NoModification(),
+            engine=self.dyn
+        )
+        assert mover.parallel_engine is None
+        mover.parallel_engine = CalvinistDynamics(
+            [-0.1, 0.1, 0.3, 0.5, 0.7, -0.1, 0.2, 0.4, 0.6, 0.8]
+        )
+        traj, details = mover._run(self.init_samp[0].trajectory, 4)
+        assert_allclose(traj.xyz[:, 0, 0], [-0.1, 0.2, 0.4, 0.6, 0.8])
+        assert details['modified_shooting_snapshot'] == traj[2]
+
+        traj, details = mover._run(self.init_samp[0].trajectory, 3)
+        assert_allclose(traj.xyz[:, 0, 0], [-0.1, 0.1, 0.3, 0.5, 0.7])
+        assert details['modified_shooting_snapshot'] == traj[2]
+
+    def test_run_parallel_conditions_locked(self):
+        # the stopping conditions of both segments never run at once
+        active = []
+        overlaps = []
+
+        def slow_x(snap):
+            active.append(snap)
+            overlaps.append(len(active))
+            time.sleep(0.001)
+            active.remove(snap)
+            return snap.coordinates[0][0]
+
+        op = FunctionCV("slow_x", f=slow_x)
+        tps = A2BEnsemble(CVDefinedVolume(op, -100, 0.0),
+                          CVDefinedVolume(op, 0.65, 100))
+        mover = self._MoverType(
+            ensemble=tps,
+            selector=UniformSelector(),
+            modifier=paths.NoModification(),
+            engine=self.toy_engine
+        )
+        mover.parallel_engine = toys.Engine(
+            options=self.toy_opts, topology=self.toy_engine.topology
+        )
+        traj, details = mover._run(self.toy_traj, 30)
+        assert tps(traj)
+        assert max(overlaps) == 1
+
+    def test_run_parallel_block_check(self, monkeypatch):
+        # the locked stopping conditions keep checking blocks of frames
+        calls = []
+        can_append_frames = paths.PrefixTrajectoryEnsemble.can_append_frames
+
+        def spy(ensemble, trajectory, frames):
+            calls.append(len(frames))
+            return can_append_frames(ensemble, trajectory, frames)
+
+        monkeypatch.setattr(paths.PrefixTrajectoryEnsemble,
+                            'can_append_frames', spy)
+        opts = dict(self.toy_opts, n_frames_per_check=4)
+        engine = toys.Engine(options=opts, topology=self.toy_engine.topology)
+        mover = self._MoverType(
+            ensemble=self.tps,
+            selector=UniformSelector(),
+            modifier=paths.NoModification(),
+            engine=engine
+        )
+        mover.parallel_engine = toys.Engine(options=opts,
+                                            topology=engine.topology)
+        traj, details = mover._run(self.toy_traj, 30)
+        assert self.tps(traj)
+        assert calls
+        assert set(calls) == {4}
+
+    def test_run_parallel_max_length(self):
+        mover = self._MoverType(
+            ensemble=self.tps,
+            selector=UniformSelector(),
+            modifier=paths.NoModification(),
+            engine=self.toy_engine
+        )
+        opts = dict(self.toy_opts, n_frames_max=3)
+        mover.parallel_engine = toys.Engine(options=opts,
+                                            topology=self.toy_engine.topology)
+        with pytest.raises(paths.engines.EngineMaxLengthError):
+            mover._run(self.toy_traj, 30)
+
     def test_run_toy(self):
         # mostly smoke test for toy engine integration
         mover = self._MoverType(
@@ -389,7 +476,7 @@ class TwoWayShootingMoverTest(TestShootingMover):
         return (ensemble, engine, traj)
 
     def _test_early_reject(self, test_ensemble, path_types,
-                           expected_rejections):
+                           expected_rejections, parallel=False):
         for path_type in path_types:
             (ensemble, engine, traj) = self._setup_early_reject(path_type)
             # the ensemble returned above tells us what ensemble we expect
@@ -410,6 +497,9 @@ class TwoWayShootingMoverTest(TestShootingMover):
                 modifier=paths.NoModification(),
                 engine=engine
             )
+            if parallel:
+                mover.parallel_engine = toys.Engine(options=self.toy_opts,
+                                                    topology=engine.topology)
             change = mover.move(initial_sample_set)
 
             expected_early_reject = path_type in expected_rejections
@@ -433,6 +523,13 @@ class TwoWayShootingMoverTest(TestShootingMover):
                                 path_types=['AA', 'BB', 'AB'],
                                 expected_rejections=[])
 
+    def test_early_reject_parallel(self):
+        # both halves always run to the end when run in parallel
+        self._test_early_reject(test_ensemble=self.tps,
+                                path_types=['AA', 'BB', 'AB'],
+                                expected_rejections=[],
+                                parallel=True)
+
     def test_sequential_shots(self):
         # make sure that, with no modification, the trajectory doesn't
         # change
@@ -491,6 +588,21 @@ class TestTwoWayShootingMover(TestShootingMover):
         assert mover.ensemble is self.tps
         assert mover.selector is selector
         assert mover.modifier is modifier
+        assert mover.parallel_engine is None
+
+    def test_parallel_engine(self):
+        mover = TwoWayShootingMover(
+            ensemble=self.tps,
+            selector=UniformSelector(),
+            modifier=paths.NoModification(),
+            engine=self.dyn
+        )
+        mover.parallel_engine = self.toy_engine
+        assert mover.parallel_engine is self.toy_engine
+        for submover in mover.movers:
+            assert submover.parallel_engine is self.toy_engine
+        # the parallel engine isn't part of the stored mover
+        assert 'parallel_engine' not in mover.movers[0].to_dict()
 
     def test_to_dict_from_dict(self):
         mover = TwoWayShootingMover(
@@ -15,6 +15,7 @@ from openpathsampling.pathsimulators import *
 import openpathsampling as paths
 import openpathsampling.engines.toy as toys
 import numpy as np
+import pytest
 import os
 
 import logging
@@ -321,6 +322,65 @@ class TestCommittorSimulation(object):
         assert_true(counts['bkwd'] > 0)
         assert_equal(counts['fwd'] + counts['bkwd'], 20)
 
+    def test_committor_run_parallel(self):
+        self.simulation.run_parallel(n_per_snapshot=10, n_workers=2,
+                                     seed=5)
+        steps = list(self.simulation.storage.steps)
+        assert_equal([step.mccycle for step in steps], list(range(10)))
+        movers = set()
+        for step in steps:
+            step.active.sanity_check()
+            assert_equal(step.simulation, self.simulation)
+            movers.add(step.change.canonical.mover)
+        assert_equal(movers, set([self.simulation.forward_mover,
+                                  self.simulation.backward_mover]))
+
+        # results don't depend on the number of workers
+        self.simulation.run_parallel(n_per_snapshot=10, n_workers=3,
+                                     seed=5)
+        steps = list(self.simulation.storage.steps)
+        assert_equal(len(steps), 20)
+        for step1, step2 in zip(steps[:10], steps[10:]):
+            assert_equal(step1.change.canonical.mover,
+                         step2.change.canonical.mover)
+            traj1 = step1.active[0].trajectory
+            traj2 = step2.active[0].trajectory
+            assert_equal(len(traj1), len(traj2))
+            assert_not_equal(traj1[-1].__uuid__, traj2[-1].__uuid__)
+
+    def test_committor_run_parallel_engines(self):
+        # 1 step per frame instead of 5: trajectories get longer
+        options = dict(self.engine.options, n_steps_per_frame=1)
+        engines = [toys.Engine(options=options,
+                               topology=self.engine.topology)
+                   for _ in range(2)]
+        with pytest.raises(ValueError):
+            self.simulation.run_parallel(n_per_snapshot=4, n_workers=3,
+                                         engines=engines)
+        self.simulation.run_parallel(n_per_snapshot=4, engines=engines)
+        assert_equal(len(self.simulation.storage.steps), 4)
+        for step in self.simulation.storage.steps:
+            assert_equal(len(step.active[0].trajectory), 11)
+
+    def test_committor_replaced_worker_engine(self, monkeypatch):
+        # a worker started after the first ones (by the pool, to replace a
+        # dead worker) must still get an engine
+        from openpathsampling.pathsimulators import parallel, shoot_snapshots
+        engines = [toys.Engine(options=self.engine.options,
+                               topology=self.engine.topology)
+                   for _ in range(2)]
+        counter = parallel.worker_counter()
+        counter.value = 3
+        monkeypatch.setattr(parallel, 'new_uuid_prefix', lambda: None)
+        monkeypatch.setattr(paths.EngineMover, 'default_engine',
+                            paths.EngineMover.default_engine)
+        monkeypatch.setattr(self.simulation, 'engine', self.engine)
+        monkeypatch.setattr(shoot_snapshots, '_worker_state',
+                            dict(simulation=self.simulation,
+                                 engines=engines, known={}))
+        shoot_snapshots._init_shooting_worker(counter)
+        assert self.simulation.engine is engines[1]
+
     def test_forward_only_committor(self):
         sim = CommittorSimulation(storage=self.storage,
                                   engine=self.engine,
@@ -825,6 +885,39 @@ class TestPathSampling(object):
         final_xyz = set(s.xyz.tobytes() for s in final_snaps)
         assert init_xyz & final_xyz == set([])
 
+    def _run_parallel_steps(self, n_workers):
+        sim = PathSampling(storage=None, move_scheme=self.scheme,
+                           sample_set=self.init_cond)
+        sim.output_stream = open(os.devnull, 'w')
+        steps = []
+
+        def after_step(sim, step_number, step_info, state, results,
+                       hook_state):
+            steps.append(results)
+
+        sim.attach_hook(after_step, hook_for='after_step')
+        sim.run_parallel(10, n_workers=n_workers, seed=3)
+        assert sim.step == 10
+        assert sim.current_step is steps[-1]
+        sim.sample_set.sanity_check()
+        return steps
+
+    def test_run_parallel(self):
+        serial = self._run_parallel_steps(n_workers=1)
+        parallel = self._run_parallel_steps(n_workers=3)
+        assert [step.mccycle for step in parallel] == list(range(1, 11))
+        for step1, step2 in zip(serial, parallel):
+            assert step1.change.canonical.mover is \
+                    step2.change.canonical.mover
+            assert step1.change.accepted == step2.change.accepted
+            for ens in self.scheme.network.sampling_ensembles:
+                traj1 = step1.active[ens].trajectory
+                traj2 = step2.active[ens].trajectory
+                np.testing.assert_allclose(traj1.xyz, traj2.xyz)
+        # steps are linked to the previous step's sample set
+        for prev, step in zip(parallel[:-1], parallel[1:]):
+            assert step.previous is prev.active
+
     def test_save_initial_scheme(self, tmpdir):
         # check that we actually save scheme when we save this
         filename = tmpdir.join("temp.nc")
@@ -162,6 +162,43 @@ class TestPLUMEDCV(TestPLUMED):
         np.testing.assert_almost_equal(sum_pl,
                                        comb_pl(self.trajectory), decimal=6)
 
+    def test_compute_cvs(self):
+        plmd = PLUMEDInterface(self.topology)
+        phi_pl = PLUMEDCV("phi", plmd, "TORSION ATOMS=5,7,9,15")
+        comp_pl = PLUMEDCV("comp", plmd, "DISTANCE ATOMS=7,9 COMPONENTS",
+                           components=["x", "y", "z"])
+        phi, comp = plmd.compute_cvs([phi_pl, comp_pl], self.trajectory)
+        assert phi.shape == (len(self.trajectory), 1)
+        assert comp.shape == (len(self.trajectory), 3, 1)
+        np.testing.assert_almost_equal(phi[:, 0], phi_pl(self.trajectory),
+                                       decimal=6)
+        np.testing.assert_almost_equal(comp[:, :, 0],
+                                       comp_pl(self.trajectory), decimal=6)
+
+    def test_cv_group(self):
+        plmd = PLUMEDInterface(self.topology)
+        phi_pl = PLUMEDCV("phi", plmd, "TORSION ATOMS=5,7,9,15")
+        psi_pl = PLUMEDCV("psi", plmd, "TORSION ATOMS=7,9,15,17")
+        phi_pl(self.trajectory[:2])  # some values are known already
+        calls = []
+        compute_cvs = plmd.compute_cvs
+        plmd.compute_cvs = lambda cvs, traj: (calls.append(len(traj))
+                                              or compute_cvs(cvs, traj))
+        phi, psi = paths.CVGroup([phi_pl, psi_pl])(self.trajectory)
+        assert calls == [len(self.trajectory)]
+        # the CVs now answer from their caches
+        phi_pl(self.trajectory)
+        psi_pl(self.trajectory)
+        assert calls == [len(self.trajectory)]
+
+        plmd2 = PLUMEDInterface(self.topology)
+        np.testing.assert_almost_equal(
+            phi, PLUMEDCV("phi", plmd2, "TORSION ATOMS=5,7,9,15")(
+                self.trajectory), decimal=6)
+        np.testing.assert_almost_equal(
+            psi, PLUMEDCV("psi", plmd2, "TORSION ATOMS=7,9,15,17")(
+                self.trajectory), decimal=6)
+
     def test_group(self):
         plmd = PLUMEDInterface(self.topology)
         tor_pl = PLUMEDCV("tor", plmd, "TORSION ATOMS=7,9,15,17")
@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+import pytest
+
+import openpathsampling as paths
+
+from .test_helpers import make_1d_traj
+
+
+class TestStorageProfile(object):
+    def setup(self):
+        self.filename = "test_storage_profile.nc"
+        self.traj = make_1d_traj([float(x) for x in range(5)])
+
+    def teardown(self):
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    def _save_and_get_coordinates(self, profile):
+        storage = paths.Storage(self.filename, 'w', profile=profile)
+        storage.save(self.traj)
+        coordinates = storage.variables['snapshot0_coordinates']
+        result = (coordinates.chunking(), coordinates.filters(),
+                  coordinates[:, 0, 0])
+        storage.close()
+        return result
+
+    def test_default(self):
+        chunking, filters, _ = self._save_and_get_coordinates(None)
+        assert chunking == [256, 1, 3]
+        assert not filters['zlib']
+
+    def test_simulation(self):
+        chunking, filters, _ = self._save_and_get_coordinates('simulation')
+        assert chunking == [32, 1, 3]
+        assert not filters['zlib']
+
+    def test_archive(self):
+        chunking, filters, values = self._save_and_get_coordinates('archive')
+        assert chunking == [256, 1, 3]
+        assert filters['zlib']
+        assert filters['shuffle']
+        assert filters['complevel'] == 4
+        np.testing.assert_array_equal(values, [float(x) for x in range(5)])
+
+    def _cv_value_chunking(self, profile, allow_incomplete):
+        storage = paths.Storage(self.filename, 'w', profile=profile)
+        storage.snapshots.save(self.traj[0])
+        cv = paths.FunctionCV('x', lambda s: s.xyz[0][0],
+                              cv_time_reversible=True)
+        cv.diskcache_allow_incomplete = allow_incomplete
+        cv.with_diskcache(chunksize=64)
+        storage.save(cv)
+        storage.save(self.traj)
+        store = cv._store_dict.value_store
+        chunking = storage.variables['cv0_value'].chunking()
+        result = (chunking, store.chunksize)
+        storage.close()
+        return result
+
+    def test_analysis(self):
+        # features are chunked as by default
+        chunking, filters, _ = self._save_and_get_coordinates('analysis')
+        assert chunking == [256, 1, 3]
+        assert not filters['zlib']
+
+    @pytest.mark.parametrize('allow_incomplete', [False, True])
+    def test_analysis_cv_values(self, allow_incomplete):
+        chunking, chunksize = self._cv_value_chunking('analysis',
+                                                      allow_incomplete)
+        assert chunking == [chunksize]
+        expected = 64 if allow_incomplete else 256
+        assert chunksize == expected
+
+    def test_default_cv_values(self):
+        chunking, _ = self._cv_value_chunking(None, allow_incomplete=False)
+        assert chunking == [1]
+
+    def test_custom_profile(self):
+        profile = [('snapshot0_velocities', {'chunk_rows': 8}),
+                   ('snapshot*', {'zlib': True})]
+        storage = paths.Storage(self.filename, 'w', profile=profile)
+        storage.save(self.traj)
+        velocities = storage.variables['snapshot0_velocities']
+        coordinates = storage.variables['snapshot0_coordinates']
+        assert velocities.chunking()[0] == 8
+        assert not velocities.filters()['zlib']
+        assert coordinates.filters()['zlib']
+        # variables that are not matched are unchanged
+        assert not storage.variables['trajectories_json'].filters()['zlib']
+        storage.close()
+
+    def test_unknown_profile(self):
+        storage = paths.Storage(self.filename, 'w')
+        with pytest.raises(ValueError):
+            storage.set_storage_profile('unknown')
+        storage.close()
+
+    def test_compact(self):
+        traj = make_1d_traj([0.12345 * x for x in range(5)])
+        storage = paths.Storage(self.filename, 'w', profile='compact')
+        storage.save(traj)
+        store = storage.snapshots.store_snapshot_list[0]
+        assert store.variables['coordinates'].dtype == np.int32
+        assert store.variables['velocities'].dtype == np.int32
+        np.testing.assert_allclose(
+            store.variables['coordinates'][:, 0, 0],
+            np.round([0.12345 * x for x in range(5)], 3)
+        )
+        storage.snapshots.cache.clear()
+        store.cache.clear()
+        loaded = storage.snapshots[2]
+        assert loaded.coordinates.dtype == np.float32
+        np.testing.assert_allclose(loaded.coordinates, traj[1].coordinates,
+                                   atol=0.0005)
+        storage.close()
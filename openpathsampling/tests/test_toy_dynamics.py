@@ -156,6 +156,72 @@ class TestCombinations(object):
     def test_kinetic_energy(self):
         assert_almost_equal(self.simpletest.kinetic_energy(self), 0.4575)
 
+    def test_terms(self):
+        assert_equal(self.simpletest.terms, [(2.0, gaussian)])
+        assert_equal(self.fullertest.terms,
+                     [(1.0, gaussian), (1.0, outer), (-1.0, linear)])
+        assert_equal((gaussian - gaussian).terms, [])
+
+    def test_V_and_dVdx(self):
+        for pes in [self.simpletest, self.fullertest, gaussian, outer,
+                    linear, harmonic, doublewell,
+                    gaussian + outer - (harmonic - doublewell)]:
+            V, dVdx = pes.V_and_dVdx(self)
+            assert_almost_equal(V, pes.V(self))
+            np.testing.assert_allclose(dVdx, pes.dVdx(self))
+
+    def test_dVdx_out(self):
+        pes = gaussian + outer - linear
+        first = pes.dVdx(self)
+        expected = first.copy()
+        second = pes.dVdx(self)
+        assert second is not first
+        np.testing.assert_array_equal(first, expected)
+
+        out = np.empty_like(expected)
+        assert pes.dVdx(self, out=out) is out
+        np.testing.assert_allclose(out, expected)
+        V, dVdx = pes.V_and_dVdx(self, out=out)
+        assert dVdx is out
+        np.testing.assert_allclose(out, expected)
+
+    def test_cancelling_terms(self):
+        pes = gaussian + outer - gaussian
+        assert_almost_equal(pes.V(self), outer.V(self))
+        np.testing.assert_allclose(pes.dVdx(self), outer.dVdx(self))
+
+
+class TestBatchedPES(object):
+    def setup(self):
+        self.positions = np.array([init_pos, init_pos[::-1], -init_pos])
+        self.velocities = np.array([init_vel, init_vel, -init_vel])
+        self.mass = sys_mass
+
+    def _single(self, row):
+        single = TestBatchedPES.__new__(TestBatchedPES)
+        single.positions = self.positions[row]
+        single.velocities = self.velocities[row]
+        single.mass = self.mass
+        return single
+
+    def test_V_and_dVdx(self):
+        pes = gaussian + outer - linear + harmonic + doublewell
+        batch_V = pes.V(self)
+        batch_dVdx = pes.dVdx(self)
+        assert_equal(batch_V.shape, (3,))
+        assert_equal(batch_dVdx.shape, (3, 2))
+        for row in range(3):
+            single = self._single(row)
+            assert_almost_equal(batch_V[row], pes.V(single))
+            np.testing.assert_allclose(batch_dVdx[row], pes.dVdx(single))
+        fused_V, fused_dVdx = pes.V_and_dVdx(self)
+        np.testing.assert_allclose(fused_V, batch_V)
+        np.testing.assert_allclose(fused_dVdx, batch_dVdx)
+
+    def test_kinetic_energy(self):
+        ke = linear.kinetic_energy(self)
+        np.testing.assert_allclose(ke, [0.4575] * 3)
+
 
 # === TESTS FOR TOY ENGINE OBJECT =========================================
 
@@ -269,6 +335,64 @@ class TestToyEngine(object):
     def test_has_constraints(self):
         assert not self.sim.has_constraints()
 
+    def test_generate_batch_length(self):
+        self.sim.options['n_frames_max'] = 50
+        ens = paths.LengthEnsemble(4)
+        starts = [
+            toy.Snapshot(coordinates=np.array([pos]),
+                         velocities=np.array([init_vel]),
+                         engine=self.sim)
+            for pos in [init_pos, init_pos + 0.1, init_pos - 0.1]
+        ]
+        trajs = self.sim.generate_batch(starts, [ens.can_append])
+        assert_equal(len(trajs), 3)
+        for start, traj in zip(starts, trajs):
+            serial = self.sim.generate(start, [ens.can_append])
+            assert_equal(len(traj), len(serial))
+            assert traj[0] is start
+            for (s1, s2) in zip(traj, serial):
+                np.testing.assert_allclose(s1.coordinates, s2.coordinates)
+                np.testing.assert_allclose(s1.velocities, s2.velocities)
+
+    def test_generate_batch_per_walker_stop(self):
+        self.sim.options['n_frames_max'] = 50
+        cv = paths.FunctionCV("x", lambda s: s.xyz[0][0])
+        ens = paths.AllInXEnsemble(paths.CVDefinedVolume(cv, 0.45, 0.75))
+        starts = [
+            toy.Snapshot(coordinates=np.array([[x, 0.0]]),
+                         velocities=np.array([init_vel]),
+                         engine=self.sim)
+            for x in [0.7, 0.6]
+        ]
+        for direction in [1, -1]:
+            trajs = self.sim.generate_batch(starts, ens.can_append,
+                                            direction=direction)
+            for start, traj in zip(starts, trajs):
+                serial = self.sim.generate(start, ens.can_append,
+                                           direction=direction)
+                assert_equal(len(traj), len(serial))
+                for (s1, s2) in zip(traj, serial):
+                    np.testing.assert_allclose(s1.coordinates,
+                                               s2.coordinates)
+            lengths = [len(traj) for traj in trajs]
+            assert lengths[0] != lengths[1]
+
+    def test_generate_batch_max_length(self):
+        ens = paths.LengthEnsemble(10)
+        start = self.sim.current_snapshot
+        try:
+            self.sim.generate_batch([start, start], [ens.can_append])
+        except paths.engines.EngineMaxLengthError as e:
+            assert_equal(len(e.last_trajectory), self.sim.n_frames_max)
+        else:
+            raise RuntimeError('Did not raise MaxLength Error')
+
+        self.sim.options['on_max_length'] = 'stop'
+        trajs = self.sim.generate_batch([start, start], [ens.can_append])
+        assert_equal([len(t) for t in trajs], [5, 5])
+        # engine state is restored after the batch
+        assert_items_equal(self.sim.positions, init_pos)
+
 
 # === TESTS FOR TOY INTEGRATORS ===========================================
 
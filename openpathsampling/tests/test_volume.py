@@ -404,6 +404,183 @@ class TestCVRangeVolumePeriodic(object):
                 volume.PeriodicCVDefinedVolume(op_id, -100, 75))
 
 
+class TestFramesIn(object):
+    def setup(self):
+        self.values = [-1.0, -0.6, -0.5, -0.3, 0.0, 0.25, 0.5, 0.7, 1.0,
+                       float('nan')]
+
+    def _check(self, vol, values=None):
+        values = self.values if values is None else values
+        expected = [bool(vol(val)) for val in values]
+        result = vol.frames_in(values)
+        assert result.dtype == bool
+        assert list(result) == expected
+
+    def test_cv_defined(self):
+        for vol in [volA, volB, volC, volD,
+                    volume.CVDefinedVolume(op_id, float('-inf'), 0.0),
+                    volume.CVDefinedVolume(op_id, 0.0, float('inf'))]:
+            self._check(vol)
+
+    def test_combinations(self):
+        for vol in [volA & volB, volA | volB, volA ^ volB, volA - volB,
+                    volD - volA, ~volA, ~(volA | volC)]:
+            self._check(vol)
+
+    def test_empty_full(self):
+        self._check(volume.EmptyVolume())
+        self._check(volume.FullVolume())
+
+    def test_periodic(self):
+        values = [-190.0, -180.0, -100.0, -60.0, 0.0, 75.0, 80.0, 179.0,
+                  180.0, 200.0, 500.0, -500.0]
+        for vol in [volume.PeriodicCVDefinedVolume(op_id, -100, 75),
+                    volume.PeriodicCVDefinedVolume(op_id, 75, -100),
+                    volume.PeriodicCVDefinedVolume(op_id, -150, 70,
+                                                   -180, 180),
+                    volume.PeriodicCVDefinedVolume(op_id, 150, -170,
+                                                   -180, 180),
+                    volume.PeriodicCVDefinedVolume(op_id, -180, 180,
+                                                   -180, 180)]:
+            self._check(vol, values)
+
+    def test_single_cv_call(self):
+        calls = []
+
+        def cv_fnc(snapshot):
+            calls.append(snapshot)
+            return snapshot.xyz[0][0]
+
+        cv = paths.FunctionCV("x", cv_fnc).with_diskcache()
+        vol = volume.CVDefinedVolume(cv, 0.0, 0.5)
+        traj = make_1d_traj([-0.1, 0.1, 0.3, 0.6])
+        assert list(vol.frames_in(traj)) == [False, True, True, False]
+        assert len(calls) == 4
+        # second use is taken from the cache
+        assert list(vol.frames_in(traj)) == [False, True, True, False]
+        assert len(calls) == 4
+
+    def test_overridden_call(self):
+        class OddVolume(volume.CVDefinedVolume):
+            def __call__(self, snapshot):
+                return int(snapshot) % 2 == 1
+
+        vol = OddVolume(op_id, -10, 10)
+        values = [0, 1, 2, 3]
+        assert list(vol.frames_in(values)) == [False, True, False, True]
+        assert list((~vol).frames_in(values)) == [True, False, True, False]
+
+
+class TestVoronoiVolume(object):
+    def setup(self):
+        self.centers = np.array([[0.0, 0.0], [1.0, 0.0], [0.0, 2.0],
+                                 [3.0, 3.0]])
+        rng = np.random.RandomState(42)
+        self.points = list(rng.uniform(-1.0, 4.0, size=(20, 2)))
+        self.expected = [
+            int(np.argmin(np.linalg.norm(self.centers - point, axis=1)))
+            for point in self.points
+        ]
+
+    def test_distances_cv(self):
+        distances = [np.linalg.norm(self.centers - point, axis=1)
+                     for point in self.points]
+        vol = volume.VoronoiVolume(op_id, state=1)
+        assert [vol.cell(dist) for dist in distances] == self.expected
+        assert vol.cells(distances).tolist() == self.expected
+        assert vol.frames_in(distances).tolist() == \
+            [cell == 1 for cell in self.expected]
+        assert vol(distances[0], state=self.expected[0]) is True
+        # no valid distance
+        assert vol.cell([float('nan'), 2e9]) == -1
+
+    def test_centers(self):
+        vol = volume.VoronoiVolume(op_id, state=2, centers=self.centers)
+        assert [vol.cell(point) for point in self.points] == self.expected
+        assert vol.cells(self.points).tolist() == self.expected
+        assert vol.cells([]).tolist() == []
+        assert [vol(point) for point in self.points] == \
+            [cell == 2 for cell in self.expected]
+        assert vol.frames_in(self.points).tolist() == \
+            [cell == 2 for cell in self.expected]
+
+    def test_centers_1d(self):
+        cv = paths.FunctionCV("x", lambda snap: snap.xyz[0][0])
+        vol = volume.VoronoiVolume(cv, state=0, centers=[-1.0, 0.0, 2.0])
+        traj = make_1d_traj([-2.0, -0.4, 0.9, 1.1, 5.0])
+        assert vol.cells(traj).tolist() == [0, 1, 1, 2, 2]
+        assert vol(traj[0]) is True
+
+
+class TestVolumeProgram(object):
+    def setup(self):
+        self.values = [-1.0, -0.6, -0.5, -0.3, 0.0, 0.25, 0.5, 0.7, 1.0,
+                       float('nan')]
+
+    def test_matches_call(self):
+        volumes = [volA, volA | volC, (volA | volC) & ~volB, volA ^ volB,
+                   volD - volA, volA | volA2, volume.EmptyVolume(),
+                   volume.FullVolume(), ~volume.FullVolume()]
+        program = volume.VolumeProgram(volumes)
+        result = program(self.values)
+        assert result.shape == (len(volumes), len(self.values))
+        for (vol, vol_result) in zip(volumes, result):
+            assert list(vol_result) == [bool(vol(val))
+                                        for val in self.values]
+
+    def test_empty_snapshots(self):
+        program = volume.VolumeProgram([volA, volB])
+        assert program([]).shape == (2, 0)
+
+    def test_common_subexpressions(self):
+        same_as_volA = volume.CVDefinedVolume(op_id, -0.5, 0.5)
+        program = volume.VolumeProgram([volA | volA2, ~volA,
+                                        same_as_volA & volA2])
+        assert program.cvs == [op_id, volA2.collectivevariable]
+        # ranges of volA and volA2, the or, the not, and the and
+        assert len(program.instructions) == 5
+        assert program.outputs == [2, 3, 4]
+
+    def test_single_cv_call(self):
+        calls = []
+
+        def cv_fnc(snapshots):
+            calls.append(len(snapshots))
+            return [snap.xyz[0][0] for snap in snapshots]
+
+        cv = paths.FunctionCV("x", cv_fnc, cv_requires_lists=True)
+        vol = (volume.CVDefinedVolume(cv, 0.0, 0.2)
+               | volume.CVDefinedVolume(cv, 0.4, 0.6)) \
+            & ~volume.CVDefinedVolume(cv, 0.5, 0.55)
+        traj = make_1d_traj([-0.1, 0.1, 0.3, 0.45, 0.52, 0.7])
+        assert list(vol.frames_in(traj)) == [False, True, False, True,
+                                             False, False]
+        assert calls == [len(traj)]
+
+    def test_opaque_volumes(self):
+        class OddVolume(volume.CVDefinedVolume):
+            def __call__(self, snapshot):
+                return int(snapshot) % 2 == 1
+
+        odd = OddVolume(op_id, -10, 10)
+        values = [0, 1, 2, 3]
+        program = volume.VolumeProgram([odd | volC, ~odd])
+        assert program.instructions[0] == ('volume', odd)
+        assert program(values).tolist() == [[False, True, False, True],
+                                            [True, False, True, False]]
+
+    def test_memo(self):
+        cv = paths.FunctionCV("x", lambda snap: snap.xyz[0][0])
+        vol = volume.CVDefinedVolume(cv, -0.5, 0.5)
+        program = volume.VolumeProgram([vol, ~vol])
+        traj = make_1d_traj(self.values[:-1])
+        memo = paths.VolumeMembershipMemo([vol])
+        with memo:
+            result = program.frames_in(traj)
+            assert memo.misses == len(traj)
+        assert result.tolist() == program(traj).tolist()
+
+
 class TestAbstract(object):
     @raises_with_message_like(TypeError, "Can't instantiate abstract class")
     def test_abstract_volume(self):
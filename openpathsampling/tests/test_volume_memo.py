@@ -0,0 +1,136 @@
+import openpathsampling as paths
+from openpathsampling.volume_memo import find_volumes, VolumeMembershipMemo
+
+from .test_helpers import make_1d_traj
+
+import logging
+logging.getLogger('openpathsampling.initialization').setLevel(logging.CRITICAL)
+logging.getLogger('openpathsampling.ensemble').setLevel(logging.CRITICAL)
+
+
+class TestVolumeMembershipMemo(object):
+    def setup(self):
+        self.n_calls = 0
+
+        def xval(snap):
+            self.n_calls += 1
+            return snap.xyz[0][0]
+
+        self.cv = paths.FunctionCV("x", xval)
+        self.stateA = paths.CVDefinedVolume(self.cv, float("-inf"), 0.0)
+        self.stateB = paths.CVDefinedVolume(self.cv, 1.0, float("inf"))
+        self.traj = make_1d_traj([-0.1, 0.3, 0.7, 1.2, 0.5])
+        self.memo = VolumeMembershipMemo([self.stateA, self.stateB,
+                                          self.stateA])
+
+    def teardown(self):
+        self.memo.detach()
+
+    def test_distinct_volumes(self):
+        assert self.memo.volumes == [self.stateA, self.stateB]
+
+    def test_find_volumes(self):
+        union = self.stateA | self.stateB
+        ensemble = paths.SequentialEnsemble([
+            paths.AllInXEnsemble(self.stateA) & paths.LengthEnsemble(1),
+            paths.AllOutXEnsemble(union),
+            paths.AllInXEnsemble(self.stateB) & paths.LengthEnsemble(1)
+        ])
+        volumes = find_volumes(ensemble)
+        for vol in [self.stateA, self.stateB, union]:
+            assert vol in volumes
+        # the negated volume that AllOutXEnsemble uses internally
+        assert any(isinstance(vol, paths.volume.NegatedVolume)
+                   for vol in volumes)
+        assert len(volumes) == len(set(id(vol) for vol in volumes))
+
+    def test_is_in(self):
+        snap = self.traj[0]
+        assert self.memo.is_in(self.stateA, snap) is True
+        assert self.memo.is_in(self.stateB, snap) is False
+        assert (self.memo.hits, self.memo.misses) == (0, 2)
+        assert self.memo.is_in(self.stateA, snap) is True
+        assert (self.memo.hits, self.memo.misses) == (1, 2)
+        assert self.memo.hit_rate == 1.0 / 3.0
+        assert len(self.memo) == 1
+
+    def test_frames_in(self):
+        expected = [bool(self.stateB(snap)) for snap in self.traj]
+        result = self.memo.frames_in(self.stateB, self.traj)
+        assert list(result) == expected
+        assert (self.memo.hits, self.memo.misses) == (0, 5)
+        result = self.memo.frames_in(self.stateB, self.traj[2:])
+        assert list(result) == expected[2:]
+        assert (self.memo.hits, self.memo.misses) == (3, 5)
+
+    def test_attach_detach(self):
+        with self.memo:
+            assert self.stateA._membership_memo is self.memo
+            self.stateA.frames_in(self.traj)
+            n_calls = self.n_calls
+            result = self.stateA.frames_in(self.traj)
+            assert self.n_calls == n_calls
+            assert self.memo.hits == len(self.traj)
+        assert self.stateA._membership_memo is None
+        assert list(self.stateA.frames_in(self.traj)) == list(result)
+        assert self.memo.hits == len(self.traj)
+
+    def test_lru(self):
+        memo = VolumeMembershipMemo([self.stateA], size_limit=3)
+        memo.frames_in(self.stateA, self.traj[:3])
+        assert memo.evictions == 0
+        memo.is_in(self.stateA, self.traj[0])  # most recently used
+        memo.is_in(self.stateA, self.traj[3])
+        assert len(memo) == 3
+        assert memo.evictions == 1
+        memo.reset_counters()
+        memo.is_in(self.stateA, self.traj[0])
+        memo.is_in(self.stateA, self.traj[1])
+        assert (memo.hits, memo.misses) == (1, 1)
+        assert "hit rate 50.0%" in str(memo)
+
+    def test_ensembles_use_memo(self):
+        tis = paths.TISEnsemble(self.stateA, self.stateB,
+                                paths.CVDefinedVolume(self.cv,
+                                                      float("-inf"), 0.2),
+                                self.cv)
+        traj = make_1d_traj([-0.1, 0.3, 0.7, 1.2])
+        expected = (tis(traj), tis.can_append(traj), tis.can_prepend(traj))
+        memo = VolumeMembershipMemo.from_objects(tis)
+        with memo:
+            results = (tis(traj), tis.can_append(traj),
+                       tis.can_prepend(traj))
+            assert memo.misses > 0
+            assert memo.hits > 0
+        assert results == expected
+
+
+class TestSchemeVolumeMembershipMemo(object):
+    def setup(self):
+        paths.InterfaceSet._reset()
+        cv = paths.FunctionCV(name="x", f=lambda s: s.xyz[0][0])
+        self.stateA = paths.CVDefinedVolume(cv, float("-inf"), -0.5)
+        self.stateB = paths.CVDefinedVolume(cv, 0.5, float("inf"))
+        ifacesA = paths.VolumeInterfaceSet(cv, float("-inf"), [-0.5, -0.3])
+        ifacesB = paths.VolumeInterfaceSet(cv, [0.5, 0.3], float("inf"))
+        network = paths.MSTISNetwork([(self.stateA, ifacesA),
+                                      (self.stateB, ifacesB)])
+        self.scheme = paths.DefaultScheme(network)
+        self.interfaces = list(ifacesA) + list(ifacesB)
+
+    def test_volume_membership_memo(self):
+        memo = self.scheme.volume_membership_memo(size_limit=10)
+        assert memo.size_limit == 10
+        for vol in [self.stateA, self.stateB] + self.interfaces:
+            assert vol in memo.volumes
+        assert self.stateA._membership_memo is None
+        # separate trajectories: the ensembles cache their results
+        expected = [ens.can_append(make_1d_traj([-0.6, -0.4, -0.2]))
+                    for ens in self.scheme.network.sampling_ensembles]
+        traj = make_1d_traj([-0.6, -0.4, -0.2])
+        with memo:
+            results = [ens.can_append(traj)
+                       for ens in self.scheme.network.sampling_ensembles]
+        assert results == expected
+        # the state volumes are shared by the ensembles
+        assert memo.hits > 0
@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+
+import openpathsampling as paths
+
+from .test_helpers import make_1d_traj
+
+
+class TestWriteBuffer(object):
+    def setup(self):
+        self.filename = "test_write_buffer.nc"
+        self.storage = paths.Storage(self.filename, 'w')
+        self.storage.set_write_buffer(4)
+        self.traj = make_1d_traj([float(x) for x in range(10)])
+
+    def teardown(self):
+        if self.storage.isopen():
+            self.storage.close()
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    @property
+    def snapshot_store(self):
+        return self.storage.snapshots.store_snapshot_list[0]
+
+    def test_new_stores_are_buffered(self):
+        self.storage.save(self.traj[0])
+        store = self.snapshot_store
+        assert set(store.write_buffer.delegates) == {
+            'snapshot0_index', 'snapshot0_coordinates',
+            'snapshot0_velocities'
+        }
+        # only numeric variables are buffered
+        assert 'snapshot0_engine' not in store.write_buffer.delegates
+        assert 'snapshots_store' in \
+            self.storage.snapshots.write_buffer.delegates
+
+    def test_read_from_buffer(self):
+        self.storage.save(self.traj[:3])
+        store = self.snapshot_store
+        assert len(store.write_buffer) == 3
+        assert store.write_buffer.n_flushes == 0
+        assert np.ma.is_masked(store.variables['coordinates'][2])
+        np.testing.assert_array_equal(store.vars['coordinates'][2],
+                                      [[2.0, 0.0, 0.0]])
+
+        self.storage.snapshots.cache.clear()
+        store.cache.clear()
+        assert len(self.storage.snapshots) == 6
+        loaded = self.storage.snapshots[4]
+        assert loaded is not self.traj[2]
+        assert loaded.__uuid__ == self.traj[2].__uuid__
+        np.testing.assert_array_equal(loaded.xyz, self.traj[2].xyz)
+
+    def test_flush(self):
+        self.storage.save(self.traj)
+        store = self.snapshot_store
+        assert store.write_buffer.n_flushes == 2
+        assert len(store.write_buffer) == 2
+        self.storage.sync()
+        assert len(store.write_buffer) == 0
+        np.testing.assert_array_equal(
+            store.variables['coordinates'][:, 0, 0],
+            [float(x) for x in range(10)])
+        np.testing.assert_array_equal(store.variables['index'][:],
+                                      list(range(10)))
+
+    def test_disable(self):
+        self.storage.save(self.traj[:3])
+        store = self.snapshot_store
+        self.storage.set_write_buffer(None)
+        assert store.write_buffer is None
+        np.testing.assert_array_equal(
+            store.variables['coordinates'][:, 0, 0], [0.0, 1.0, 2.0])
+        assert 'snapshot0_coordinates' not in [
+            name for name, var in self.storage.vars.items()
+            if hasattr(var, 'buffer')
+        ]
+
+    def test_value_stores_are_not_buffered(self):
+        cv = paths.FunctionCV('x', lambda s: s.xyz[0][0],
+                              cv_time_reversible=True).with_diskcache()
+        self.storage.save(self.traj[0])
+        self.storage.save(cv)
+        store = cv._store_dict.value_store
+        assert not store.supports_write_buffer
+        assert store.write_buffer is None
+        self.storage.save(self.traj)
+        self.storage.sync()
+        assert store.write_buffer is None
@@ -57,9 +57,66 @@ class Volume(StorableNamedObject):
     def __call__(self, snapshot):
         '''
         Returns `True` if the given snapshot is part of the defined Region
+
+        This always evaluates the volume, even if it is attached to a
+        :class:`.VolumeMembershipMemo`; use :meth:`.frames_in` to use the
+        memo.
         '''
         return False # pragma: no cover
 
+    # set for volumes attached to a VolumeMembershipMemo
+    _membership_memo = None
+
+    def frames_in(self, snapshots):
+        '''
+        Returns a boolean array: which of the snapshots are in the volume
+
+        If the volume is attached to a :class:`.VolumeMembershipMemo`,
+        results are taken from (and stored in) the memo.
+
+        Parameters
+        ----------
+        snapshots : list of :class:`.BaseSnapshot` or :class:`.Trajectory`
+            the snapshots to test
+
+        Returns
+        -------
+        numpy.ndarray of bool
+            for each snapshot, whether it is in the volume
+        '''
+        if self._membership_memo is not None:
+            return self._membership_memo.frames_in(self, snapshots)
+        return self._frames_in(snapshots)
+
+    def _frames_in(self, snapshots):
+        # subclasses can override this to evaluate all snapshots at once,
+        # e.g., with a single call to the collective variable
+        return np.array([bool(self(snap)) for snap in snapshots],
+                        dtype=bool)
+
+    def _overrides_call(self, cls):
+        # a subclass of cls with its own __call__ must use that, instead of
+        # the batched version in cls
+        return type(self).__call__ is not cls.__call__
+
+    # compiled version of this volume; see _compiled_frames_in
+    _program = None
+
+    def _compiled_frames_in(self, snapshots):
+        if self._program is None:
+            self._program = VolumeProgram([self])
+        return self._program(snapshots)[0]
+
+    def _compile(self, program):
+        """Add the instructions for this volume to a :class:`.VolumeProgram`
+
+        Returns the register with the result. By default, the volume is
+        evaluated as a whole (with :meth:`.frames_in`); subclasses that can
+        be expressed in terms of CV values and boolean operations override
+        this.
+        """
+        return program.emit(('volume', self.__uuid__), ('volume', self))
+
     def __str__(self):
         '''
         Returns a string representation of the volume
@@ -145,6 +202,21 @@ class VolumeCombination(Volume):
         #return self.fnc(self.volume1.__call__(snapshot),
                         #self.volume2.__call__(snapshot))
 
+    def _frames_in(self, snapshots):
+        if self._overrides_call(VolumeCombination):
+            return super(VolumeCombination, self)._frames_in(snapshots)
+        return self._compiled_frames_in(snapshots)
+
+    def _compile(self, program):
+        if self._overrides_call(VolumeCombination):
+            return super(VolumeCombination, self)._compile(program)
+        a = program.compile(self.volume1)
+        b = program.compile(self.volume2)
+        # truth table of fnc, indexed by 2 * a + b
+        table = tuple(bool(self.fnc(a_val, b_val))
+                      for a_val in (False, True) for b_val in (False, True))
+        return program.emit(('table', table, a, b), ('table', table, a, b))
+
     def __str__(self):
         return '(' + self.sfnc.format(str(self.volume1), str(self.volume2)) + ')'
 
@@ -205,6 +277,17 @@ class NegatedVolume(Volume):
     def __call__(self, snapshot):
         return not self.volume(snapshot)
 
+    def _frames_in(self, snapshots):
+        if self._overrides_call(NegatedVolume):
+            return super(NegatedVolume, self)._frames_in(snapshots)
+        return self._compiled_frames_in(snapshots)
+
+    def _compile(self, program):
+        if self._overrides_call(NegatedVolume):
+            return super(NegatedVolume, self)._compile(program)
+        a = program.compile(self.volume)
+        return program.emit(('not', a), ('not', a))
+
     def __str__(self):
         return '(not ' + str(self.volume) + ')'
 
@@ -217,6 +300,12 @@ class EmptyVolume(Volume):
     def __call__(self, snapshot):
         return False
 
+    def _frames_in(self, snapshots):
+        return np.zeros(len(snapshots), dtype=bool)
+
+    def _compile(self, program):
+        return program.emit(('const', False), ('const', False))
+
     def __and__(self, other):
         return self
 
@@ -244,6 +333,12 @@ class FullVolume(Volume):
     def __call__(self, snapshot):
         return True
 
+    def _frames_in(self, snapshots):
+        return np.ones(len(snapshots), dtype=bool)
+
+    def _compile(self, program):
+        return program.emit(('const', True), ('const', True))
+
     def __invert__(self):
         return EmptyVolume()
 
@@ -420,6 +515,47 @@ class CVDefinedVolume(Volume):
             self._cv_returns_iterable = self._is_iterable(val)
         return val.__float__()
 
+    def _get_cv_floats(self, snapshots):
+        """CV values of all snapshots as float array; None if impossible"""
+        values = self.collectivevariable(snapshots)
+        if self._cv_returns_iterable is None:
+            self._cv_returns_iterable = self._is_iterable(values[0])
+        try:
+            return np.array([val.__float__() for val in values], dtype=float)
+        except (TypeError, AttributeError):
+            # e.g., quantities with units
+            return None
+
+    def _frames_in(self, snapshots):
+        if self._overrides_call(CVDefinedVolume):
+            return super(CVDefinedVolume, self)._frames_in(snapshots)
+        snapshots = list(snapshots)
+        if len(snapshots) == 0:
+            return np.zeros(0, dtype=bool)
+        l = self._get_cv_floats(snapshots)
+        if l is None:
+            return super(CVDefinedVolume, self)._frames_in(snapshots)
+        return self._floats_in(l)
+
+    def _floats_in(self, l):
+        """Boolean array: which of the CV values (floats) are in range"""
+        # same comparisons as __call__ (e.g., NaN is in the volume)
+        result = np.ones(len(l), dtype=bool)
+        if self.lambda_min != float('-inf'):
+            result &= ~(self.lambda_min > l)
+        if self.lambda_max != float('inf'):
+            result &= ~(self.lambda_max <= l)
+        return result
+
+    def _range_key(self):
+        # volumes with the same CV and the same key give the same results
+        return (type(self), self.lambda_min, self.lambda_max)
+
+    def _compile(self, program):
+        if self._overrides_call(CVDefinedVolume):
+            return super(CVDefinedVolume, self)._compile(program)
+        return program.emit_range(self)
+
     def __call__(self, snapshot):
         l = self._get_cv_float(snapshot)
 
@@ -530,6 +666,17 @@ class PeriodicCVDefinedVolume(CVDefinedVolume):
                                     self.period_min, self.period_max
                                    )
 
+    def _do_wrap_array(self, values):
+        """Same as :meth:`.do_wrap` for an array of floats"""
+        val = values - self._period_shift
+        positive = values - np.trunc(val / self._period_len) \
+            * self._period_len
+        wrapped = values + np.trunc((self._period_len - val)
+                                    / self._period_len) * self._period_len
+        wrapped = np.where(wrapped >= self._period_len,
+                           wrapped - self._period_len, wrapped)
+        return np.where(val > 0, positive, wrapped)
+
     def __call__(self, snapshot):
         l = self._get_cv_float(snapshot)
         if self.wrap:
@@ -539,6 +686,34 @@ class PeriodicCVDefinedVolume(CVDefinedVolume):
         else:
             return self.lambda_min <= l < self.lambda_max
 
+    def _frames_in(self, snapshots):
+        if self._overrides_call(PeriodicCVDefinedVolume):
+            return Volume._frames_in(self, snapshots)
+        snapshots = list(snapshots)
+        if len(snapshots) == 0:
+            return np.zeros(0, dtype=bool)
+        l = self._get_cv_floats(snapshots)
+        if l is None:
+            return Volume._frames_in(self, snapshots)
+        return self._floats_in(l)
+
+    def _floats_in(self, l):
+        if self.wrap:
+            l = self._do_wrap_array(l)
+        if self.lambda_min > self.lambda_max:
+            return (l >= self.lambda_min) | (l < self.lambda_max)
+        else:
+            return (self.lambda_min <= l) & (l < self.lambda_max)
+
+    def _range_key(self):
+        return (type(self), self.lambda_min, self.lambda_max,
+                self.period_min, self.period_max)
+
+    def _compile(self, program):
+        if self._overrides_call(PeriodicCVDefinedVolume):
+            return Volume._compile(self, program)
+        return program.emit_range(self)
+
     def __str__(self):
         if self.wrap:
             fcn = 'x|({0}(x) - {2:g}) % {1:g} + {2:g}'.format(
@@ -562,12 +737,22 @@ class VoronoiVolume(Volume):
     '''
     Volume given by a Voronoi cell specified by a set of centers
 
+    The collective variable either returns the distances of a snapshot to
+    all centers (e.g., several RMSDs), or, if ``centers`` is given, the
+    position of the snapshot in the space of the centers. In the latter
+    case, the nearest center is found with a KD-tree over the centers.
+
     Parameters
     ----------
-    collectivevariable : MultiRMSDCV
-        must be an MultiRMSDCV collectivevariable that returns several RMSDs
+    collectivevariable : :class:`.CollectiveVariable`
+        CV that returns the distances to the centers, or (if ``centers``
+        is given) the coordinates of the snapshot
     state : int
         the index of the center for the chosen voronoi cell
+    centers : array-like or None
+        coordinates of the centers, shape ``(n_centers, n_dimensions)``
+        (or ``(n_centers,)`` for one dimension). If None (default), the
+        collectivevariable returns the distances to the centers.
 
     Attributes
     ----------
@@ -575,13 +760,40 @@ class VoronoiVolume(Volume):
         the collectivevariable object
     state : int
         the index of the center for the chosen voronoi cell
+    centers : numpy.ndarray or None
+        coordinates of the centers
 
     '''
 
-    def __init__(self, collectivevariable, state):
+    def __init__(self, collectivevariable, state, centers=None):
         super(VoronoiVolume, self).__init__()
         self.collectivevariable = collectivevariable
         self.state = state
+        if centers is not None:
+            centers = np.asarray(centers, dtype=float)
+            if centers.ndim == 1:
+                centers = centers.reshape(-1, 1)
+        self.centers = centers
+        self._kd_tree = None
+
+    def _get_kd_tree(self):
+        if self._kd_tree is None:
+            from scipy.spatial import cKDTree
+            self._kd_tree = cKDTree(self.centers)
+        return self._kd_tree
+
+    def _nearest_centers(self, values):
+        # values: one row of CV results per snapshot
+        if self.centers is not None:
+            points = np.asarray(values, dtype=float).reshape(
+                len(values), self.centers.shape[1]
+            )
+            return self._get_kd_tree().query(points)[1]
+        distances = np.asarray(values, dtype=float).reshape(len(values), -1)
+        # the first minimum below 1e9, ignoring NaN; -1 if there is none
+        valid = distances < 1000000000.0
+        nearest = np.argmin(np.where(valid, distances, np.inf), axis=1)
+        return np.where(valid.any(axis=1), nearest, -1)
 
     def cell(self, snapshot):
         '''
@@ -597,15 +809,34 @@ class VoronoiVolume(Volume):
         int
             index of the voronoi cell
         '''
-        distances = self.collectivevariable(snapshot)
-        min_val = 1000000000.0
-        min_idx = -1
-        for idx, d in enumerate(distances):
-            if d < min_val:
-                min_val = d
-                min_idx = idx
+        values = [self.collectivevariable(snapshot)]
+        return int(self._nearest_centers(values)[0])
+
+    def cells(self, snapshots):
+        '''
+        Returns the indices of the voronoi cells of several snapshots
+
+        The CV is called once for all snapshots.
+
+        Parameters
+        ----------
+        snapshots : list of :class:`.BaseSnapshot` or :class:`.Trajectory`
+            the snapshots to be tested
+
+        Returns
+        -------
+        numpy.ndarray of int
+            index of the voronoi cell of each snapshot
+        '''
+        snapshots = list(snapshots)
+        if len(snapshots) == 0:
+            return np.zeros(0, dtype=int)
+        return self._nearest_centers(self.collectivevariable(snapshots))
 
-        return min_idx
+    def _frames_in(self, snapshots):
+        if self._overrides_call(VoronoiVolume):
+            return super(VoronoiVolume, self)._frames_in(snapshots)
+        return self.cells(snapshots) == self.state
 
     def __call__(self, snapshot, state=None):
         '''
@@ -631,6 +862,142 @@ class VoronoiVolume(Volume):
         return self.cell(snapshot) == state
 
 
+class VolumeProgram(object):
+    """
+    Flat program that evaluates volumes for many snapshots at once
+
+    The volume trees are compiled into a list of instructions, each of
+    which fills one register (a boolean array over the snapshots). Each
+    distinct collective variable is evaluated once for all snapshots; the
+    interval tests and the logical combinations are then done with numpy.
+    Common subexpressions (the same sub-volume, or the same range of the
+    same CV) share a register.
+
+    Unlike ``volume(snapshot)``, the program does not short-circuit: the
+    CVs of all volumes are evaluated for all snapshots.
+
+    Parameters
+    ----------
+    volumes : list of :class:`.Volume`
+        the volumes to evaluate
+
+    Attributes
+    ----------
+    cvs : list of :class:`.CollectiveVariable`
+        the distinct CVs used by the program
+    instructions : list of tuple
+        the instructions, in order of evaluation
+    outputs : list of int
+        for each volume, the register with its result
+    """
+    def __init__(self, volumes):
+        self.volumes = list(volumes)
+        self.cvs = []
+        self.instructions = []
+        self._cv_registers = {}
+        self._registers = {}
+        self._volume_registers = {}
+        self.outputs = [self.compile(vol) for vol in self.volumes]
+
+    def compile(self, volume):
+        """Compile a volume; returns the register with its result"""
+        try:
+            return self._volume_registers[volume.__uuid__]
+        except KeyError:
+            register = volume._compile(self)
+            self._volume_registers[volume.__uuid__] = register
+            return register
+
+    def emit(self, key, instruction):
+        """Add an instruction, unless one with the same key exists
+
+        Returns
+        -------
+        int
+            the register with the result of the instruction
+        """
+        try:
+            return self._registers[key]
+        except KeyError:
+            register = len(self.instructions)
+            self.instructions.append(instruction)
+            self._registers[key] = register
+            return register
+
+    def emit_range(self, volume):
+        """Add the range test of a :class:`.CVDefinedVolume`"""
+        cv = volume.collectivevariable
+        # CVs are identified by id: the program keeps them alive
+        cv_register = self._cv_registers.get(id(cv))
+        if cv_register is None:
+            cv_register = len(self.cvs)
+            self.cvs.append(cv)
+            self._cv_registers[id(cv)] = cv_register
+        return self.emit(('range', cv_register) + volume._range_key(),
+                         ('range', cv_register, volume))
+
+    def __call__(self, snapshots):
+        """
+        Boolean array: which of the snapshots are in which volume
+
+        Parameters
+        ----------
+        snapshots : list of :class:`.BaseSnapshot` or :class:`.Trajectory`
+            the snapshots to test
+
+        Returns
+        -------
+        numpy.ndarray of bool
+            array with shape ``(len(volumes), len(snapshots))``
+        """
+        snapshots = list(snapshots)
+        if len(snapshots) == 0:
+            return np.zeros((len(self.volumes), 0), dtype=bool)
+        cv_values = {}
+        registers = []
+        for instruction in self.instructions:
+            op = instruction[0]
+            if op == 'range':
+                (_, cv_register, volume) = instruction
+                if cv_register not in cv_values:
+                    cv_values[cv_register] = \
+                        volume._get_cv_floats(snapshots)
+                values = cv_values[cv_register]
+                if values is None:
+                    # e.g., quantities with units
+                    result = volume._frames_in(snapshots)
+                else:
+                    result = volume._floats_in(values)
+            elif op == 'table':
+                (_, table, a, b) = instruction
+                index = 2 * registers[a] + registers[b]
+                result = np.array(table, dtype=bool)[index]
+            elif op == 'not':
+                result = ~registers[instruction[1]]
+            elif op == 'const':
+                result = np.full(len(snapshots), instruction[1], dtype=bool)
+            else:  # 'volume'
+                result = np.asarray(instruction[1].frames_in(snapshots),
+                                    dtype=bool)
+            registers.append(result)
+        return np.array([registers[r] for r in self.outputs], dtype=bool)
+
+    def frames_in(self, snapshots):
+        """
+        Same as calling the program, but using the volumes' memos
+
+        Volumes attached to a :class:`.VolumeMembershipMemo` are
+        evaluated with :meth:`.Volume.frames_in` instead.
+        """
+        if any(vol._membership_memo is not None for vol in self.volumes):
+            snapshots = list(snapshots)
+            return np.array([vol.frames_in(snapshots)
+                             for vol in self.volumes],
+                            dtype=bool).reshape(len(self.volumes),
+                                                len(snapshots))
+        return self(snapshots)
+
+
 # class VolumeFactory(object):
     # @staticmethod
     # def _check_minmax(minvals, maxvals):
@@ -0,0 +1,227 @@
+"""
+Memo of which snapshots are in which volumes, shared by many ensembles.
+
+In a network with several states and interfaces, the same volumes are
+tested for the same snapshots by many ensembles (e.g., the TIS ensembles,
+the minus ensembles, and the stopping conditions of the shooting movers).
+A :class:`.VolumeMembershipMemo` stores these results once per snapshot.
+"""
+import numpy as np
+
+from openpathsampling.netcdfplus import (StorableObject, PseudoAttribute,
+                                         ObjectStore)
+from openpathsampling.netcdfplus.cache import LRUCache
+from openpathsampling.volume import Volume
+
+
+def find_volumes(*objects):
+    """Find all volumes that can be reached from the given objects
+
+    This searches through storable objects (such as networks, ensembles,
+    and volumes themselves) and containers of them. Collective variables
+    and stores are not searched.
+
+    Parameters
+    ----------
+    objects : list
+        objects to start the search from
+
+    Returns
+    -------
+    list of :class:`.Volume`
+        the distinct volumes, in the order they were found
+    """
+    volumes = []
+    seen = set()
+    stack = list(reversed(objects))
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, Volume):
+            volumes.append(obj)
+        if isinstance(obj, (PseudoAttribute, ObjectStore)):
+            continue
+        if isinstance(obj, StorableObject):
+            stack.extend(reversed(list(vars(obj).values())))
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return volumes
+
+
+class VolumeMembershipMemo(object):
+    """Memo of the volume membership of snapshots.
+
+    For each snapshot (identified by its UUID), the memo keeps a bitmask of
+    which volumes it has been tested for, and a bitmask of the results. A
+    volume is only evaluated the first time it is needed for a snapshot.
+    The least recently used snapshots are dropped when the memo is full.
+
+    The memo is used once it is attached to its volumes (see
+    :meth:`.attach`); then :meth:`.Volume.frames_in` and the volume-based
+    ensembles consult it instead of evaluating the volume. Direct calls of
+    a volume, ``volume(snapshot)``, do not use the memo.
+
+    Parameters
+    ----------
+    volumes : list of :class:`.Volume`
+        the volumes to memoize
+    size_limit : int
+        maximum number of snapshots in the memo
+
+    Attributes
+    ----------
+    hits : int
+        number of (snapshot, volume) lookups answered by the memo
+    misses : int
+        number of (snapshot, volume) lookups that evaluated the volume
+    evictions : int
+        number of snapshots dropped from the memo because it was full
+    """
+    def __init__(self, volumes, size_limit=100000):
+        self.volumes = []
+        self._bits = {}
+        for volume in volumes:
+            if volume.__uuid__ not in self._bits:
+                self._bits[volume.__uuid__] = 1 << len(self.volumes)
+                self.volumes.append(volume)
+        self._memo = LRUCache(size_limit)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_objects(cls, *objects, **kwargs):
+        """Memo for all volumes used by the given objects
+
+        Parameters
+        ----------
+        objects : list
+            objects that use volumes (e.g., a network or ensembles)
+        size_limit : int
+            maximum number of snapshots in the memo
+        """
+        return cls(find_volumes(*objects), **kwargs)
+
+    @property
+    def size_limit(self):
+        return self._memo.size_limit
+
+    @property
+    def hit_rate(self):
+        """float : fraction of lookups answered by the memo"""
+        n_lookups = self.hits + self.misses
+        return float(self.hits) / n_lookups if n_lookups else 0.0
+
+    def __len__(self):
+        return len(self._memo)
+
+    def __str__(self):
+        return "{0}({1} volumes, {2}/{3} snapshots, hit rate {4:.1%})".format(
+            self.__class__.__name__, len(self.volumes), len(self),
+            self.size_limit, self.hit_rate
+        )
+
+    def reset_counters(self):
+        """Set hits, misses, and evictions back to zero"""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        """Remove all snapshots from the memo"""
+        self._memo.clear()
+
+    def attach(self):
+        """Make the volumes use this memo"""
+        for volume in self.volumes:
+            volume._membership_memo = self
+        return self
+
+    def detach(self):
+        """Make the volumes stop using this memo"""
+        for volume in self.volumes:
+            if volume._membership_memo is self:
+                del volume._membership_memo
+
+    def __enter__(self):
+        return self.attach()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.detach()
+
+    def _entry(self, snapshot):
+        # [tested bits, result bits]; created if the snapshot is new
+        key = snapshot.__uuid__
+        try:
+            return self._memo[key]
+        except KeyError:
+            if len(self._memo) >= self.size_limit:
+                self.evictions += 1
+            entry = [0, 0]
+            self._memo[key] = entry
+            return entry
+
+    def is_in(self, volume, snapshot):
+        """Whether the snapshot is in the volume
+
+        Parameters
+        ----------
+        volume : :class:`.Volume`
+            one of the volumes of this memo
+        snapshot : :class:`.BaseSnapshot`
+            the snapshot to test
+
+        Returns
+        -------
+        bool
+            whether the snapshot is in the volume
+        """
+        bit = self._bits[volume.__uuid__]
+        entry = self._entry(snapshot)
+        if entry[0] & bit:
+            self.hits += 1
+        else:
+            self.misses += 1
+            entry[0] |= bit
+            if volume(snapshot):
+                entry[1] |= bit
+        return bool(entry[1] & bit)
+
+    def frames_in(self, volume, snapshots):
+        """Boolean array: which of the snapshots are in the volume
+
+        Snapshots that are not in the memo yet are evaluated with one call
+        to the volume.
+
+        Parameters
+        ----------
+        volume : :class:`.Volume`
+            one of the volumes of this memo
+        snapshots : list of :class:`.BaseSnapshot` or :class:`.Trajectory`
+            the snapshots to test
+
+        Returns
+        -------
+        numpy.ndarray of bool
+            for each snapshot, whether it is in the volume
+        """
+        bit = self._bits[volume.__uuid__]
+        snapshots = list(snapshots)
+        entries = [self._entry(snap) for snap in snapshots]
+        missing = [i for (i, entry) in enumerate(entries)
+                   if not entry[0] & bit]
+        self.misses += len(missing)
+        self.hits += len(entries) - len(missing)
+        if missing:
+            results = volume._frames_in([snapshots[i] for i in missing])
+            for (i, result) in zip(missing, results):
+                entries[i][0] |= bit
+                if result:
+                    entries[i][1] |= bit
+        return np.array([bool(entry[1] & bit) for entry in entries],
+                        dtype=bool)